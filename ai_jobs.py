@@ -0,0 +1,240 @@
+"""Bounded background queue for LitStone AI turns."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from typing import Any
+
+log = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+
+class QueueFull(RuntimeError):
+    """Raised by AIJobQueue.submit() when the backlog is at capacity."""
+
+
+class AIJob:
+    """One queued call and, once a worker has run it, its outcome."""
+
+    __slots__ = (
+        "job_id", "game_id", "status", "result", "error",
+        "submitted_at", "started_at", "finished_at", "_fn", "_done",
+    )
+
+    def __init__(self, game_id: str, fn: Callable[[], Any], now: float) -> None:
+        self.job_id = uuid.uuid4().hex
+        self.game_id = game_id
+        self.status = "queued"
+        self.result: Any = None
+        self.error: str | None = None
+        self.submitted_at = now
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self._fn = fn
+        self._done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def wait_ms(self) -> float | None:
+        """Time spent queued before a worker picked the job up."""
+        if self.started_at is None:
+            return None
+        return (self.started_at - self.submitted_at) * 1000
+
+    @property
+    def run_ms(self) -> float | None:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return (self.finished_at - self.started_at) * 1000
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until the job has finished; False on timeout."""
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> dict:
+        """Status and timings, without the result."""
+        info = {
+            "job_id": self.job_id,
+            "game_id": self.game_id,
+            "status": self.status,
+            "wait_ms": None if self.wait_ms is None else round(self.wait_ms, 3),
+            "run_ms": None if self.run_ms is None else round(self.run_ms, 3),
+        }
+        if self.error is not None:
+            info["error"] = self.error
+        return info
+
+
+class AIJobQueue:
+    """A fixed pool of worker threads in front of a bounded FIFO of jobs.
+
+    submit() returns at once with an AIJob, or raises QueueFull when
+    ``max_queued`` jobs are already waiting, so a burst of expensive AI
+    turns is throttled instead of occupying every request thread.  Each job
+    is tagged with its game; active() finds the job a game is waiting on.
+
+    Finished jobs stay retrievable by id until ``keep_finished`` newer ones
+    have finished.  stats() reports the queue depth and how long jobs wait
+    and run.  ``on_change(job)``, if given, runs when a job is queued (in
+    submit(), before any worker can see it), when it starts and once it has
+    finished, e.g. to publish its status.  It never runs with the queue's
+    lock held, so it may block on I/O without stalling other callers.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_queued: int = 64,
+        *,
+        keep_finished: int = 1024,
+        clock: Callable[[], float] = time.perf_counter,
+        on_change: Callable[[AIJob], None] | None = None,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.max_queued = max(1, max_queued)
+        self.keep_finished = max(1, keep_finished)
+        self._clock = clock
+        self._on_change = on_change
+        self._queue: deque[AIJob] = deque()
+        self._jobs: OrderedDict[str, AIJob] = OrderedDict()
+        self._active: dict[str, AIJob] = {}
+        self._finished: deque[str] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._submitting = 0    # accepted by submit(), not yet queued
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.total_run_ms = 0.0
+        self.max_run_ms = 0.0
+        self._threads = [
+            threading.Thread(target=self._run, name=f"litstone-ai-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, game_id: str, fn: Callable[[], Any]) -> AIJob:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("AIJobQueue is closed")
+            waiting = len(self._queue) + self._submitting
+            if waiting >= self.max_queued:
+                self.rejected += 1
+                raise QueueFull(f"{waiting} AI turns already queued")
+            job = AIJob(game_id, fn, self._clock())
+            self._jobs[job.job_id] = job
+            self._active[game_id] = job
+            self._submitting += 1
+            self.submitted += 1
+        # Published outside the lock, but before a worker can see the job,
+        # so its "queued" status never lands after "running".
+        self._changed(job)
+        with self._cond:
+            self._submitting -= 1
+            self._queue.append(job)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+            self._cond.notify_all()
+        return job
+
+    def get(self, job_id: str) -> AIJob | None:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def active(self, game_id: str) -> AIJob | None:
+        """The queued or running job for ``game_id``, if any."""
+        with self._cond:
+            return self._active.get(game_id)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def close(self, timeout: float | None = 30.0) -> None:
+        """Run what is already queued, then stop the workers (safe to call more than once)."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._cond:
+            finished = self.completed + self.failed
+            started = finished + self.running
+            return {
+                "workers": self.workers,
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self.max_queue_depth,
+                "max_queued": self.max_queued,
+                "running": self.running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.total_wait_ms / started, 3) if started else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+                "avg_run_ms": round(self.total_run_ms / finished, 3) if finished else 0.0,
+                "max_run_ms": round(self.max_run_ms, 3),
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or (self._closed and not self._submitting))
+                if not self._queue:
+                    return
+                job = self._queue.popleft()
+                job.started_at = self._clock()
+                job.status = "running"
+                self.running += 1
+                self.total_wait_ms += job.wait_ms
+                self.max_wait_ms = max(self.max_wait_ms, job.wait_ms)
+            self._changed(job)
+            try:
+                job.result = job._fn()
+            except Exception as exc:
+                log.exception("AI job %s for game %s failed", job.job_id, job.game_id)
+                job.error = str(exc) or type(exc).__name__
+                job.status = "failed"
+            else:
+                job.status = "done"
+            job.finished_at = self._clock()
+            job._fn = None
+            with self._cond:
+                self.running -= 1
+                if job.status == "done":
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self.total_run_ms += job.run_ms
+                self.max_run_ms = max(self.max_run_ms, job.run_ms)
+                if self._active.get(job.game_id) is job:
+                    del self._active[job.game_id]
+                self._finished.append(job.job_id)
+                while len(self._finished) > self.keep_finished:
+                    del self._jobs[self._finished.popleft()]
+            self._changed(job)
+            job._done.set()
+
+    def _changed(self, job: AIJob) -> None:
+        if self._on_change is None:
+            return
+        try:
+            self._on_change(job)
+        except Exception:
+            log.exception("on_change failed for AI job %s", job.job_id)
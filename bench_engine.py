@@ -0,0 +1,207 @@
+"""
+bench_engine.py — Micro-benchmark for the search primitives in game_logic.py
+
+Compares trying every legal move with apply_move()/undo() against the
+copy.deepcopy() + execute_move() pattern it replaces (and against itself
+under silent_logging()), batch vs per-move scoring, find_lethal() on the
+same positions, and the Zobrist rehash after each move against the cost of
+merely detecting what the move changed.  With --mcts-workers N it also times
+a fixed number of ISMCTS iterations in-process against the same total spread
+over an N-process root-parallel search pool.
+
+Run with:  python bench_engine.py [--positions 200] [--seed 1] [--mcts-workers 4]
+"""
+
+import argparse
+import copy
+import random
+import time
+
+import game_logic as gl
+
+
+def sample_positions(count: int, seed: int) -> list[gl.GameState]:
+    """Mid-game positions reached by random play, with the mover to act."""
+    rng = random.Random(seed)
+    classes = sorted(gl.HERO_CLASSES)
+    positions: list[gl.GameState] = []
+    while len(positions) < count:
+        p1 = gl.create_player("P", rng.choice(classes), shuffle=False)
+        p2 = gl.create_player("AI", rng.choice(classes), shuffle=False)
+        rng.shuffle(p1.deck)
+        rng.shuffle(p2.deck)
+        gs = gl.GameState(p1=p1, p2=p2, is_player_turn=True)
+        for _ in range(rng.randint(4, 14)):
+            player, opp = gl.side_to_move(gs)
+            gl.start_turn(player)
+            for _ in range(rng.randint(0, 4)):
+                moves = gl.get_legal_moves(player, opp)
+                if not moves:
+                    break
+                gl.execute_move(player, opp, rng.choice(moves))
+            if gl.check_win(p1, p2):
+                break
+            gs.is_player_turn = not gs.is_player_turn
+        if not gl.check_win(p1, p2):
+            gl.start_turn(gl.side_to_move(gs)[0])
+            positions.append(gs)
+    return positions
+
+
+def bench_deepcopy(positions: list[gl.GameState]) -> int:
+    tried = 0
+    for gs in positions:
+        player, opp = gl.side_to_move(gs)
+        for move in gl.get_legal_moves(player, opp):
+            trial = copy.deepcopy(gs)
+            gl.execute_move(*gl.side_to_move(trial), move)
+            tried += 1
+    return tried
+
+
+def bench_apply_undo(positions: list[gl.GameState]) -> int:
+    tried = 0
+    for gs in positions:
+        player, opp = gl.side_to_move(gs)
+        for move in gl.get_legal_moves(player, opp):
+            gl.undo(gs, gl.apply_move(gs, move))
+            tried += 1
+    return tried
+
+
+def _timed(fn, positions: list[gl.GameState]) -> tuple[int, float]:
+    start = time.perf_counter()
+    tried = fn(positions)
+    elapsed = time.perf_counter() - start
+    log = gl.active_log()
+    if log is not None:
+        log.clear()
+    return tried, elapsed
+
+
+def bench_scoring(positions: list[gl.GameState], repeat: int = 20) -> None:
+    batches = [(*gl.side_to_move(gs), gl.get_legal_moves(*gl.side_to_move(gs))) for gs in positions]
+    results = {}
+    for label, score in (
+        ("per-move", lambda p, o, moves: [gl.evaluate_ai_move(p, o, mv) for mv in moves]),
+        ("batch", gl.evaluate_ai_moves),
+    ):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for player, opp, moves in batches:
+                score(player, opp, moves)
+        results[label] = time.perf_counter() - start
+        print(f"{label:>10}: {repeat * len(batches)} move lists in {results[label] * 1000:.1f} ms")
+    print(f"speed-up: {results['per-move'] / results['batch']:.1f}x")
+
+
+def bench_lethal(positions: list[gl.GameState]) -> None:
+    timings: dict[bool, list[float]] = {True: [], False: []}
+    for gs in positions:
+        player, opp = gl.side_to_move(gs)
+        start = time.perf_counter()
+        line = gl.find_lethal(player, opp)
+        timings[line is not None].append(time.perf_counter() - start)
+    for found, label in ((False, "no lethal"), (True, "lethal")):
+        samples = timings[found]
+        if samples:
+            print(f"{label:>10}: {len(samples)} positions, "
+                  f"mean {sum(samples) / len(samples) * 1e6:,.1f} us")
+
+
+def _footprint(player: gl.PlayerState, opp: gl.PlayerState) -> tuple:
+    return (
+        gl._get_hero_fields(player), gl._get_hero_fields(opp),
+        [gl._get_minion_fields(m) for m in (*player.board, *opp.board)],
+    )
+
+
+def bench_zobrist(positions: list[gl.GameState], repeat: int = 20) -> None:
+    """Hash upkeep after each move: the rebuild execute_move does, against
+    only detecting what the move changed (the floor for an incremental key)."""
+
+    def rebuild(player, opp, _before):
+        gl._zh_refresh_hero(player)
+        gl._zh_refresh_hero(opp)
+        gl._zh_refresh_board(player)
+        gl._zh_refresh_board(opp)
+
+    def detect(player, opp, before):
+        return _footprint(player, opp) != before
+
+    results = {rebuild: 0.0, detect: 0.0}
+    moves = 0
+    for gs in positions:
+        gl.zobrist_hash(gs)
+        player, opp = gl.side_to_move(gs)
+        for move in gl.get_legal_moves(player, opp):
+            before = _footprint(player, opp)
+            token = gl.apply_move(gs, move)
+            for fn in (rebuild, detect) if moves % 2 else (detect, rebuild):
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    fn(player, opp, before)
+                results[fn] += time.perf_counter() - start
+            gl.undo(gs, token)
+            moves += 1
+    for fn, label in ((rebuild, "rebuild"), (detect, "detect")):
+        print(f"{label:>10}: {results[fn] / (moves * repeat) * 1e6:.2f} us/move")
+
+
+def bench_root_parallel(positions: list[gl.GameState], workers: int, iterations: int) -> None:
+    gl.AI_SEARCH_WORKERS = workers
+    pool = gl.search_pool()
+    for gs in positions[:2]:                     # warm up the worker processes
+        gl.ismcts_move(*gl.side_to_move(gs), 60_000, max_iterations=workers)
+    results = {}
+    for label, parallel in (("in-process", False), (f"{workers} workers", True)):
+        start = time.perf_counter()
+        for i, gs in enumerate(positions):
+            player, opp = gl.side_to_move(gs)
+            rng = random.Random(i)
+            if parallel:
+                gl._parallel_root_stats(pool, player, opp, 60_000, rng, iterations)
+            else:
+                gl._ismcts_root_stats(player, opp, 60_000, rng, iterations)
+        results[label] = time.perf_counter() - start
+        print(f"{label:>10}: {len(positions)} searches x {iterations} iterations "
+              f"in {results[label]:.2f} s")
+    gl.shutdown_search_pool()
+    print(f"speed-up: {results['in-process'] / results[f'{workers} workers']:.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--positions", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mcts-workers", type=int, default=0)
+    parser.add_argument("--mcts-iterations", type=int, default=400)
+    args = parser.parse_args()
+
+    positions = sample_positions(args.positions, args.seed)
+    results = {}
+    with gl.engine_context([]):     # log lines are kept, as in a server request
+        for label, fn in (("deepcopy", bench_deepcopy), ("apply/undo", bench_apply_undo)):
+            tried, elapsed = _timed(fn, positions)
+            results[label] = elapsed
+            print(f"{label:>10}: {tried} moves in {elapsed * 1000:.1f} ms "
+                  f"({tried / elapsed:,.0f} moves/s)")
+    print(f"speed-up: {results['deepcopy'] / results['apply/undo']:.1f}x")
+    with gl.silent_logging():
+        tried, elapsed = _timed(bench_apply_undo, positions)
+    print(f"{'silent':>10}: {tried} moves in {elapsed * 1000:.1f} ms "
+          f"({results['apply/undo'] / elapsed:.2f}x apply/undo with logging on)")
+
+    print("move scoring:")
+    bench_scoring(positions)
+    print("find_lethal:")
+    bench_lethal(positions)
+    print("Zobrist upkeep:")
+    with gl.silent_logging():
+        bench_zobrist(positions)
+    if args.mcts_workers >= 2:
+        bench_root_parallel(positions[:20], args.mcts_workers, args.mcts_iterations)
+
+
+if __name__ == "__main__":
+    main()
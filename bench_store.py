@@ -0,0 +1,145 @@
+"""
+bench_store.py — Micro-benchmark for GameStore save throughput.
+
+Saves real mid-game states (GameState.to_dict()) to a scratch SQLite file
+in three ways and reports saves/sec for each:
+
+* per-call   — a fresh connection plus ``PRAGMA journal_mode=WAL`` for every
+               save, the way GameStore worked before it kept connections
+* reused     — GameStore.save(): one configured connection per thread and
+               cached prepared statements
+* batched    — GameStore.write_batch() with --batch saves per transaction,
+               as the GameWriter thread commits them
+
+It then compares the state codecs (JSON, binary, binary+zlib) on the same
+states plus played-out games with full logs: mean encoded size and
+encode/decode time per state.
+
+Run with:  python bench_store.py [--saves 2000] [--games 50] [--batch 32] [--codec json]
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import game_logic as gl
+from bench_engine import sample_positions
+from game_store import STATE_CODECS, GameStore, GameWrite
+from state_codec import decode_state, encode_state
+
+
+def _per_call_save(db_path: str, game_id: str, state: dict) -> None:
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO games (game_id, state_json, updated_at) VALUES (?, ?, ?)",
+                (game_id, json.dumps(state), time.time()),
+            )
+    finally:
+        conn.close()
+
+
+def bench_per_call(db_path: str, saves: list[tuple[str, dict]]) -> float:
+    start = time.perf_counter()
+    for game_id, state in saves:
+        _per_call_save(db_path, game_id, state)
+    return time.perf_counter() - start
+
+
+def bench_reused(store: GameStore, saves: list[tuple[str, dict]]) -> float:
+    start = time.perf_counter()
+    for game_id, state in saves:
+        store.save(game_id, state)
+    return time.perf_counter() - start
+
+
+def bench_batched(store: GameStore, saves: list[tuple[str, dict]], batch: int) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(saves), batch):
+        store.write_batch({game_id: GameWrite(state) for game_id, state in saves[i:i + batch]})
+    return time.perf_counter() - start
+
+
+def played_states(games: int, seed: int, turns: int = 24) -> list[dict]:
+    """States from the end of hard-AI games, with their logs."""
+    states = []
+    for i in range(games):
+        rng = random.Random(seed * 1000 + i)
+        p1 = gl.create_ai_opponent(hero_class=rng.choice(gl.HERO_CLASSES), rng=rng)
+        p2 = gl.create_ai_opponent(hero_class=rng.choice(gl.HERO_CLASSES), rng=rng)
+        gs = gl.GameState(game_id=f"bench-{i}", p1=p1, p2=p2, seed=i)
+        with gl.engine_context(gs.log, rng):
+            for turn in range(turns):
+                mover, opp = (p1, p2) if turn % 2 == 0 else (p2, p1)
+                gl.run_ai_turn(mover, opp, draw=turn > 0, difficulty="hard")
+                if gl.check_win(p1, p2):
+                    break
+        states.append(json.loads(json.dumps(gs.to_dict())))
+    return states
+
+
+def bench_codecs(label: str, states: list[dict], repeat: int = 5) -> None:
+    codecs = {
+        "json": (lambda s: json.dumps(s).encode(), lambda b: json.loads(b)),
+        "binary": (encode_state, decode_state),
+        "binary+zlib": (lambda s: encode_state(s, compress=True), decode_state),
+    }
+    assert set(codecs) == set(STATE_CODECS)
+    print(f"codecs, {label} ({len(states)} states):")
+    for name, (encode, decode) in codecs.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            blobs = [encode(s) for s in states]
+        encode_us = (time.perf_counter() - start) / (repeat * len(states)) * 1e6
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for blob in blobs:
+                decode(blob)
+        decode_us = (time.perf_counter() - start) / (repeat * len(states)) * 1e6
+        size = sum(len(b) for b in blobs) / len(blobs)
+        print(f"{name:>12}: {size:>7,.0f} B  encode {encode_us:>6.1f} us  decode {decode_us:>6.1f} us")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--saves", type=int, default=2000)
+    parser.add_argument("--games", type=int, default=50, help="distinct game ids saved round-robin")
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--codec", choices=STATE_CODECS, default="binary",
+                        help="codec for the reused/batched saves")
+    args = parser.parse_args()
+
+    with gl.silent_logging():
+        states = [gs.to_dict() for gs in sample_positions(args.games, args.seed)]
+    saves = [(f"bench-{i % args.games}", states[i % args.games]) for i in range(args.saves)]
+    size = sum(len(json.dumps(s)) for s in states) / len(states)
+    print(f"{args.saves} saves of {args.games} games (mean state {size / 1024:.1f} KiB)")
+
+    with tempfile.TemporaryDirectory() as td:
+        store = GameStore(os.path.join(td, "bench.db"), codec=args.codec)
+        results = {}
+        for label, run in (
+            ("per-call", lambda: bench_per_call(store.db_path, saves)),
+            ("reused", lambda: bench_reused(store, saves)),
+            ("batched", lambda: bench_batched(store, saves, args.batch)),
+        ):
+            elapsed = run()
+            results[label] = elapsed
+            print(f"{label:>10}: {elapsed * 1000:.1f} ms ({args.saves / elapsed:,.0f} saves/s)")
+        store.close()
+    print(f"reused vs per-call: {results['per-call'] / results['reused']:.1f}x, "
+          f"batched vs per-call: {results['per-call'] / results['batched']:.1f}x")
+
+    bench_codecs("mid-game positions", states)
+    bench_codecs("played games with logs", played_states(min(args.games, 20), args.seed))
+
+
+if __name__ == "__main__":
+    main()
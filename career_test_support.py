@@ -1,6 +1,6 @@
 """Shared helpers for career E2E tests (API + browser)."""
 
-from game_logic import CAMPAIGN_NODES, create_player
+from game_logic import CAMPAIGN_NODES, GameState, Minion, create_player
 
 CHAPTER_NAMES = [n["name"] for n in CAMPAIGN_NODES]
 TOTAL_CHAPTERS = len(CAMPAIGN_NODES)
@@ -30,19 +30,10 @@ def is_career_complete(completed: list[str], total_chapters: int = TOTAL_CHAPTER
     return len(completed) >= total_chapters
 
 
-def setup_lethal_turn(gs: dict) -> None:
+def setup_lethal_turn(gs: GameState) -> None:
     """Give the player a guaranteed lethal attack on the enemy hero."""
     p1, p2 = gs["p1"], gs["p2"]
-    p1["board"] = [{
-        "name": "Charge Bruiser",
-        "type": "minion",
-        "cost": 5,
-        "atk": 15,
-        "hp": 1,
-        "max_hp": 1,
-        "can_attack": True,
-        "charge": True,
-    }]
+    p1["board"] = [Minion("Charge Bruiser", 15, 1, can_attack=True, charge=True)]
     p1["hand"] = []
     p1["mana"] = 10
     p1["max_mana"] = 10
@@ -0,0 +1,153 @@
+"""Bounded in-memory cache of live LitStone games in front of GameStore."""
+
+from __future__ import annotations
+
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Generic, TypeVar
+
+V = TypeVar("V")
+
+
+class GameLocks:
+    """Striped re-entrant locks keyed by game id.
+
+    Every operation on a game runs under ``for_game(game_id)``, so two
+    requests (or a request and an AI turn) on one game never interleave,
+    while games on different stripes proceed in parallel.  A fixed number
+    of stripes keeps memory bounded however many games come and go; two
+    games that share a stripe merely wait for each other.
+    """
+
+    def __init__(self, stripes: int = 64) -> None:
+        self._locks = tuple(threading.RLock() for _ in range(max(1, stripes)))
+
+    def for_game(self, game_id: str) -> threading.RLock:
+        return self._locks[zlib.crc32(game_id.encode()) % len(self._locks)]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+class GameCache(Generic[V]):
+    """LRU + idle-TTL cache that loads games on first access.
+
+    ``load(game_id)`` fetches a game the cache does not hold (None when it
+    does not exist); ``on_evict(game_id, game)`` runs when a game is dropped
+    for space or idleness, so it can be written back.  Removing a game with
+    pop() or clear() does not call ``on_evict``.
+
+    ``len()`` and ``in`` describe only the games currently held in memory.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[str], V | None],
+        *,
+        capacity: int = 512,
+        ttl_seconds: float = 1800.0,
+        on_evict: Callable[[str, V], None] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._load = load
+        self._on_evict = on_evict
+        self._clock = clock
+        self.capacity = max(1, capacity)
+        self.ttl_seconds = ttl_seconds
+        self._games: OrderedDict[str, tuple[V, float]] = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, game_id: str, default: V | None = None) -> V | None:
+        now = self._clock()
+        with self._lock:
+            self._expire(now)
+            entry = self._games.get(game_id)
+            if entry is not None:
+                self.hits += 1
+                self._games[game_id] = (entry[0], now)
+                self._games.move_to_end(game_id)
+                return entry[0]
+            self.misses += 1
+        game = self._load(game_id)
+        if game is None:
+            return default
+        with self._lock:
+            entry = self._games.get(game_id)
+            if entry is not None:   # another thread loaded it first
+                return entry[0]
+            self.loads += 1
+            self._insert(game_id, game, now)
+        return game
+
+    def __getitem__(self, game_id: str) -> V:
+        game = self.get(game_id)
+        if game is None:
+            raise KeyError(game_id)
+        return game
+
+    def __setitem__(self, game_id: str, game: V) -> None:
+        now = self._clock()
+        with self._lock:
+            self._expire(now)
+            self._games.pop(game_id, None)
+            self._insert(game_id, game, now)
+
+    def pop(self, game_id: str, default: V | None = None) -> V | None:
+        with self._lock:
+            entry = self._games.pop(game_id, None)
+        return entry[0] if entry is not None else default
+
+    def clear(self) -> None:
+        with self._lock:
+            self._games.clear()
+
+    def __contains__(self, game_id: object) -> bool:
+        return game_id in self._games
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._games),
+                "capacity": self.capacity,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _insert(self, game_id: str, game: V, now: float) -> None:
+        self._games[game_id] = (game, now)
+        while len(self._games) > self.capacity:
+            old_id, (old_game, _) = self._games.popitem(last=False)
+            self.evictions += 1
+            self._evicted(old_id, old_game)
+
+    def _expire(self, now: float) -> None:
+        # Entries are kept in access order, so idle ones sit at the front.
+        cutoff = now - self.ttl_seconds
+        while self._games:
+            game_id, (game, last_used) = next(iter(self._games.items()))
+            if last_used > cutoff:
+                break
+            del self._games[game_id]
+            self.expirations += 1
+            self._evicted(game_id, game)
+
+    def _evicted(self, game_id: str, game: V) -> None:
+        if self._on_evict is not None:
+            self._on_evict(game_id, game)
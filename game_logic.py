@@ -4,7 +4,25 @@ No Tkinter/GUI dependencies. All emoji replaced with text codes
 so log entries render safely in any environment.
 """
 
+from __future__ import annotations
+
+import atexit
+import itertools
+import math
+import multiprocessing
+import os
 import random
+import struct
+import threading
+import time
+from array import array
+from collections import deque
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from operator import attrgetter
+from typing import NamedTuple
 
 # ---------------------------------------------------------------------------
 # 1. CARD DATABASE & CONFIGURATION
@@ -234,6 +252,105 @@ SHAMAN_TOTEMS = [
     {"name": "Wrath of Air Totem", "type": "minion", "cost": 0, "atk": 0, "hp": 2, "icon": "WA"},
 ]
 
+SILVER_HAND_RECRUIT = {"name": "Silver Hand Recruit", "type": "minion", "cost": 0, "atk": 1, "hp": 1, "icon": "SR"}
+
+# Summoned tokens that are not in CARD_DB, keyed by name.
+TOKEN_DB = {t["name"]: t for t in (*SHAMAN_TOTEMS, SILVER_HAND_RECRUIT)}
+
+# ---------------------------------------------------------------------------
+# Compiled card table
+# ---------------------------------------------------------------------------
+# CARD_DB stays the authoring format.  At import time every card (plus every
+# summoned token) is given a dense integer ID and its rules data is flattened
+# into per-column tuples indexed by that ID.  Hands, decks and boards hold IDs;
+# names are restored only when state is serialized for the API / GameStore.
+
+CARD_TYPES = ("minion", "spell", "weapon")
+TYPE_MINION, TYPE_SPELL, TYPE_WEAPON = range(len(CARD_TYPES))
+
+# Keyword bitflags, one bit per MINION_TRAITS entry.
+KW_TAUNT, KW_DIVINE_SHIELD, KW_CHARGE, KW_POISONOUS, KW_BATTLECRY, KW_DEATHRATTLE = (
+    1 << i for i in range(len(MINION_TRAITS))
+)
+
+# Spell, battlecry and deathrattle effects share one code space.
+EFFECTS = (
+    None, "coin", "damage", "heal", "draw", "damage_all", "buff", "buff_all",
+    "heal_all", "add_shield", "silence", "heal_hero", "draw_cards", "dmg_hero",
+)
+(
+    EFFECT_NONE, EFFECT_COIN, EFFECT_DAMAGE, EFFECT_HEAL, EFFECT_DRAW, EFFECT_DAMAGE_ALL,
+    EFFECT_BUFF, EFFECT_BUFF_ALL, EFFECT_HEAL_ALL, EFFECT_ADD_SHIELD, EFFECT_SILENCE,
+    EFFECT_HEAL_HERO, EFFECT_DRAW_CARDS, EFFECT_DMG_HERO,
+) = range(len(EFFECTS))
+EFFECT_CODES = {name: code for code, name in enumerate(EFFECTS) if name}
+
+CLASS_BITS = {cls: 1 << i for i, cls in enumerate(HERO_CLASSES)}
+
+
+def _compile_card_table(entries: dict[str, dict]) -> dict[str, tuple]:
+    cols: dict[str, list] = {
+        "name": [], "entry": [], "type": [], "cost": [], "atk": [], "hp": [],
+        "durability": [], "keywords": [], "effect": [], "value": [],
+        "deathrattle": [], "deathrattle_val": [], "class_mask": [],
+    }
+    for name, card in entries.items():
+        keywords = 0
+        for bit, trait in enumerate(MINION_TRAITS):
+            if card.get(trait):
+                keywords |= 1 << bit
+        effect, value = card.get("effect"), card.get("val", 0)
+        if card.get("battlecry"):
+            effect, value = card["battlecry"]["effect"], card["battlecry"]["val"]
+        deathrattle = card.get("deathrattle") or {}
+        class_mask = 0
+        for cls in card.get("classes") or ():
+            class_mask |= CLASS_BITS[cls]
+        cols["name"].append(name)
+        cols["entry"].append(card)
+        cols["type"].append(CARD_TYPES.index(card["type"]))
+        cols["cost"].append(card["cost"])
+        cols["atk"].append(card.get("atk", 0))
+        cols["hp"].append(card.get("hp", 0))
+        cols["durability"].append(card.get("durability", 0))
+        cols["keywords"].append(keywords)
+        cols["effect"].append(EFFECT_CODES[effect] if effect else EFFECT_NONE)
+        cols["value"].append(tuple(value) if isinstance(value, list) else value)
+        cols["deathrattle"].append(EFFECT_CODES.get(deathrattle.get("effect"), EFFECT_NONE))
+        cols["deathrattle_val"].append(deathrattle.get("val", 0))
+        cols["class_mask"].append(class_mask)
+    return {key: tuple(values) for key, values in cols.items()}
+
+
+_CARD_TABLE = _compile_card_table({**CARD_DB, **TOKEN_DB})
+CARD_NAMES: tuple[str, ...] = _CARD_TABLE["name"]
+CARD_ENTRIES: tuple[dict, ...] = _CARD_TABLE["entry"]
+CARD_TYPE: tuple[int, ...] = _CARD_TABLE["type"]
+CARD_COST: tuple[int, ...] = _CARD_TABLE["cost"]
+CARD_ATK: tuple[int, ...] = _CARD_TABLE["atk"]
+CARD_HP: tuple[int, ...] = _CARD_TABLE["hp"]
+CARD_DURABILITY: tuple[int, ...] = _CARD_TABLE["durability"]
+CARD_KEYWORDS: tuple[int, ...] = _CARD_TABLE["keywords"]
+CARD_EFFECT: tuple[int, ...] = _CARD_TABLE["effect"]
+CARD_VALUE: tuple = _CARD_TABLE["value"]
+CARD_DEATHRATTLE: tuple[int, ...] = _CARD_TABLE["deathrattle"]
+CARD_DEATHRATTLE_VAL: tuple[int, ...] = _CARD_TABLE["deathrattle_val"]
+CARD_CLASS_MASK: tuple[int, ...] = _CARD_TABLE["class_mask"]
+CARD_IDS: dict[str, int] = {name: cid for cid, name in enumerate(CARD_NAMES)}
+COIN_ID = CARD_IDS[COIN_CARD]
+RECRUIT_ID = CARD_IDS[SILVER_HAND_RECRUIT["name"]]
+TOTEM_IDS = tuple(CARD_IDS[t["name"]] for t in SHAMAN_TOTEMS)
+
+
+def card_ids(cards) -> list[int]:
+    """Card names (or IDs) -> list of card IDs."""
+    return [c if isinstance(c, int) else CARD_IDS[c] for c in cards]
+
+
+def card_names(ids) -> list[str]:
+    """Card IDs -> list of card names."""
+    return [CARD_NAMES[cid] for cid in ids]
+
 
 def card_max_copies(name: str) -> int:
     return 1 if CARD_DB[name].get("legendary") else 2
@@ -255,7 +372,7 @@ def cards_for_class(hero_class: str) -> list[str]:
     return [n for n in CARD_DB if card_allowed_for_class(n, hero_class)]
 
 
-AI_DIFFICULTIES = ("easy", "normal", "hard")
+AI_DIFFICULTIES = ("easy", "normal", "hard", "expert", "master")
 
 # Target copies per mana bucket for AI deck curves (sums to DECK_SIZE).
 CURVE_TARGETS = {1: 4, 2: 8, 3: 8, 4: 6, 5: 3, 6: 1}
@@ -362,7 +479,7 @@ def get_campaign_node(node_id: str) -> dict | None:
     return None
 
 
-def complete_deck_from_core(hero_class: str, core: list[str]) -> list[str]:
+def complete_deck_from_core(hero_class: str, core: list[str], *, rng: random.Random | None = None) -> list[str]:
     """Build a legal DECK_SIZE deck starting from themed core cards."""
     deck: list[str] = []
     for name in core:
@@ -372,7 +489,7 @@ def complete_deck_from_core(hero_class: str, core: list[str]) -> list[str]:
             continue
         if deck.count(name) < card_max_copies(name):
             deck.append(name)
-    for name in build_curved_ai_deck(hero_class):
+    for name in build_curved_ai_deck(hero_class, rng=rng):
         if len(deck) >= DECK_SIZE:
             break
         if deck.count(name) < card_max_copies(name):
@@ -380,8 +497,9 @@ def complete_deck_from_core(hero_class: str, core: list[str]) -> list[str]:
     return deck[:DECK_SIZE]
 
 
-def build_curved_ai_deck(hero_class: str) -> list[str]:
+def build_curved_ai_deck(hero_class: str, *, rng: random.Random | None = None) -> list[str]:
     """Build a 30-card deck with a playable mana curve for the AI."""
+    rng = rng or active_rng()
     pool = [n for n in cards_for_class(hero_class) if not CARD_DB[n].get("legendary")]
     by_cost: dict[int, list[str]] = {}
     for name in pool:
@@ -401,7 +519,7 @@ def build_curved_ai_deck(hero_class: str) -> list[str]:
     for cost, need in CURVE_TARGETS.items():
         added = 0
         candidates = list(by_cost.get(cost, []))
-        random.shuffle(candidates)
+        rng.shuffle(candidates)
         for name in candidates:
             while try_add(name) and added < need:
                 added += 1
@@ -421,7 +539,7 @@ def build_curved_ai_deck(hero_class: str) -> list[str]:
 
     guard = 0
     shuffled = list(pool)
-    random.shuffle(shuffled)
+    rng.shuffle(shuffled)
     while len(deck) < DECK_SIZE and guard < DECK_SIZE * 4:
         guard += 1
         try_add(shuffled[guard % len(shuffled)])
@@ -433,16 +551,17 @@ def create_ai_opponent(
     hero_class: str | None = None,
     boss_id: str | None = None,
     campaign_node: str | None = None,
-) -> dict:
+    rng: random.Random | None = None,
+) -> PlayerState:
     """Create an AI player with a curved or scripted deck."""
     if boss_id and boss_id in BOSS_PRESETS:
         preset = BOSS_PRESETS[boss_id]
         hero_class = preset["hero_class"]
-        deck = complete_deck_from_core(hero_class, preset["core"])
-        player = create_player(preset["display_name"], hero_class, deck)
+        deck = complete_deck_from_core(hero_class, preset["core"], rng=rng)
+        player = create_player(preset["display_name"], hero_class, deck, rng=rng)
         boss_hp = preset.get("hp", 30)
-        player["hp"] = boss_hp
-        player["max_hp"] = boss_hp
+        player.hp = boss_hp
+        player.max_hp = boss_hp
         return player
 
     ai_class = hero_class or "Mage"
@@ -451,8 +570,8 @@ def create_ai_opponent(
         if node and not boss_id:
             ai_class = node.get("ai_class", ai_class)
 
-    deck = build_curved_ai_deck(ai_class)
-    return create_player("AI", ai_class, deck)
+    deck = build_curved_ai_deck(ai_class, rng=rng)
+    return create_player("AI", ai_class, deck, rng=rng)
 
 
 def normalize_difficulty(difficulty: str | None) -> str:
@@ -462,44 +581,147 @@ def normalize_difficulty(difficulty: str | None) -> str:
 
 def select_ai_move(
     legal: list,
-    p2: dict,
-    p1: dict,
+    p2: PlayerState,
+    p1: PlayerState,
     difficulty: str = "normal",
+    *,
+    rng: random.Random | None = None,
 ) -> tuple | None:
     """Pick a move for the AI based on difficulty tier."""
     if not legal:
         return None
+    rng = rng or active_rng()
 
-    scored = [(evaluate_ai_move(p2, p1, mv), mv) for mv in legal]
+    scored = list(zip(evaluate_ai_moves(p2, p1, legal), legal))
     scored.sort(key=lambda pair: -pair[0])
 
     if difficulty == "easy":
-        if random.random() < 0.4:
-            return random.choice(legal)
+        if rng.random() < 0.4:
+            return rng.choice(legal)
         pool = scored[: max(1, (len(scored) + 1) // 2)]
-        return random.choice(pool)[1]
+        return rng.choice(pool)[1]
 
     best_score = scored[0][0]
     if best_score < 0:
         return scored[-1][1]
 
-    if difficulty == "hard":
-        contenders = [mv for score, mv in scored if score >= best_score - 1.5]
-        return max(contenders, key=lambda mv: evaluate_ai_move(p2, p1, mv))
+    if difficulty in ("hard", "expert", "master"):
+        return scored[0][1]
 
     # normal — slight variety among near-best lines
     contenders = [mv for score, mv in scored if score >= best_score - 0.75]
-    return random.choice(contenders)
+    return rng.choice(contenders)
+
+
+# ---- Per-game log context ---------------------------------------------------
+# There is no process-wide log buffer: log_action() appends to the list made
+# active for the current thread / asyncio task, and drops the line when none
+# is.  Each gunicorn request thread therefore writes only to its own game's
+# log, and nothing accumulates across matches.  A server game's log is a
+# GameLog ring of GAME_LOG_CAPACITY lines; older lines move to GameStore.
+
+GAME_LOG_CAPACITY = int(os.environ.get("LITSTONE_LOG_CAPACITY", "200"))
+
+_ACTIVE_LOG: ContextVar[list[str] | GameLog | None] = ContextVar("litstone_log", default=None)
+
+
+def set_active_log(log: list[str] | GameLog | None) -> Token:
+    """Route log_action output in the current context to ``log`` (None: discard).
+
+    Returns the token that ``_ACTIVE_LOG.reset`` takes; engine_context() is
+    the scoped form.
+    """
+    return _ACTIVE_LOG.set(log)
+
+
+def active_log() -> list[str] | GameLog | None:
+    return _ACTIVE_LOG.get()
+
+
+@contextmanager
+def engine_context(log: list[str] | GameLog | None, rng: random.Random | None = None):
+    """Scope a game's log list and RNG to the rules-engine calls in this block."""
+    log_token = _ACTIVE_LOG.set(log)
+    rng_token = _ACTIVE_RNG.set(rng)
+    try:
+        yield
+    finally:
+        _ACTIVE_RNG.reset(rng_token)
+        _ACTIVE_LOG.reset(log_token)
+
 
+# ---- Lazy, structured logging -----------------------------------------------
+# log_action() takes a %-style template plus its arguments and only builds the
+# line once something will read it.  Structured sinks registered with
+# add_log_sink() receive the raw LogEvent (template and args) and can count or
+# filter events without formatting strings.  Inside silent_logging() -- AI
+# lookahead and the self-play simulator -- log_action() returns at once, so
+# rules code pays nothing for text nobody reads.  Silence is scoped to the
+# current thread / context, so a search never mutes a concurrent request.
 
-GAME_LOG: list[str] = []
-_ACTIVE_LOG: list[str] | None = None
+class LogEvent(NamedTuple):
+    template: str
+    args: tuple
 
+    @property
+    def message(self) -> str:
+        return self.template % self.args if self.args else self.template
 
-def set_active_log(log: list[str] | None) -> None:
-    """Route log_action output to a per-game log list (used by the server)."""
-    global _ACTIVE_LOG
-    _ACTIVE_LOG = log
+
+_LOG_SINKS: list[Callable[[LogEvent], None]] = []
+_SILENT: ContextVar[bool] = ContextVar("litstone_silent", default=False)
+
+
+def add_log_sink(sink: Callable[[LogEvent], None]) -> None:
+    """Also deliver every (non-silenced) log event to ``sink``."""
+    _LOG_SINKS.append(sink)
+
+
+def remove_log_sink(sink: Callable[[LogEvent], None]) -> None:
+    if sink in _LOG_SINKS:
+        _LOG_SINKS.remove(sink)
+
+
+@contextmanager
+def silent_logging():
+    """Drop every log_action() made in this context."""
+    token = _SILENT.set(True)
+    try:
+        yield
+    finally:
+        _SILENT.reset(token)
+
+
+# ---- Per-game randomness ----------------------------------------------------
+# Every random draw in the engine (deck building, shuffles, mulligans, AI
+# tie-breaks, Totemic Call) comes from a random.Random passed in as ``rng=``
+# or, failing that, from the one activated for the current thread/context
+# with engine_context() or set_active_rng().  Only when neither is set does it fall back to the
+# process-global ``random`` module.  A game stores just its seed and a step
+# counter: step N's stream is game_rng(seed, N), so a seed plus the ordered
+# list of requests reproduces a match exactly.
+
+_ACTIVE_RNG: ContextVar[random.Random | None] = ContextVar("litstone_rng", default=None)
+
+
+def set_active_rng(rng: random.Random | None) -> Token:
+    """Route engine randomness to ``rng`` for the current context."""
+    return _ACTIVE_RNG.set(rng)
+
+
+def active_rng() -> random.Random:
+    """The context's game RNG, or the global ``random`` module when none is active."""
+    return _ACTIVE_RNG.get() or random
+
+
+def new_game_seed() -> int:
+    """A fresh 63-bit game seed from the OS entropy source."""
+    return random.SystemRandom().getrandbits(63)
+
+
+def game_rng(seed: int, step: int) -> random.Random:
+    """The independent, reproducible random stream for ``step`` of game ``seed``."""
+    return random.Random(f"litstone:{seed}:{step}")
 
 
 def get_spell_desc(card: dict, short: bool = False) -> str:
@@ -560,14 +782,588 @@ def collectible_card_db() -> dict[str, dict]:
     }
 
 
-def log_action(msg: str) -> None:
-    GAME_LOG.append(msg)
-    if _ACTIVE_LOG is not None:
-        _ACTIVE_LOG.append(msg)
+def log_action(msg: str, *args) -> None:
+    """Log ``msg % args`` (just ``msg`` without args) unless logging is silenced."""
+    if _SILENT.get():
+        return
+    for sink in _LOG_SINKS:
+        sink(LogEvent(msg, args))
+    log = _ACTIVE_LOG.get()
+    if log is not None:
+        log.append(msg % args if args else msg)
 
 
 # ---------------------------------------------------------------------------
-# 2. STATE INITIALISATION
+# 2. STATE MODEL
+# ---------------------------------------------------------------------------
+# The rules engine works on compact __slots__ records and reads attributes
+# directly.  Each record also offers a dict-style view (state["hp"], .get,
+# .setdefault, "key" in state) for server / test code, and converts to plain
+# dicts only at the edges via to_dict() / from_dict().
+
+class _SlotRecord:
+    __slots__ = ()
+    _DEFAULTS: dict = {}
+
+    def __init__(self, **fields) -> None:
+        for key, default in self._DEFAULTS.items():
+            if key in fields:
+                value = fields.pop(key)
+            else:
+                value = default.copy() if isinstance(default, list) else default
+            setattr(self, key, value)
+        if fields:
+            raise TypeError(f"Unknown {type(self).__name__} field(s): {', '.join(sorted(fields))}")
+
+    def __getitem__(self, key: str):
+        if key in self._DEFAULTS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value) -> None:
+        if key not in self._DEFAULTS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        if key not in self._DEFAULTS:
+            return False
+        value = getattr(self, key)
+        return value is not None and value is not False
+
+    def __iter__(self):
+        return iter(self._DEFAULTS)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def keys(self):
+        return self._DEFAULTS.keys()
+
+    def get(self, key: str, default=None):
+        if key in self._DEFAULTS:
+            return self[key]
+        return default
+
+    def setdefault(self, key: str, default=None):
+        value = self.get(key)
+        if value is None:
+            self[key] = default
+            return default
+        return value
+
+    def pop(self, key: str, *default):
+        """Reset a field to its default and return the previous value."""
+        if key not in self._DEFAULTS:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        value = self[key]
+        reset = self._DEFAULTS[key]
+        self[key] = reset.copy() if isinstance(reset, list) else reset
+        return value
+
+    def copy(self):
+        """Shallow copy of every slot (list fields are copied, not shared)."""
+        clone = object.__new__(type(self))
+        for key in type(self).__slots__:
+            value = getattr(self, key)
+            setattr(clone, key, value.copy() if isinstance(value, list) else value)
+        return clone
+
+    def to_dict(self) -> dict:
+        return {key: getattr(self, key) for key in self._DEFAULTS}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(**{k: v for k, v in data.items() if k in cls._DEFAULTS})
+
+
+class Minion(_SlotRecord):
+    """A minion on the board.
+
+    Static card fields (type, cost, icon, ...) are looked up through
+    ``card_id`` in the compiled card table instead of being copied per summon.
+    """
+
+    __slots__ = (
+        "name", "atk", "hp", "max_hp", "can_attack", "turns_on_board",
+        "taunt", "divine_shield", "charge", "poisonous", "battlecry", "deathrattle",
+        "card_id",
+    )
+    _DEFAULTS = {
+        "name": "", "atk": 0, "hp": 0, "max_hp": 0, "can_attack": False, "turns_on_board": 0,
+        "taunt": False, "divine_shield": False, "charge": False, "poisonous": False,
+        "battlecry": None, "deathrattle": None,
+    }
+
+    def __init__(
+        self,
+        name: str,
+        atk: int,
+        hp: int,
+        *,
+        max_hp: int | None = None,
+        can_attack: bool = False,
+        turns_on_board: int = 0,
+        taunt: bool = False,
+        divine_shield: bool = False,
+        charge: bool = False,
+        poisonous: bool = False,
+        battlecry: dict | None = None,
+        deathrattle: dict | None = None,
+        card_id: int | None = None,
+    ) -> None:
+        self.name = name
+        self.atk = atk
+        self.hp = hp
+        self.max_hp = hp if max_hp is None else max_hp
+        self.can_attack = can_attack
+        self.turns_on_board = turns_on_board
+        self.taunt = taunt
+        self.divine_shield = divine_shield
+        self.charge = charge
+        self.poisonous = poisonous
+        self.battlecry = battlecry
+        self.deathrattle = deathrattle
+        self.card_id = CARD_IDS.get(name) if card_id is None else card_id
+
+    @classmethod
+    def from_card(cls, cid: int) -> Minion:
+        """Summon a fresh minion from the compiled card table."""
+        kw = CARD_KEYWORDS[cid]
+        entry = CARD_ENTRIES[cid]
+        return cls(
+            CARD_NAMES[cid], CARD_ATK[cid], CARD_HP[cid],
+            can_attack=bool(kw & KW_CHARGE),
+            taunt=bool(kw & KW_TAUNT),
+            divine_shield=bool(kw & KW_DIVINE_SHIELD),
+            charge=bool(kw & KW_CHARGE),
+            poisonous=bool(kw & KW_POISONOUS),
+            battlecry=entry.get("battlecry"),
+            deathrattle=entry.get("deathrattle"),
+            card_id=cid,
+        )
+
+    def __getitem__(self, key: str):
+        if key in self._DEFAULTS:
+            return getattr(self, key)
+        if self.card_id is not None:
+            entry = CARD_ENTRIES[self.card_id]
+            if key in entry and key not in MINION_TRAITS:
+                return entry[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> dict:
+        if self.card_id is not None:
+            entry = CARD_ENTRIES[self.card_id]
+            data = {k: v for k, v in entry.items() if k not in MINION_TRAITS}
+        else:
+            data = {"type": "minion"}
+        data["name"] = self.name
+        data["atk"] = self.atk
+        data["hp"] = self.hp
+        data["max_hp"] = self.max_hp
+        data["can_attack"] = self.can_attack
+        data["turns_on_board"] = self.turns_on_board
+        for kw in MINION_TRAITS:
+            value = getattr(self, kw)
+            if value:
+                data[kw] = value
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Minion:
+        return cls(
+            data.get("name", ""), data.get("atk", 0), data.get("hp", 0),
+            max_hp=data.get("max_hp"),
+            can_attack=bool(data.get("can_attack", False)),
+            turns_on_board=data.get("turns_on_board", 0),
+            taunt=bool(data.get("taunt", False)),
+            divine_shield=bool(data.get("divine_shield", False)),
+            charge=bool(data.get("charge", False)),
+            poisonous=bool(data.get("poisonous", False)),
+            battlecry=data.get("battlecry"),
+            deathrattle=data.get("deathrattle"),
+        )
+
+
+class PlayerState(_SlotRecord):
+    """One side of a match: hero, resources, deck, hand and board.
+
+    ``hand`` and ``deck`` hold card IDs.  The dict-style view speaks card
+    names instead: ``player["hand"]`` returns a fresh list of names and
+    assigning a list of names converts it to IDs.
+    """
+
+    __slots__ = (
+        "name", "hero_class", "hp", "max_hp", "armor", "mana", "max_mana",
+        "deck", "hand", "board", "fatigue", "hero_power_used", "weapon",
+        "hero_can_attack", "hero_attacked_this_turn", "infinite_mana",
+        "_zh_hand", "_zh_hero", "_zh_board",
+    )
+    _DEFAULTS = {
+        "name": "", "hero_class": "Mage",
+        "hp": DEFAULT_HERO_HP, "max_hp": DEFAULT_HERO_HP, "armor": 0,
+        "mana": 0, "max_mana": 0,
+        "deck": [], "hand": [], "board": [],
+        "fatigue": 0, "hero_power_used": False, "weapon": None,
+        "hero_can_attack": False, "hero_attacked_this_turn": False,
+        "infinite_mana": False,
+    }
+    _CARD_LISTS = ("deck", "hand")
+
+    def __init__(self, **fields) -> None:
+        super().__init__(**fields)
+        self._zh_hand = self._zh_hero = self._zh_board = None
+
+    def __getitem__(self, key: str):
+        if key in self._CARD_LISTS:
+            return card_names(getattr(self, key))
+        return super().__getitem__(key)
+
+    def __setitem__(self, key: str, value) -> None:
+        if key in self._CARD_LISTS:
+            value = card_ids(value)
+        super().__setitem__(key, value)
+        self._zh_hand = self._zh_hero = self._zh_board = None
+
+    def copy(self) -> PlayerState:
+        """Independent copy for search: own lists, minions and weapon."""
+        clone = super().copy()
+        clone.board = [m.copy() for m in self.board]
+        clone.weapon = dict(self.weapon) if self.weapon else None
+        return clone
+
+    def to_dict(self) -> dict:
+        data = super().to_dict()
+        data["deck"] = card_names(self.deck)
+        data["hand"] = card_names(self.hand)
+        data["board"] = [m.to_dict() for m in self.board]
+        data["weapon"] = dict(self.weapon) if self.weapon else None
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> PlayerState:
+        player = super().from_dict(data)
+        player.deck = card_ids(player.deck)
+        player.hand = card_ids(player.hand)
+        player.board = [m if isinstance(m, Minion) else Minion.from_dict(m) for m in player.board]
+        player.weapon = dict(player.weapon) if player.weapon else None
+        return player
+
+
+class GameLog:
+    """A match's log: the most recent lines in a fixed-capacity ring.
+
+    Line N of the match has sequence number N.  ``next_seq`` only ever grows,
+    so a client can ask for everything after the last line it saw.  Lines
+    pushed out of the ring wait in ``evicted`` as ``(seq, line)`` pairs until
+    the owner archives them (the server hands them to GameStore on persist).
+    """
+
+    __slots__ = ("capacity", "lines", "next_seq", "evicted")
+
+    def __init__(self, lines=(), next_seq: int | None = None, capacity: int | None = None) -> None:
+        self.capacity = capacity or GAME_LOG_CAPACITY
+        self.lines: deque[str] = deque()
+        self.evicted: list[tuple[int, str]] = []
+        lines = list(lines)
+        self.next_seq = (next_seq if next_seq is not None else len(lines)) - len(lines)
+        for line in lines:
+            self.append(line)
+
+    def append(self, line: str) -> None:
+        if len(self.lines) >= self.capacity:
+            self.evicted.append((self.first_seq, self.lines.popleft()))
+        self.lines.append(line)
+        self.next_seq += 1
+
+    @property
+    def first_seq(self) -> int:
+        """Sequence number of the oldest line still in the ring."""
+        return self.next_seq - len(self.lines)
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __repr__(self) -> str:
+        return f"GameLog(next_seq={self.next_seq}, lines={list(self.lines)!r})"
+
+    def tail(self, count: int) -> list[str]:
+        skip = max(0, len(self.lines) - count)
+        return list(itertools.islice(self.lines, skip, None))
+
+    def since(self, seq: int) -> list[str]:
+        """Ring lines with sequence number >= ``seq`` (older ones are archived)."""
+        return self.tail(self.next_seq - max(seq, self.first_seq))
+
+    def rewind(self, seq: int) -> None:
+        """Forget every line numbered ``seq`` or later (undo of lookahead)."""
+        while self.next_seq > seq and self.lines:
+            self.lines.pop()
+            self.next_seq -= 1
+        while self.next_seq > seq and self.evicted:
+            self.evicted.pop()
+            self.next_seq -= 1
+        while self.evicted and len(self.lines) < self.capacity:
+            self.lines.appendleft(self.evicted.pop()[1])
+
+    def take_evicted(self) -> list[tuple[int, str]]:
+        """Hand over the lines evicted since the last call."""
+        evicted, self.evicted = self.evicted, []
+        return evicted
+
+
+class GameState(_SlotRecord):
+    """A full match: both players plus turn, mode and log bookkeeping."""
+
+    __slots__ = (
+        "game_id", "p1", "p2", "turn_number", "is_player_turn", "mulligan_phase",
+        "player_goes_first", "ai_difficulty", "campaign_node", "boss_id",
+        "tutorial", "mode", "log", "practice", "seed", "rng_step", "event_seq",
+    )
+    _DEFAULTS = {
+        "game_id": "", "p1": None, "p2": None,
+        "turn_number": 1, "is_player_turn": True, "mulligan_phase": False,
+        "player_goes_first": True, "ai_difficulty": "normal",
+        "campaign_node": None, "boss_id": None,
+        "tutorial": False, "mode": "standard", "log": None, "practice": None,
+        "seed": None, "rng_step": 0, "event_seq": 0,
+    }
+
+    def __init__(self, **fields) -> None:
+        super().__init__(**fields)
+        if not isinstance(self.log, GameLog):
+            self.log = GameLog(self.log or ())
+
+    def next_rng(self) -> random.Random:
+        """Advance to the game's next random stream (see game_rng)."""
+        if self.seed is None:   # saved before games were seeded
+            self.seed = new_game_seed()
+        self.rng_step += 1
+        return game_rng(self.seed, self.rng_step)
+
+    def to_dict(self) -> dict:
+        data = super().to_dict()
+        data["p1"] = self.p1.to_dict()
+        data["p2"] = self.p2.to_dict()
+        data["log"] = list(self.log)
+        data["log_seq"] = self.log.next_seq
+        data["practice"] = dict(self.practice) if self.practice else None
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> GameState:
+        gs = super().from_dict(data)
+        gs.p1 = PlayerState.from_dict(gs.p1)
+        gs.p2 = PlayerState.from_dict(gs.p2)
+        if data.get("log_seq") is not None:
+            gs.log = GameLog(data.get("log") or (), data["log_seq"])
+        return gs
+
+
+# ---- Compact encoding -------------------------------------------------------
+# pack_players() flattens players into a short bytes blob for crossing a
+# process boundary: every number (hero fields, deck and hand card IDs, board
+# minion stats) goes into one int16 array ("h"), and the few strings (player and
+# weapon names, names of minions without a card ID) follow as UTF-8.  Static
+# card data never travels; it is re-read from the card table on unpack.
+
+_ENC_HEADER = struct.Struct("<HI")   # uint16 player count, uint32 payload length in bytes
+_ENC_SEP = "\x1f"
+_CLASS_INDEX = {name: i for i, name in enumerate(HERO_CLASSES)}
+
+
+def pack_players(*players: PlayerState) -> bytes:
+    ints = array("h")
+    names: list[str] = []
+    for p in players:
+        w = p.weapon
+        ints.extend((
+            _CLASS_INDEX[p.hero_class], p.hp, p.max_hp, p.armor, p.mana, p.max_mana, p.fatigue,
+            p.hero_power_used | p.hero_can_attack << 1 | p.hero_attacked_this_turn << 2
+            | p.infinite_mana << 3,
+            w["atk"] if w else -1, w["durability"] if w else -1,
+            len(p.deck), len(p.hand), len(p.board),
+        ))
+        ints.extend(p.deck)
+        ints.extend(p.hand)
+        names.append(p.name)
+        names.append(w["name"] if w else "")
+        for m in p.board:
+            ints.extend((
+                -1 if m.card_id is None else m.card_id, m.atk, m.hp, m.max_hp, m.turns_on_board,
+                m.can_attack | m.taunt << 1 | m.divine_shield << 2 | m.charge << 3
+                | m.poisonous << 4 | (m.battlecry is not None) << 5 | (m.deathrattle is not None) << 6,
+            ))
+            if m.card_id is None:
+                names.append(m.name)
+    body = ints.tobytes()
+    return _ENC_HEADER.pack(len(players), len(body)) + body + _ENC_SEP.join(names).encode()
+
+
+def unpack_players(data: bytes) -> list[PlayerState]:
+    count, size = _ENC_HEADER.unpack_from(data)
+    ints = array("h")
+    ints.frombytes(data[_ENC_HEADER.size:_ENC_HEADER.size + size])
+    names = iter(data[_ENC_HEADER.size + size:].decode().split(_ENC_SEP))
+    players: list[PlayerState] = []
+    pos = 0
+    for _ in range(count):
+        (cls, hp, max_hp, armor, mana, max_mana, fatigue, flags,
+         w_atk, w_dur, n_deck, n_hand, n_board) = ints[pos:pos + 13]
+        pos += 13
+        deck = ints[pos:pos + n_deck].tolist()
+        pos += n_deck
+        hand = ints[pos:pos + n_hand].tolist()
+        pos += n_hand
+        name, weapon_name = next(names), next(names)
+        board = []
+        for _ in range(n_board):
+            cid, atk, m_hp, m_max_hp, turns, m_flags = ints[pos:pos + 6]
+            pos += 6
+            entry = CARD_ENTRIES[cid] if cid >= 0 else {}
+            board.append(Minion(
+                CARD_NAMES[cid] if cid >= 0 else next(names), atk, m_hp,
+                max_hp=m_max_hp, turns_on_board=turns,
+                can_attack=bool(m_flags & 1), taunt=bool(m_flags & 2),
+                divine_shield=bool(m_flags & 4), charge=bool(m_flags & 8),
+                poisonous=bool(m_flags & 16),
+                battlecry=entry.get("battlecry") if m_flags & 32 else None,
+                deathrattle=entry.get("deathrattle") if m_flags & 64 else None,
+                card_id=cid if cid >= 0 else None,
+            ))
+        players.append(PlayerState(
+            name=name, hero_class=HERO_CLASSES[cls], hp=hp, max_hp=max_hp, armor=armor,
+            mana=mana, max_mana=max_mana, fatigue=fatigue, deck=deck, hand=hand, board=board,
+            hero_power_used=bool(flags & 1), hero_can_attack=bool(flags & 2),
+            hero_attacked_this_turn=bool(flags & 4), infinite_mana=bool(flags & 8),
+            weapon={"name": weapon_name, "atk": w_atk, "durability": w_dur} if w_atk >= 0 else None,
+        ))
+    return players
+
+
+# ---- Position hashing (Zobrist) ---------------------------------------------
+# A 64-bit position key kept alongside each PlayerState in three components
+# so the engine can update it cheaply instead of hashing the whole state:
+#   hand  - XOR of a random key per (card, copy number); draw_card and plays
+#           toggle single keys in and out.
+#   hero  - hp/armor/mana/weapon/turn flags, refreshed by the rule functions
+#           that touch them (execute_move, start_turn, fatigue in draw_card).
+#   board - each minion's stats keyed by its slot and card, refreshed by
+#           start_turn and cleanup_dead (which every move ends with).
+# Hero and board are rehashed rather than updated per field on purpose: just
+# finding what a move changed costs about as much as the rehash, so XORing
+# single fields in and out could only add to it (bench_engine.py measures it).
+# A component of None means "unknown" and is rebuilt on the next read; the
+# dict-style setters reset them.  Code that edits players through attributes
+# outside the rule functions must call rehash().  With ZOBRIST_VERIFY on, the
+# rule functions compare the incremental key against a from-scratch one.
+
+ZOBRIST_VERIFY = os.environ.get("LITSTONE_ZOBRIST_VERIFY", "").lower() in ("1", "true", "yes")
+
+_MASK64 = (1 << 64) - 1
+_zrng = random.Random(0x11757013E)   # fixed, so keys match across processes
+_Z_HAND = tuple(
+    tuple(_zrng.getrandbits(64) for _ in range(MAX_HAND_SIZE)) for _ in CARD_NAMES
+)
+_Z_SLOT = tuple(
+    tuple(_zrng.getrandbits(64) for _ in CARD_NAMES) for _ in range(MAX_BOARD_SIZE)
+)
+_Z_HERO = _zrng.getrandbits(64)
+_Z_P1_TO_MOVE = _zrng.getrandbits(64)
+del _zrng
+
+
+def _hand_hash(hand: list[int]) -> int:
+    h = 0
+    seen: dict[int, int] = {}
+    for cid in hand:
+        k = seen.get(cid, 0)
+        seen[cid] = k + 1
+        h ^= _Z_HAND[cid][k]
+    return h
+
+
+def _hero_hash(p: PlayerState) -> int:
+    w = p.weapon
+    return hash((
+        _Z_HERO, p.hp, p.max_hp, p.armor, p.mana, p.max_mana, p.fatigue,
+        p.hero_power_used, p.hero_can_attack, p.hero_attacked_this_turn, p.infinite_mana,
+        w["atk"] if w else -1, w["durability"] if w else -1,
+    )) & _MASK64
+
+
+def _board_hash(board: list[Minion]) -> int:
+    h = 0
+    for slot, m in enumerate(board):
+        cid = m.card_id if m.card_id is not None else 0
+        h ^= hash((
+            _Z_SLOT[slot][cid], m.atk, m.hp, m.max_hp, m.can_attack, m.turns_on_board,
+            m.taunt, m.divine_shield, m.charge, m.poisonous,
+            m.battlecry is not None, m.deathrattle is not None,
+        )) & _MASK64
+    return h
+
+
+def _zh_toggle_hand(player: PlayerState, cid: int, copy_number: int) -> None:
+    if player._zh_hand is not None:
+        player._zh_hand ^= _Z_HAND[cid][copy_number]
+
+
+def _zh_refresh_hero(player: PlayerState) -> None:
+    player._zh_hero = _hero_hash(player)
+
+
+def _zh_refresh_board(player: PlayerState) -> None:
+    player._zh_board = _board_hash(player.board)
+
+
+def _zh_verify(player: PlayerState) -> None:
+    """Raise if any known hash component disagrees with a fresh one."""
+    for cached, fresh, part in (
+        (player._zh_hand, _hand_hash(player.hand), "hand"),
+        (player._zh_hero, _hero_hash(player), "hero"),
+        (player._zh_board, _board_hash(player.board), "board"),
+    ):
+        if cached is not None and cached != fresh:
+            raise RuntimeError(f"Zobrist {part} hash drifted for {player.name!r}")
+
+
+def rehash(player: PlayerState) -> None:
+    """Rebuild a player's hash after editing it outside the rule functions."""
+    player._zh_hand = _hand_hash(player.hand)
+    player._zh_hero = _hero_hash(player)
+    player._zh_board = _board_hash(player.board)
+
+
+def player_hash(player: PlayerState) -> int:
+    if player._zh_hand is None or player._zh_hero is None or player._zh_board is None:
+        rehash(player)
+    elif ZOBRIST_VERIFY:
+        _zh_verify(player)
+    return player._zh_hand ^ player._zh_hero ^ player._zh_board
+
+
+def zobrist_hash(state: GameState) -> int:
+    """64-bit key for a position: both hands, boards, heroes and side to move."""
+    h2 = player_hash(state.p2)
+    h = player_hash(state.p1) ^ ((h2 << 1 | h2 >> 63) & _MASK64)
+    return h ^ _Z_P1_TO_MOVE if state.is_player_turn else h
+
+
+# ---------------------------------------------------------------------------
+# 3. STATE INITIALISATION
 # ---------------------------------------------------------------------------
 
 def clamp_practice_hp(value, default: int = 30) -> int:
@@ -579,107 +1375,99 @@ def clamp_practice_hp(value, default: int = 30) -> int:
     return max(1, min(60, hp))
 
 
-def apply_practice_options(player: dict, *, hp: int, infinite_mana: bool = False) -> None:
+def apply_practice_options(player: PlayerState, *, hp: int, infinite_mana: bool = False) -> None:
     """Apply practice-mode sandbox flags to a player."""
-    player["hp"] = clamp_practice_hp(hp)
-    player["max_hp"] = player["hp"]
+    player.hp = clamp_practice_hp(hp)
+    player.max_hp = player.hp
     if infinite_mana:
-        player["infinite_mana"] = True
-        player["max_mana"] = MAX_MANA
-        player["mana"] = MAX_MANA
+        player.infinite_mana = True
+        player.max_mana = MAX_MANA
+        player.mana = MAX_MANA
 
 
-def refresh_infinite_mana(player: dict) -> None:
-    if player.get("infinite_mana"):
-        player["max_mana"] = MAX_MANA
-        player["mana"] = MAX_MANA
+def refresh_infinite_mana(player: PlayerState) -> None:
+    if player.infinite_mana:
+        player.max_mana = MAX_MANA
+        player.mana = MAX_MANA
 
 
-def effective_mana(player: dict) -> int:
-    return MAX_MANA if player.get("infinite_mana") else player["mana"]
+def effective_mana(player: PlayerState) -> int:
+    return MAX_MANA if player.infinite_mana else player.mana
 
 
-def clamp_heal(player: dict, amount: int) -> int:
+def clamp_heal(player: PlayerState, amount: int) -> int:
     """Heal amount capped by hero max_hp."""
-    cap = player.get("max_hp", DEFAULT_HERO_HP)
-    return max(0, min(amount, cap - player["hp"]))
+    return max(0, min(amount, player.max_hp - player.hp))
 
 
 def create_player(name: str, hero_class: str = "Mage",
-                  custom_deck: list | None = None, shuffle: bool = True) -> dict:
+                  custom_deck: list | None = None, shuffle: bool = True,
+                  *, rng: random.Random | None = None) -> PlayerState:
+    rng = rng or active_rng()
     if custom_deck is not None:
-        deck = custom_deck.copy()
+        deck = card_ids(custom_deck)
     else:
-        deck = build_curved_ai_deck(hero_class)
+        deck = card_ids(build_curved_ai_deck(hero_class, rng=rng))
     if shuffle:
-        random.shuffle(deck)
-    return {
-        "name":            name,
-        "hero_class":      hero_class,
-        "hp":              DEFAULT_HERO_HP,
-        "max_hp":          DEFAULT_HERO_HP,
-        "armor":           0,
-        "mana":            0,
-        "max_mana":        0,
-        "deck":            deck,
-        "hand":            [],
-        "board":           [],
-        "fatigue":         0,
-        "hero_power_used": False,
-        "weapon":          None,
-        "hero_can_attack": False,
-        "hero_attacked_this_turn": False,
-    }
+        rng.shuffle(deck)
+    return PlayerState(name=name, hero_class=hero_class, deck=deck)
 
 
-def draw_card(player: dict, on_event=None) -> None:
-    if player["deck"]:
-        if len(player["hand"]) < MAX_HAND_SIZE:
-            player["hand"].append(player["deck"].pop(0))
+def draw_card(player: PlayerState, on_event=None) -> None:
+    if player.deck:
+        if len(player.hand) < MAX_HAND_SIZE:
+            cid = player.deck.pop(0)
+            _zh_toggle_hand(player, cid, player.hand.count(cid))
+            player.hand.append(cid)
         else:
-            burned = player["deck"].pop(0)
-            log_action(f"{player['name']}'s hand is full! {burned} is burned.")
+            burned = player.deck.pop(0)
+            log_action("%s's hand is full! %s is burned.", player.name, CARD_NAMES[burned])
     else:
-        player["fatigue"] += 1
-        damage_hero(player, player["fatigue"])
-        log_action(f"FATIGUE! {player['name']} takes {player['fatigue']} damage.")
+        player.fatigue += 1
+        damage_hero(player, player.fatigue)
+        _zh_refresh_hero(player)
+        log_action("FATIGUE! %s takes %s damage.", player.name, player.fatigue)
         if on_event:
-            on_event("damage", player, "hero", player["fatigue"])
+            on_event("damage", player, "hero", player.fatigue)
 
 
-def start_turn(player: dict, on_event=None, *, draw: bool = True) -> None:
+def start_turn(player: PlayerState, on_event=None, *, draw: bool = True) -> None:
     refresh_infinite_mana(player)
-    if not player.get("infinite_mana"):
-        if player["max_mana"] < MAX_MANA:
-            player["max_mana"] += 1
-        player["mana"] = player["max_mana"]
-    player["hero_power_used"] = False
-    player["hero_attacked_this_turn"] = False
-    player["hero_can_attack"] = bool(player["weapon"])
-    for m in player["board"]:
-        m["can_attack"] = True
-        m["turns_on_board"] = m.get("turns_on_board", 0) + 1
+    if not player.infinite_mana:
+        if player.max_mana < MAX_MANA:
+            player.max_mana += 1
+        player.mana = player.max_mana
+    player.hero_power_used = False
+    player.hero_attacked_this_turn = False
+    player.hero_can_attack = bool(player.weapon)
+    for m in player.board:
+        m.can_attack = True
+        m.turns_on_board += 1
+    _zh_refresh_hero(player)
+    _zh_refresh_board(player)
     if draw:
         draw_card(player, on_event)
+    if ZOBRIST_VERIFY:
+        _zh_verify(player)
 
 
-def give_coin(player: dict) -> None:
+def give_coin(player: PlayerState) -> None:
     """Grant The Coin to the player going second."""
-    player["hand"].append(COIN_CARD)
-    log_action(f"{player['name']} receives {COIN_CARD}!")
+    _zh_toggle_hand(player, COIN_ID, player.hand.count(COIN_ID))
+    player.hand.append(COIN_ID)
+    log_action("%s receives %s!", player.name, COIN_CARD)
 
 
-def ai_choose_mulligan(player: dict) -> list[int]:
+def ai_choose_mulligan(player: PlayerState) -> list[int]:
     """Heuristic mulligan: keep early curve, replace expensive dead cards."""
     swap: list[int] = []
     costs: list[int] = []
-    for i, card_name in enumerate(player["hand"]):
-        card = CARD_DB[card_name]
-        cost = card.get("cost", 0)
+    for i, cid in enumerate(player.hand):
+        cost = CARD_COST[cid]
         costs.append(cost)
         if cost >= 5:
             swap.append(i)
-        elif cost == 4 and len(player["hand"]) >= 4:
+        elif cost == 4 and len(player.hand) >= 4:
             swap.append(i)
 
     kept = [c for j, c in enumerate(costs) if j not in swap]
@@ -697,18 +1485,18 @@ def ai_choose_mulligan(player: dict) -> list[int]:
     return sorted(set(swap))
 
 
-def ai_do_mulligan(player: dict) -> list[int]:
+def ai_do_mulligan(player: PlayerState, *, rng: random.Random | None = None) -> list[int]:
     """Run the AI mulligan and return swapped indices."""
     indices = ai_choose_mulligan(player)
     if indices:
-        log_action(f"{player['name']} mulligans {len(indices)} card(s).")
-        do_mulligan(player, indices)
+        log_action("%s mulligans %s card(s).", player.name, len(indices))
+        do_mulligan(player, indices, rng=rng)
     else:
-        log_action(f"{player['name']} keeps their opening hand.")
+        log_action("%s keeps their opening hand.", player.name)
     return indices
 
 
-def do_mulligan(player: dict, swap_indices: list) -> None:
+def do_mulligan(player: PlayerState, swap_indices: list, *, rng: random.Random | None = None) -> None:
     """Swap selected hand cards back into the deck and draw replacements.
 
     Replacement cards are drawn first (from the existing deck), then the
@@ -718,436 +1506,737 @@ def do_mulligan(player: dict, swap_indices: list) -> None:
     """
     if not swap_indices:
         return
+    rng = rng or active_rng()
+    player._zh_hand = None
     # Gather cards to swap (removing from hand in reverse-index order)
     to_swap = []
     for i in sorted(set(swap_indices), reverse=True):
-        if 0 <= i < len(player["hand"]):
-            to_swap.append(player["hand"].pop(i))
+        if 0 <= i < len(player.hand):
+            to_swap.append(player.hand.pop(i))
     # Draw replacements BEFORE returning the swapped cards so they cannot
     # appear in the replacement draws.
     for _ in range(len(to_swap)):
         draw_card(player)
     # Return swapped cards to random positions in the deck
     for card in to_swap:
-        insert_pos = random.randint(0, len(player["deck"]))
-        player["deck"].insert(insert_pos, card)
+        insert_pos = rng.randint(0, len(player.deck))
+        player.deck.insert(insert_pos, card)
 
 
 # ---------------------------------------------------------------------------
-# 3. CORE RULES & LOGIC
+# 4. CORE RULES & LOGIC
 # ---------------------------------------------------------------------------
 
-def damage_hero(player: dict, amount: int) -> None:
+def damage_hero(player: PlayerState, amount: int) -> None:
     if amount <= 0:
         return
-    if player.get("armor", 0) > 0:
-        if amount <= player["armor"]:
-            player["armor"] -= amount
+    if player.armor > 0:
+        if amount <= player.armor:
+            player.armor -= amount
             return
-        amount -= player["armor"]
-        player["armor"] = 0
-    player["hp"] -= amount
+        amount -= player.armor
+        player.armor = 0
+    player.hp -= amount
 
 
-def get_valid_targets(opp: dict, is_attack: bool = True) -> list:
+def get_valid_targets(opp: PlayerState, is_attack: bool = True) -> list:
     if is_attack:
-        taunt = [i for i, m in enumerate(opp["board"]) if m.get("taunt")]
+        taunt = [i for i, m in enumerate(opp.board) if m.taunt]
         if taunt:
             return taunt
-    return ["hero"] + list(range(len(opp["board"])))
+    return ["hero"] + list(range(len(opp.board)))
+
+
+# ---- Effect registry --------------------------------------------------------
+# Spells, battlecries, deathrattles and hero powers are looked up by effect
+# code (or hero class) in the tables below, so get_legal_moves, execute_move
+# and evaluate_ai_move dispatch in O(1).  A new effect plugs in by adding one
+# entry that says how it picks targets, how it resolves and how the AI scores
+# it.
+#
+#   targets(player, opp) -> list of move targets (None = untargeted)
+#   apply(player, opp, target, val, notify, on_event) -> False if the target
+#       is invalid and the card is wasted, else None
+#   score(p2, p1, target, val) -> AI score contribution
+
+class SpellEffect(NamedTuple):
+    targets: Callable
+    apply: Callable
+    score: Callable
+
+
+class HeroPower(NamedTuple):
+    """Like SpellEffect, but apply/score receive no ``val``."""
+    name: str
+    targets: Callable
+    apply: Callable
+    score: Callable
+
+
+def _untargeted(player: PlayerState, opp: PlayerState) -> list:
+    return [None]
+
+
+def _if_board_has_room(player: PlayerState, opp: PlayerState) -> list:
+    return [None] if len(player.board) < MAX_BOARD_SIZE else []
+
+
+def _any_character(player: PlayerState, opp: PlayerState) -> list:
+    return get_valid_targets(opp, is_attack=False)
+
+
+def _friendly_minion(player: PlayerState, opp: PlayerState) -> list:
+    return list(range(len(player.board)))
+
+
+def _enemy_minion(player: PlayerState, opp: PlayerState) -> list:
+    return list(range(len(opp.board)))
+
+
+def _friendly_character(player: PlayerState, opp: PlayerState) -> list:
+    return ["hero"] + list(range(len(player.board)))
+
+
+def _damage_minion(owner: PlayerState, index: int, amount: int, notify) -> bool:
+    """Deal spell / power damage to a minion, honouring Divine Shield.
+
+    Returns True if the shield absorbed the hit.
+    """
+    tm = owner.board[index]
+    if tm.divine_shield and amount > 0:
+        tm.divine_shield = False
+        notify("blocked", owner, index, "BLOCKED!")
+        return True
+    tm.hp -= amount
+    notify("damage", owner, index, amount)
+    return False
+
+
+def _apply_coin(player, opp, target, val, notify, on_event):
+    player.mana += val
+    log_action("   %s gains %s mana this turn!", player.name, val)
+    notify("heal", player, "hero", 0)
+
+
+def _score_coin(p2, p1, target, val):
+    unspent = p2.mana
+    playable_costs = [CARD_COST[c] for c in p2.hand if CARD_COST[c] > unspent]
+    return 3 if playable_costs else -2
+
+
+def _apply_heal(player, opp, target, val, notify, on_event):
+    amt = clamp_heal(player, val)
+    player.hp += amt
+    log_action("   %s heals for %s HP.", player.name, amt)
+    notify("heal", player, "hero", amt)
+
+
+def _score_heal(p2, p1, target, val):
+    effective_heal = min(val, _hero_missing_hp(p2))
+    return effective_heal if effective_heal > 0 else -3
+
+
+def _apply_draw(player, opp, target, val, notify, on_event):
+    log_action("   %s draws %s cards!", player.name, val)
+    for _ in range(val):
+        draw_card(player, on_event)
+
+
+def _score_draw(p2, p1, target, val):
+    return val * 4 if len(p2.hand) < 9 else -10
+
+
+def _apply_damage_all(player, opp, target, val, notify, on_event):
+    log_action("   Deals %s damage to all enemy minions!", val)
+    for i, tm in enumerate(opp.board):
+        if _damage_minion(opp, i, val, notify):
+            log_action("   Divine Shield protects %s!", tm.name)
+        else:
+            log_action("   %s takes %s damage.", tm.name, val)
+
+
+def _score_damage_all(p2, p1, target, val):
+    hits = sum(5 if m.hp <= val else 1 for m in p1.board)
+    return hits * 2 if hits else -10
+
+
+def _apply_buff(player, opp, target, val, notify, on_event):
+    if target is None or not (0 <= target < len(player.board)):
+        return False
+    tm = player.board[target]
+    tm.max_hp += val[1]
+    tm.atk    += val[0]
+    tm.hp     += val[1]
+    log_action("   %s buffs %s by +%s/+%s!", player.name, tm.name, val[0], val[1])
+    notify("heal", player, target, val[1])
+
+
+def _score_buff(p2, p1, target, val):
+    score = sum(val) * 2
+    tm = p2.board[target]
+    if tm.can_attack: score += val[0] * 3
+    if tm.hp > 2:     score += 2
+    return score
+
+
+def _apply_damage(player, opp, target, val, notify, on_event):
+    if target == "hero":
+        damage_hero(opp, val)
+        log_action("   Deals %s damage to %s!", val, opp.name)
+        notify("damage", opp, "hero", val)
+    elif _damage_minion(opp, target, val, notify):
+        log_action("   Divine Shield protects %s!", opp.board[target].name)
+    else:
+        log_action("   Deals %s damage to %s.", val, opp.board[target].name)
+
+
+def _score_damage(p2, p1, target, val):
+    if target != "hero":
+        tm = p1.board[target]
+        if tm.divine_shield: return 3
+        if tm.hp <= val:     return 6
+        return 2
+    return (1000 if p1.hp + p1.armor <= val else 0) + 1
+
+
+def _apply_buff_all(player, opp, target, val, notify, on_event):
+    log_action("   %s rallies all minions with +%s/+%s!", player.name, val[0], val[1])
+    for i, tm in enumerate(player.board):
+        tm.max_hp += val[1]
+        tm.atk    += val[0]
+        tm.hp     += val[1]
+        notify("heal", player, i, val[1])
+
+
+def _score_buff_all(p2, p1, target, val):
+    n = len(p2.board)
+    return n * sum(val) if n else -8
+
+
+def _apply_heal_all(player, opp, target, val, notify, on_event):
+    log_action("   %s mends all friendly characters for %s HP!", player.name, val)
+    amt_hero = clamp_heal(player, val)
+    player.hp += amt_hero
+    if amt_hero:
+        notify("heal", player, "hero", amt_hero)
+    for i, tm in enumerate(player.board):
+        amt = max(0, min(val, tm.max_hp - tm.hp))
+        tm.hp += amt
+        if amt:
+            notify("heal", player, i, amt)
+
+
+def _score_heal_all(p2, p1, target, val):
+    score = 3 if _hero_missing_hp(p2) >= 10 else 0
+    return score + sum(min(val, m.max_hp - m.hp) for m in p2.board)
+
+
+def _apply_add_shield(player, opp, target, val, notify, on_event):
+    if target is None or not (0 <= target < len(player.board)):
+        return False
+    tm = player.board[target]
+    tm.divine_shield = True
+    log_action("   %s grants Divine Shield to %s!", player.name, tm.name)
+    notify("heal", player, target, 0)
+
+
+def _score_add_shield(p2, p1, target, val):
+    tm = p2.board[target]
+    return tm.atk * 2 if tm.can_attack else tm.hp
+
+
+def _apply_silence(player, opp, target, val, notify, on_event):
+    if target is None or not (0 <= target < len(opp.board)):
+        return False
+    tm = opp.board[target]
+    if tm.charge and tm.turns_on_board == 0:
+        tm.can_attack = False
+    for kw in MINION_TRAITS:
+        tm.pop(kw, None)
+    log_action("   [SILENCE] %s is silenced! All effects removed.", tm.name)
+    notify("blocked", opp, target, "SILENCED!")
+
+
+def _score_silence(p2, p1, target, val):
+    if not 0 <= target < len(p1.board):
+        return 0
+    tm = p1.board[target]
+    kw_count = sum(1 for kw in ("taunt", "divine_shield", "poisonous", "deathrattle")
+                   if getattr(tm, kw))
+    score = kw_count * 6
+    if tm.taunt:         score += 4   # removing taunt opens up better targets
+    if tm.divine_shield: score += 4
+    return score
+
+
+SPELL_EFFECTS: dict[int, SpellEffect] = {
+    EFFECT_COIN:       SpellEffect(_untargeted, _apply_coin, _score_coin),
+    EFFECT_HEAL:       SpellEffect(_untargeted, _apply_heal, _score_heal),
+    EFFECT_DRAW:       SpellEffect(_untargeted, _apply_draw, _score_draw),
+    EFFECT_DAMAGE_ALL: SpellEffect(_untargeted, _apply_damage_all, _score_damage_all),
+    EFFECT_BUFF:       SpellEffect(_friendly_minion, _apply_buff, _score_buff),
+    EFFECT_DAMAGE:     SpellEffect(_any_character, _apply_damage, _score_damage),
+    EFFECT_BUFF_ALL:   SpellEffect(_untargeted, _apply_buff_all, _score_buff_all),
+    EFFECT_HEAL_ALL:   SpellEffect(_untargeted, _apply_heal_all, _score_heal_all),
+    EFFECT_ADD_SHIELD: SpellEffect(_friendly_minion, _apply_add_shield, _score_add_shield),
+    EFFECT_SILENCE:    SpellEffect(_enemy_minion, _apply_silence, _score_silence),
+}
+
+
+def _apply_heal_hero_battlecry(player, opp, target, val, notify, on_event):
+    amt = clamp_heal(player, val)
+    player.hp += amt
+    log_action("   [B.CRY] Battlecry: Heals hero for %s!", amt)
+    notify("heal", player, "hero", amt)
+
+
+def _score_heal_hero_battlecry(p2, p1, target, val):
+    return 3 if p2.hp < 25 else 0
+
+
+def _apply_draw_cards_battlecry(player, opp, target, val, notify, on_event):
+    log_action("   [B.CRY] Battlecry: %s draws %s card(s)!", player.name, val)
+    for _ in range(val):
+        draw_card(player, on_event)
+
+
+def _score_nothing(*args) -> int:
+    return 0
+
+
+BATTLECRY_EFFECTS: dict[int, SpellEffect] = {
+    EFFECT_HEAL_HERO:  SpellEffect(_untargeted, _apply_heal_hero_battlecry, _score_heal_hero_battlecry),
+    EFFECT_DRAW_CARDS: SpellEffect(_untargeted, _apply_draw_cards_battlecry, _score_nothing),
+}
+
+
+def _dmg_hero_deathrattle(minion: Minion, owner: PlayerState, enemy: PlayerState, val: int, on_event) -> None:
+    damage_hero(enemy, val)
+    log_action("   [D.RATTLE] %s Deathrattle: Deals %s dmg to %s!", minion.name, val, enemy.name)
+    if on_event:
+        on_event("damage", enemy, "hero", val)
+
+
+# Deathrattles resolve as (minion, owner, enemy, val, on_event).
+DEATHRATTLE_EFFECTS: dict[int, Callable] = {
+    EFFECT_DMG_HERO: _dmg_hero_deathrattle,
+}
+
+
+def _armor_up(player, opp, target, notify):
+    player.armor += 2
+    log_action(">> %s uses Armor Up! Gains 2 Armor.", player.name)
+    notify("armor", player, "hero", 2)
+
+
+def _score_armor_up(p2, p1, target):
+    missing = _hero_missing_hp(p2)
+    if missing == 0 and p2.armor >= 8:
+        return -8
+    if missing == 0:
+        return -3
+    return min(4, missing)
+
+
+def _fireblast(player, opp, target, notify):
+    if target == "hero":
+        damage_hero(opp, 1)
+        log_action(">> %s uses Fireblast! Deals 1 damage to %s.", player.name, opp.name)
+        notify("damage", opp, "hero", 1)
+    elif _damage_minion(opp, target, 1, notify):
+        log_action(">> %s uses Fireblast! Divine Shield blocks it.", player.name)
+    else:
+        log_action(">> %s uses Fireblast! Deals 1 damage to %s.", player.name, opp.board[target].name)
 
 
-def get_legal_moves(player: dict, opp: dict) -> list:
-    if player["hp"] <= 0 or opp["hp"] <= 0:
+def _score_fireblast(p2, p1, target):
+    if target != "hero":
+        tm = p1.board[target]
+        if tm.divine_shield: return 4
+        if tm.hp == 1:       return 12
+        return 1
+    return (1000 if p1.hp + p1.armor <= 1 else 0) + 1
+
+
+def _lesser_heal(player, opp, target, notify):
+    if target == "hero":
+        amt = clamp_heal(player, 2)
+        player.hp += amt
+        log_action(">> %s uses Lesser Heal! Restores %s HP to %s.", player.name, amt, player.name)
+        notify("heal", player, "hero", amt)
+    else:
+        tm = player.board[target]
+        amt = max(0, min(2, tm.max_hp - tm.hp))
+        tm.hp += amt
+        log_action(">> %s uses Lesser Heal! Restores %s HP to %s.", player.name, amt, tm.name)
+        notify("heal", player, target, amt)
+
+
+def _score_lesser_heal(p2, p1, target):
+    if target == "hero":
+        healable = clamp_heal(p2, 2)
+        return healable * 2 if healable > 0 else -6
+    tm = p2.board[target]
+    missing = max(0, tm.max_hp - tm.hp)
+    return min(4, missing) if missing > 0 else -5
+
+
+def _dagger_mastery(player, opp, target, notify):
+    # Equip (or refresh) a 1/2 Wicked Dagger
+    player.weapon = {"name": "Wicked Dagger", "atk": 1, "durability": 2}
+    if not player.hero_attacked_this_turn:
+        player.hero_can_attack = True
+    log_action(">> %s uses Dagger Mastery! Equipped a 1/2 Wicked Dagger.", player.name)
+    notify("armor", player, "hero", 0)
+
+
+def _score_dagger_mastery(p2, p1, target):
+    # Worth it if no weapon already
+    return 4 if not p2.weapon else -2
+
+
+def _reinforce(player, opp, target, notify):
+    # Summon a 1/1 Silver Hand Recruit
+    player.board.append(Minion.from_card(RECRUIT_ID))
+    log_action(">> %s uses Reinforce! Summons a 1/1 Silver Hand Recruit.", player.name)
+    notify("armor", player, "hero", 0)
+
+
+def _totemic_call(player, opp, target, notify):
+    totem = Minion.from_card(active_rng().choice(TOTEM_IDS))
+    player.board.append(totem)
+    log_action(">> %s uses Totemic Call! Summons %s.", player.name, totem.name)
+    notify("armor", player, "hero", 0)
+
+
+def _score_summon_power(p2, p1, target):
+    # Always decent if the board isn't full
+    return 3 if len(p2.board) < 7 else -10
+
+
+HERO_POWER_COST = 2
+HERO_POWERS: dict[str, HeroPower] = {
+    "Warrior": HeroPower("Armor Up!", _untargeted, _armor_up, _score_armor_up),
+    "Mage":    HeroPower("Fireblast", _any_character, _fireblast, _score_fireblast),
+    "Priest":  HeroPower("Lesser Heal", _friendly_character, _lesser_heal, _score_lesser_heal),
+    "Rogue":   HeroPower("Dagger Mastery", _untargeted, _dagger_mastery, _score_dagger_mastery),
+    "Paladin": HeroPower("Reinforce", _if_board_has_room, _reinforce, _score_summon_power),
+    "Shaman":  HeroPower("Totemic Call", _if_board_has_room, _totemic_call, _score_summon_power),
+}
+
+
+def _play_targets(cid: int, player: PlayerState, opp: PlayerState) -> list:
+    ctype = CARD_TYPE[cid]
+    if ctype == TYPE_SPELL:
+        return SPELL_EFFECTS[CARD_EFFECT[cid]].targets(player, opp)
+    if ctype == TYPE_MINION:
+        return _if_board_has_room(player, opp)
+    return [None]
+
+
+def get_legal_moves(player: PlayerState, opp: PlayerState) -> list:
+    if player.hp <= 0 or opp.hp <= 0:
         return []
 
     moves = []
+    mana = effective_mana(player)
 
-    for hand_idx, card_name in enumerate(player["hand"]):
-        card = CARD_DB[card_name]
-        if effective_mana(player) < card["cost"]:
+    for hand_idx, cid in enumerate(player.hand):
+        if mana < CARD_COST[cid]:
             continue
-        if card["type"] == "minion":
-            if len(player["board"]) < MAX_BOARD_SIZE:
-                moves.append(("play", hand_idx, None))
-        elif card["type"] == "spell":
-            if card["effect"] in ("heal", "draw", "damage_all", "buff_all", "heal_all", "coin"):
-                moves.append(("play", hand_idx, None))
-            elif card["effect"] == "damage":
-                for t in get_valid_targets(opp, is_attack=False):
-                    moves.append(("play", hand_idx, t))
-            elif card["effect"] in ("buff", "add_shield"):
-                for t in range(len(player["board"])):
-                    moves.append(("play", hand_idx, t))
-            elif card["effect"] == "silence":
-                for t in range(len(opp["board"])):
-                    moves.append(("play", hand_idx, t))
-        elif card["type"] == "weapon":
-            moves.append(("play", hand_idx, None))
+        for t in _play_targets(cid, player, opp):
+            moves.append(("play", hand_idx, t))
 
     valid_targets = get_valid_targets(opp, is_attack=True)
-    for bi, minion in enumerate(player["board"]):
-        if minion.get("can_attack"):
+    for bi, minion in enumerate(player.board):
+        if minion.can_attack:
             for t in valid_targets:
                 moves.append(("attack", bi, t))
 
     if (
-        player["weapon"]
-        and player["hero_can_attack"]
-        and not player.get("hero_attacked_this_turn")
+        player.weapon
+        and player.hero_can_attack
+        and not player.hero_attacked_this_turn
     ):
         for t in valid_targets:
             moves.append(("hero_attack", None, t))
 
-    if effective_mana(player) >= 2 and not player["hero_power_used"]:
-        cls = player["hero_class"]
-        if cls == "Warrior":
-            moves.append(("hero_power", None, None))
-        elif cls == "Mage":
-            for t in get_valid_targets(opp, is_attack=False):
+    if mana >= HERO_POWER_COST and not player.hero_power_used:
+        power = HERO_POWERS.get(player.hero_class)
+        if power:
+            for t in power.targets(player, opp):
                 moves.append(("hero_power", None, t))
-        elif cls == "Priest":
-            for t in ["hero"] + list(range(len(player["board"]))):
-                moves.append(("hero_power", None, t))
-        elif cls == "Rogue":
-            moves.append(("hero_power", None, None))
-        elif cls == "Paladin":
-            if len(player["board"]) < MAX_BOARD_SIZE:
-                moves.append(("hero_power", None, None))
-        elif cls == "Shaman":
-            if len(player["board"]) < MAX_BOARD_SIZE:
-                moves.append(("hero_power", None, None))
 
     return moves
 
 
-def execute_move(player: dict, opp: dict, move: tuple, on_event=None) -> None:
+def _play_card(player, opp, idx, target, notify, on_event):
+    cid = player.hand.pop(idx)
+    _zh_toggle_hand(player, cid, player.hand.count(cid))
+    card_name = CARD_NAMES[cid]
+    ctype, effect, val = CARD_TYPE[cid], CARD_EFFECT[cid], CARD_VALUE[cid]
+    if not player.infinite_mana:
+        player.mana -= CARD_COST[cid]
+    log_action(">> %s plays %s!", player.name, card_name)
+    notify("play", player, None, card_name)
+
+    if ctype == TYPE_MINION:
+        player.board.append(Minion.from_card(cid))
+        battlecry = BATTLECRY_EFFECTS.get(effect)
+        if battlecry:
+            battlecry.apply(player, opp, target, val, notify, on_event)
+
+    elif ctype == TYPE_WEAPON:
+        atk, durability = CARD_ATK[cid], CARD_DURABILITY[cid]
+        player.weapon = {"name": card_name, "atk": atk, "durability": durability}
+        if not player.hero_attacked_this_turn:
+            player.hero_can_attack = True
+        log_action("   Equipped %s (%s Atk / %s Durability).", card_name, atk, durability)
+
+    elif SPELL_EFFECTS[effect].apply(player, opp, target, val, notify, on_event) is False:
+        log_action("   [ERROR] %s target out of range — card wasted!", card_name)
+        return False
+
+
+def _minion_attack(player, opp, idx, target, notify, on_event):
+    attacker = player.board[idx]
+    attacker.can_attack = False
+
+    if target == "hero":
+        damage_hero(opp, attacker.atk)
+        log_action(">> %s attacks %s for %s damage!", attacker.name, opp.name, attacker.atk)
+        notify("damage", opp, "hero", attacker.atk)
+        return
+
+    defender = opp.board[target]
+    log_action(">> %s attacks %s for %s damage!", attacker.name, defender.name, attacker.atk)
+
+    if defender.divine_shield:
+        defender.divine_shield = False
+        log_action("   %s's Divine Shield blocks the attack!", defender.name)
+        notify("blocked", opp, target, "BLOCKED!")
+    else:
+        defender.hp -= attacker.atk
+        notify("damage", opp, target, attacker.atk)
+        if attacker.poisonous and attacker.atk > 0:
+            defender.hp = 0
+            log_action("   [POISON] Poisonous destroys %s!", defender.name)
+
+    if defender.atk > 0:
+        if attacker.divine_shield:
+            attacker.divine_shield = False
+            log_action("   %s's Divine Shield blocks retaliation!", attacker.name)
+            notify("blocked", player, idx, "BLOCKED!")
+        else:
+            attacker.hp -= defender.atk
+            notify("damage", player, idx, defender.atk)
+            log_action("   %s takes %s retaliation damage.", attacker.name, defender.atk)
+            if defender.poisonous:
+                attacker.hp = 0
+                log_action("   [POISON] Poisonous destroys %s!", attacker.name)
+
+
+def _hero_attack(player, opp, idx, target, notify, on_event):
+    player.hero_attacked_this_turn = True
+    player.hero_can_attack = False
+    weapon = player.weapon
+    w_atk  = weapon["atk"]
+
+    if target == "hero":
+        damage_hero(opp, w_atk)
+        log_action(">> %s attacks %s with %s for %s dmg!", player.name, opp.name, weapon["name"], w_atk)
+        notify("damage", opp, "hero", w_atk)
+    else:
+        defender = opp.board[target]
+        log_action(">> %s attacks %s with %s for %s damage!", player.name, defender.name, weapon["name"], w_atk)
+        if defender.divine_shield:
+            defender.divine_shield = False
+            log_action("   %s's Divine Shield blocks the attack!", defender.name)
+            notify("blocked", opp, target, "BLOCKED!")
+        else:
+            defender.hp -= w_atk
+            notify("damage", opp, target, w_atk)
+        if defender.atk > 0:
+            damage_hero(player, defender.atk)
+            notify("damage", player, "hero", defender.atk)
+            log_action("   %s's hero takes %s retaliation damage.", player.name, defender.atk)
+
+    weapon["durability"] -= 1
+    if weapon["durability"] <= 0:
+        log_action("   %s's %s breaks!", player.name, weapon["name"])
+        player.weapon = None
+
+
+def _use_hero_power(player, opp, idx, target, notify, on_event):
+    if not player.infinite_mana:
+        player.mana -= HERO_POWER_COST
+    player.hero_power_used = True
+    power = HERO_POWERS.get(player.hero_class)
+    if power:
+        power.apply(player, opp, target, notify)
+
+
+# action -> handler(player, opp, idx, target, notify, on_event); a handler
+# returns False to skip the end-of-move mana refresh (wasted card).
+MOVE_HANDLERS: dict[str, Callable] = {
+    "play":        _play_card,
+    "attack":      _minion_attack,
+    "hero_attack": _hero_attack,
+    "hero_power":  _use_hero_power,
+}
+
+
+def execute_move(player: PlayerState, opp: PlayerState, move: tuple, on_event=None) -> None:
     action, idx, target = move
 
     def notify(e_type, tp, ti, amt):
         if on_event:
             on_event(e_type, tp, ti, amt)
 
-    # ---- PLAY ---------------------------------------------------------------
-    if action == "play":
-        card_name = player["hand"].pop(idx)
-        card = CARD_DB[card_name]
-        if not player.get("infinite_mana"):
-            player["mana"] -= card["cost"]
-        log_action(f">> {player['name']} plays {card_name}!")
-        notify("play", player, None, card_name)
-
-        if card["type"] == "minion":
-            minion = card.copy()
-            minion["name"]       = card_name
-            minion["max_hp"]     = card["hp"]
-            minion["can_attack"] = card.get("charge", False)
-            minion["turns_on_board"] = 0
-            player["board"].append(minion)
-            if "battlecry" in card:
-                bc = card["battlecry"]
-                if bc["effect"] == "heal_hero":
-                    amt = clamp_heal(player, bc["val"])
-                    player["hp"] += amt
-                    log_action(f"   [B.CRY] Battlecry: Heals hero for {amt}!")
-                    notify("heal", player, "hero", amt)
-                elif bc["effect"] == "draw_cards":
-                    log_action(f"   [B.CRY] Battlecry: {player['name']} draws {bc['val']} card(s)!")
-                    for _ in range(bc["val"]):
-                        draw_card(player, on_event)
-
-        elif card["type"] == "weapon":
-            player["weapon"] = {"name": card_name, "atk": card["atk"],
-                                 "durability": card["durability"]}
-            if not player.get("hero_attacked_this_turn"):
-                player["hero_can_attack"] = True
-            log_action(f"   Equipped {card_name} ({card['atk']} Atk / {card['durability']} Durability).")
-
-        elif card["type"] == "spell":
-            if card["effect"] == "coin":
-                player["mana"] += card["val"]
-                log_action(f"   {player['name']} gains {card['val']} mana this turn!")
-                notify("heal", player, "hero", 0)
-
-            elif card["effect"] == "heal":
-                amt = clamp_heal(player, card["val"])
-                player["hp"] += amt
-                log_action(f"   {player['name']} heals for {amt} HP.")
-                notify("heal", player, "hero", amt)
-
-            elif card["effect"] == "draw":
-                log_action(f"   {player['name']} draws {card['val']} cards!")
-                for _ in range(card["val"]):
-                    draw_card(player, on_event)
-
-            elif card["effect"] == "damage_all":
-                log_action(f"   Deals {card['val']} damage to all enemy minions!")
-                for i, tm in enumerate(opp["board"]):
-                    if tm.get("divine_shield") and card["val"] > 0:
-                        tm["divine_shield"] = False
-                        log_action(f"   Divine Shield protects {tm['name']}!")
-                        notify("blocked", opp, i, "BLOCKED!")
-                    else:
-                        tm["hp"] -= card["val"]
-                        log_action(f"   {tm['name']} takes {card['val']} damage.")
-                        notify("damage", opp, i, card["val"])
-
-            elif card["effect"] == "buff":
-                if target is None or not (0 <= target < len(player["board"])):
-                    log_action(f"   [ERROR] {card_name} target out of range — card wasted!")
-                    cleanup_dead(player, opp, on_event)
-                    return
-                tm = player["board"][target]
-                tm["max_hp"]  = tm.get("max_hp", tm["hp"]) + card["val"][1]
-                tm["atk"]    += card["val"][0]
-                tm["hp"]     += card["val"][1]
-                log_action(f"   {player['name']} buffs {tm['name']} by +{card['val'][0]}/+{card['val'][1]}!")
-                notify("heal", player, target, card["val"][1])
-
-            elif card["effect"] == "damage":
-                if target == "hero":
-                    damage_hero(opp, card["val"])
-                    log_action(f"   Deals {card['val']} damage to {opp['name']}!")
-                    notify("damage", opp, "hero", card["val"])
-                else:
-                    tm = opp["board"][target]
-                    if tm.get("divine_shield") and card["val"] > 0:
-                        tm["divine_shield"] = False
-                        log_action(f"   Divine Shield protects {tm['name']}!")
-                        notify("blocked", opp, target, "BLOCKED!")
-                    else:
-                        tm["hp"] -= card["val"]
-                        log_action(f"   Deals {card['val']} damage to {tm['name']}.")
-                        notify("damage", opp, target, card["val"])
-
-            elif card["effect"] == "buff_all":
-                log_action(f"   {player['name']} rallies all minions with +{card['val'][0]}/+{card['val'][1]}!")
-                for i, tm in enumerate(player["board"]):
-                    tm["max_hp"] = tm.get("max_hp", tm["hp"]) + card["val"][1]
-                    tm["atk"]   += card["val"][0]
-                    tm["hp"]    += card["val"][1]
-                    notify("heal", player, i, card["val"][1])
-
-            elif card["effect"] == "heal_all":
-                log_action(f"   {player['name']} mends all friendly characters for {card['val']} HP!")
-                amt_hero = clamp_heal(player, card["val"])
-                player["hp"] += amt_hero
-                if amt_hero:
-                    notify("heal", player, "hero", amt_hero)
-                for i, tm in enumerate(player["board"]):
-                    max_hp = tm.get("max_hp", tm["hp"])
-                    amt = max(0, min(card["val"], max_hp - tm["hp"]))
-                    tm["hp"] += amt
-                    if amt:
-                        notify("heal", player, i, amt)
-
-            elif card["effect"] == "add_shield":
-                if target is None or not (0 <= target < len(player["board"])):
-                    log_action(f"   [ERROR] {card_name} target out of range — card wasted!")
-                    cleanup_dead(player, opp, on_event)
-                    return
-                tm = player["board"][target]
-                tm["divine_shield"] = True
-                log_action(f"   {player['name']} grants Divine Shield to {tm['name']}!")
-                notify("heal", player, target, 0)
-
-            elif card["effect"] == "silence":
-                if target is None or not (0 <= target < len(opp["board"])):
-                    log_action(f"   [ERROR] {card_name} target out of range — card wasted!")
-                    cleanup_dead(player, opp, on_event)
-                    return
-                tm = opp["board"][target]
-                if tm.get("charge") and tm.get("turns_on_board", 0) == 0:
-                    tm["can_attack"] = False
-                for kw in MINION_TRAITS:
-                    tm.pop(kw, None)
-                log_action(f"   [SILENCE] {tm['name']} is silenced! All effects removed.")
-                notify("blocked", opp, target, "SILENCED!")
-
-    # ---- ATTACK -------------------------------------------------------------
-    elif action == "attack":
-        attacker = player["board"][idx]
-        attacker["can_attack"] = False
-
-        if target == "hero":
-            damage_hero(opp, attacker["atk"])
-            log_action(f">> {attacker['name']} attacks {opp['name']} for {attacker['atk']} damage!")
-            notify("damage", opp, "hero", attacker["atk"])
-        else:
-            defender = opp["board"][target]
-            log_action(f">> {attacker['name']} attacks {defender['name']} for {attacker['atk']} damage!")
-
-            if defender.get("divine_shield"):
-                defender["divine_shield"] = False
-                log_action(f"   {defender['name']}'s Divine Shield blocks the attack!")
-                notify("blocked", opp, target, "BLOCKED!")
-            else:
-                defender["hp"] -= attacker["atk"]
-                notify("damage", opp, target, attacker["atk"])
-                if attacker.get("poisonous") and attacker["atk"] > 0:
-                    defender["hp"] = 0
-                    log_action(f"   [POISON] Poisonous destroys {defender['name']}!")
-
-            if defender["atk"] > 0:
-                if attacker.get("divine_shield"):
-                    attacker["divine_shield"] = False
-                    log_action(f"   {attacker['name']}'s Divine Shield blocks retaliation!")
-                    notify("blocked", player, idx, "BLOCKED!")
-                else:
-                    attacker["hp"] -= defender["atk"]
-                    notify("damage", player, idx, defender["atk"])
-                    log_action(f"   {attacker['name']} takes {defender['atk']} retaliation damage.")
-                    if defender.get("poisonous"):
-                        attacker["hp"] = 0
-                        log_action(f"   [POISON] Poisonous destroys {attacker['name']}!")
-
-    # ---- HERO ATTACK --------------------------------------------------------
-    elif action == "hero_attack":
-        player["hero_attacked_this_turn"] = True
-        player["hero_can_attack"] = False
-        weapon = player["weapon"]
-        w_atk  = weapon["atk"]
-
-        if target == "hero":
-            damage_hero(opp, w_atk)
-            log_action(f">> {player['name']} attacks {opp['name']} with {weapon['name']} for {w_atk} dmg!")
-            notify("damage", opp, "hero", w_atk)
-        else:
-            defender = opp["board"][target]
-            log_action(f">> {player['name']} attacks {defender['name']} with {weapon['name']} for {w_atk} damage!")
-            if defender.get("divine_shield"):
-                defender["divine_shield"] = False
-                log_action(f"   {defender['name']}'s Divine Shield blocks the attack!")
-                notify("blocked", opp, target, "BLOCKED!")
-            else:
-                defender["hp"] -= w_atk
-                notify("damage", opp, target, w_atk)
-            if defender["atk"] > 0:
-                damage_hero(player, defender["atk"])
-                notify("damage", player, "hero", defender["atk"])
-                log_action(f"   {player['name']}'s hero takes {defender['atk']} retaliation damage.")
-
-        weapon["durability"] -= 1
-        if weapon["durability"] <= 0:
-            log_action(f"   {player['name']}'s {weapon['name']} breaks!")
-            player["weapon"] = None
-
-    # ---- HERO POWER ---------------------------------------------------------
-    elif action == "hero_power":
-        if not player.get("infinite_mana"):
-            player["mana"] -= 2
-        player["hero_power_used"] = True
-        cls = player["hero_class"]
-
-        if cls == "Warrior":
-            player["armor"] += 2
-            log_action(f">> {player['name']} uses Armor Up! Gains 2 Armor.")
-            notify("armor", player, "hero", 2)
-
-        elif cls == "Mage":
-            if target == "hero":
-                damage_hero(opp, 1)
-                log_action(f">> {player['name']} uses Fireblast! Deals 1 damage to {opp['name']}.")
-                notify("damage", opp, "hero", 1)
-            else:
-                tm = opp["board"][target]
-                if tm.get("divine_shield"):
-                    tm["divine_shield"] = False
-                    log_action(f">> {player['name']} uses Fireblast! Divine Shield blocks it.")
-                    notify("blocked", opp, target, "BLOCKED!")
-                else:
-                    tm["hp"] -= 1
-                    log_action(f">> {player['name']} uses Fireblast! Deals 1 damage to {tm['name']}.")
-                    notify("damage", opp, target, 1)
-
-        elif cls == "Priest":
-            if target == "hero":
-                amt = clamp_heal(player, 2)
-                player["hp"] += amt
-                log_action(f">> {player['name']} uses Lesser Heal! Restores {amt} HP to {player['name']}.")
-                notify("heal", player, "hero", amt)
-            else:
-                tm = player["board"][target]
-                max_hp = tm.get("max_hp", tm["hp"])
-                amt = max(0, min(2, max_hp - tm["hp"]))
-                tm["hp"] += amt
-                log_action(f">> {player['name']} uses Lesser Heal! Restores {amt} HP to {tm['name']}.")
-                notify("heal", player, target, amt)
-
-        elif cls == "Rogue":
-            # Dagger Mastery: equip (or refresh) a 1/2 Wicked Dagger
-            player["weapon"] = {"name": "Wicked Dagger", "atk": 1, "durability": 2}
-            if not player.get("hero_attacked_this_turn"):
-                player["hero_can_attack"] = True
-            log_action(f">> {player['name']} uses Dagger Mastery! Equipped a 1/2 Wicked Dagger.")
-            notify("armor", player, "hero", 0)
-
-        elif cls == "Paladin":
-            # Reinforce: summon a 1/1 Silver Hand Recruit
-            recruit = {
-                "name": "Silver Hand Recruit", "type": "minion", "cost": 0,
-                "atk": 1, "hp": 1, "max_hp": 1, "can_attack": False,
-                "turns_on_board": 0, "icon": "SR",
-            }
-            player["board"].append(recruit)
-            log_action(f">> {player['name']} uses Reinforce! Summons a 1/1 Silver Hand Recruit.")
-            notify("armor", player, "hero", 0)
-
-        elif cls == "Shaman":
-            totem_tpl = random.choice(SHAMAN_TOTEMS)
-            totem = dict(totem_tpl)
-            totem["max_hp"] = totem["hp"]
-            totem["can_attack"] = False
-            totem["turns_on_board"] = 0
-            player["board"].append(totem)
-            log_action(f">> {player['name']} uses Totemic Call! Summons {totem['name']}.")
-            notify("armor", player, "hero", 0)
-
-    refresh_infinite_mana(player)
+    handler = MOVE_HANDLERS.get(action)
+    card_wasted = handler is not None and handler(player, opp, idx, target, notify, on_event) is False
+    if not card_wasted:
+        refresh_infinite_mana(player)
     cleanup_dead(player, opp, on_event)
+    _zh_refresh_hero(player)
+    _zh_refresh_hero(opp)
+    if ZOBRIST_VERIFY:
+        _zh_verify(player)
+        _zh_verify(opp)
 
 
-def cleanup_dead(player: dict, opp: dict, on_event=None) -> None:
+def cleanup_dead(player: PlayerState, opp: PlayerState, on_event=None) -> None:
     def process(owner, enemy):
         alive = []
-        for m in owner["board"]:
-            if m["hp"] > 0:
+        for m in owner.board:
+            if m.hp > 0:
                 alive.append(m)
             else:
-                log_action(f"   {m['name']} is destroyed!")
-                if "deathrattle" in m:
-                    dr = m["deathrattle"]
-                    if dr["effect"] == "dmg_hero":
-                        damage_hero(enemy, dr["val"])
-                        log_action(f"   [D.RATTLE] {m['name']} Deathrattle: Deals {dr['val']} dmg to {enemy['name']}!")
-                        if on_event:
-                            on_event("damage", enemy, "hero", dr["val"])
+                log_action("   %s is destroyed!", m.name)
+                dr = m.deathrattle
+                if dr:
+                    effect = DEATHRATTLE_EFFECTS.get(EFFECT_CODES.get(dr["effect"]))
+                    if effect:
+                        effect(m, owner, enemy, dr["val"], on_event)
         return alive
 
-    player["board"] = process(player, opp)
-    opp["board"]    = process(opp, player)
+    player.board = process(player, opp)
+    opp.board    = process(opp, player)
+    _zh_refresh_board(player)
+    _zh_refresh_board(opp)
 
 
-def check_win(p1: dict, p2: dict) -> str | None:
-    if p1["hp"] <= 0 and p2["hp"] <= 0:
+def check_win(p1: PlayerState, p2: PlayerState) -> str | None:
+    if p1.hp <= 0 and p2.hp <= 0:
         return "DRAW"
-    if p1["hp"] <= 0:
-        return p2["name"]
-    if p2["hp"] <= 0:
-        return p1["name"]
+    if p1.hp <= 0:
+        return p2.name
+    if p2.hp <= 0:
+        return p1.name
     return None
 
 
+# ---- Apply / undo for search ------------------------------------------------
+# Lookahead applies a move and rolls it back instead of deep-copying both
+# players.  The token journals only a move's footprint: both heroes' scalar
+# fields, both boards (list identity, length and every minion's stats), the
+# mover's hand and deck, both players' Zobrist components and the active log's
+# length.  The opponent's hand and deck are never touched by a move, so they
+# are not recorded.  RNG draws (Totemic Call) are not rewound.
+
+_HERO_FIELDS = (
+    "hp", "max_hp", "armor", "mana", "max_mana", "fatigue", "hero_power_used",
+    "weapon", "hero_can_attack", "hero_attacked_this_turn",
+)
+_MINION_FIELDS = (
+    "atk", "hp", "max_hp", "can_attack", "turns_on_board",
+    "taunt", "divine_shield", "charge", "poisonous", "battlecry", "deathrattle",
+)
+_get_hero_fields = attrgetter(*_HERO_FIELDS)
+_get_minion_fields = attrgetter(*_MINION_FIELDS)
+
+
+def _log_length() -> int:
+    log = _ACTIVE_LOG.get()
+    if log is None:
+        return 0
+    return log.next_seq if isinstance(log, GameLog) else len(log)
+
+
+def _truncate_log(length: int) -> None:
+    """Drop log lines written by lookahead since _log_length() was taken."""
+    log = _ACTIVE_LOG.get()
+    if isinstance(log, GameLog):
+        log.rewind(length)
+    elif log is not None:
+        del log[length:]
+
+
+class UndoToken(NamedTuple):
+    zobrist: tuple
+    heroes: tuple
+    weapon_durability: tuple
+    boards: tuple
+    minions: list
+    hand: list
+    deck: list
+    log_len: int
+
+
+def side_to_move(state: GameState) -> tuple[PlayerState, PlayerState]:
+    """(player, opp) for whoever acts next in ``state``."""
+    return (state.p1, state.p2) if state.is_player_turn else (state.p2, state.p1)
+
+
+def apply_move(state: GameState, move: tuple, on_event=None) -> UndoToken:
+    """execute_move for the side to move, returning a token for undo()."""
+    player, opp = side_to_move(state)
+    token = UndoToken(
+        (player._zh_hand, player._zh_hero, player._zh_board,
+         opp._zh_hand, opp._zh_hero, opp._zh_board),
+        (_get_hero_fields(player), _get_hero_fields(opp)),
+        tuple(p.weapon["durability"] if p.weapon else 0 for p in (player, opp)),
+        ((player.board, len(player.board)), (opp.board, len(opp.board))),
+        [(m, _get_minion_fields(m)) for m in (*player.board, *opp.board)],
+        player.hand[:],
+        player.deck[:],
+        _log_length(),
+    )
+    execute_move(player, opp, move, on_event)
+    return token
+
+
+def undo(state: GameState, token: UndoToken) -> None:
+    """Roll ``state`` back to before the apply_move() that produced ``token``."""
+    player, opp = side_to_move(state)
+    for p, values, durability, (board, size) in zip(
+        (player, opp), token.heroes, token.weapon_durability, token.boards
+    ):
+        for field, value in zip(_HERO_FIELDS, values):
+            setattr(p, field, value)
+        if p.weapon:
+            p.weapon["durability"] = durability
+        del board[size:]
+        p.board = board
+    for m, values in token.minions:
+        for field, value in zip(_MINION_FIELDS, values):
+            setattr(m, field, value)
+    player.hand = token.hand
+    player.deck = token.deck
+    (player._zh_hand, player._zh_hero, player._zh_board,
+     opp._zh_hand, opp._zh_hero, opp._zh_board) = token.zobrist
+    _truncate_log(token.log_len)
+
+
 # ---------------------------------------------------------------------------
-# 4. AI
+# 5. AI
 # ---------------------------------------------------------------------------
 
-def _hero_missing_hp(player: dict) -> int:
-    cap = player.get("max_hp", DEFAULT_HERO_HP)
-    return max(0, cap - player["hp"])
+def _hero_missing_hp(player: PlayerState) -> int:
+    return max(0, player.max_hp - player.hp)
 
 
-def _ai_should_pass_turn(legal: list, move: tuple, score: float, p2: dict, p1: dict) -> bool:
+def _ai_should_pass_turn(legal: list, move: tuple, score: float, p2: PlayerState, p1: PlayerState) -> bool:
     """Stop the AI turn when the chosen move is a wasteful hero power."""
     del legal, p2, p1  # signature kept for future lookahead
     if move[0] == "hero_power" and score <= 0:
@@ -1155,195 +2244,785 @@ def _ai_should_pass_turn(legal: list, move: tuple, score: float, p2: dict, p1: d
     return False
 
 
-def evaluate_ai_move(p2: dict, p1: dict, move: tuple) -> float:
+def _play_base_score(p2: PlayerState, cid: int) -> float:
+    """The target-independent part of _score_play."""
+    ctype = CARD_TYPE[cid]
+    score = CARD_COST[cid] * 2
+    if ctype == TYPE_MINION:
+        score += 3
+        kw = CARD_KEYWORDS[cid]
+        if kw & KW_POISONOUS: score += 2
+        if kw & KW_CHARGE:    score += 2
+    elif ctype == TYPE_WEAPON:
+        score += CARD_ATK[cid] * 2 if not p2.weapon else -4
+    return score
+
+
+def _score_play(p2: PlayerState, p1: PlayerState, idx: int, target) -> float:
+    cid = p2.hand[idx]
+    ctype, effect, val = CARD_TYPE[cid], CARD_EFFECT[cid], CARD_VALUE[cid]
+    score = _play_base_score(p2, cid)
+
+    if ctype == TYPE_MINION:
+        battlecry = BATTLECRY_EFFECTS.get(effect)
+        if battlecry:
+            score += battlecry.score(p2, p1, target, val)
+    elif ctype != TYPE_WEAPON:
+        score += SPELL_EFFECTS[effect].score(p2, p1, target, val)
+    return score
+
+
+def _trade_score(attacker: Minion, defender: Minion, ready_atk: int) -> int:
+    """Score a minion attacking a minion; ready_atk is p2's total ready attack."""
+    atk_dmg = 0 if defender.divine_shield else attacker.atk
+    if atk_dmg > 0 and attacker.poisonous: atk_dmg = defender.hp
+    def_dmg = 0 if attacker.divine_shield else defender.atk
+    if def_dmg > 0 and defender.poisonous: def_dmg = attacker.hp
+
+    score = 4 if defender.taunt and ready_atk > attacker.atk else 0
+    if def_dmg < attacker.hp and atk_dmg >= defender.hp: return score + 15
+    if atk_dmg >= defender.hp:                           return score + 5
+    return score - 5
+
+
+def _score_attack(p2: PlayerState, p1: PlayerState, idx: int, target) -> float:
+    attacker = p2.board[idx]
+    if target == "hero":
+        return (1000 if p1.hp + p1.armor <= attacker.atk else 0) + attacker.atk
+    ready_atk = sum(m.atk for m in p2.board if m.can_attack)
+    return _trade_score(attacker, p1.board[target], ready_atk)
+
+
+def _score_hero_attack(p2: PlayerState, p1: PlayerState, idx, target) -> float:
+    w_atk = p2.weapon["atk"]
+    if target == "hero":
+        return (1000 if p1.hp + p1.armor <= w_atk else 0) + w_atk
+
+    defender = p1.board[target]
+    atk_dmg = 0 if defender.divine_shield else w_atk
+    def_dmg = defender.atk
+    if def_dmg >= p2.hp + p2.armor:
+        return -1000
+    if atk_dmg >= defender.hp:
+        return 6 - def_dmg
+    return -5
+
+
+def _score_hero_power(p2: PlayerState, p1: PlayerState, idx, target) -> float:
+    power = HERO_POWERS.get(p2.hero_class)
+    return power.score(p2, p1, target) if power else 0
+
+
+# action -> scorer(p2, p1, idx, target), mirroring MOVE_HANDLERS.
+MOVE_SCORERS: dict[str, Callable] = {
+    "play":        _score_play,
+    "attack":      _score_attack,
+    "hero_attack": _score_hero_attack,
+    "hero_power":  _score_hero_power,
+}
+
+
+_STOCK_MOVE_SCORERS = dict(MOVE_SCORERS)
+
+
+def evaluate_ai_move(p2: PlayerState, p1: PlayerState, move: tuple) -> float:
     action, idx, target = move
-    score = 0.0
+    scorer = MOVE_SCORERS.get(action)
+    return 0.0 + scorer(p2, p1, idx, target) if scorer else 0.0
+
+
+# ---- Batch scoring ------------------------------------------------------------
+# evaluate_ai_moves() scores a whole legal-move list in one pass and returns
+# exactly what evaluate_ai_move() would for each move.  State features shared
+# by every move (opponent effective HP, ready attack total, the per-card part
+# of a play's score) are computed once and the common actions are scored
+# inline instead of through per-move dispatch.  With NumPy installed, large
+# batches score their minion-vs-minion trades as arrays.  If a MOVE_SCORERS
+# entry has been replaced the batch falls back to per-move scoring, so
+# registry overrides behave the same.
+
+try:
+    import numpy as np
+except ImportError:  # optional: trades are scored in pure Python instead
+    np = None
+
+_NUMPY_MIN_TRADES = 24
+
+
+def _trade_scores_numpy(pairs: list[tuple[Minion, Minion]], ready_atk: int) -> list[int]:
+    a_atk, a_hp, a_ds, a_pois, d_atk, d_hp, d_ds, d_pois, d_taunt = np.array(
+        [(a.atk, a.hp, a.divine_shield, a.poisonous,
+          d.atk, d.hp, d.divine_shield, d.poisonous, d.taunt) for a, d in pairs],
+        dtype=np.int64,
+    ).T
+    atk_dmg = np.where(d_ds != 0, 0, a_atk)
+    atk_dmg = np.where((atk_dmg > 0) & (a_pois != 0), d_hp, atk_dmg)
+    def_dmg = np.where(a_ds != 0, 0, d_atk)
+    def_dmg = np.where((def_dmg > 0) & (d_pois != 0), a_hp, def_dmg)
+    kills = atk_dmg >= d_hp
+    score = np.where((d_taunt != 0) & (ready_atk > a_atk), 4, 0)
+    score += np.where(kills & (def_dmg < a_hp), 15, np.where(kills, 5, -5))
+    return score.tolist()
+
+
+def evaluate_ai_moves(p2: PlayerState, p1: PlayerState, moves: list) -> list[float]:
+    """[evaluate_ai_move(p2, p1, mv) for mv in moves], computed in one pass."""
+    if MOVE_SCORERS != _STOCK_MOVE_SCORERS:
+        return [evaluate_ai_move(p2, p1, mv) for mv in moves]
+
+    board, hand, enemy = p2.board, p2.hand, p1.board
+    p1_ehp = p1.hp + p1.armor
+    ready_atk = -1
+    use_numpy = np is not None and len(moves) >= _NUMPY_MIN_TRADES
+    trades: list[tuple[int, Minion, Minion]] = []
+    scores: list[float] = []
+    append = scores.append
+    base_idx, base = -1, 0
+    power = HERO_POWERS.get(p2.hero_class)
+
+    for move in moves:
+        action, idx, target = move
+        if action == "attack":
+            attacker = board[idx]
+            if target == "hero":
+                append(0.0 + (1000 if p1_ehp <= attacker.atk else 0) + attacker.atk)
+                continue
+            if ready_atk < 0:
+                ready_atk = sum(m.atk for m in board if m.can_attack)
+            if use_numpy:
+                trades.append((len(scores), attacker, enemy[target]))
+                append(0.0)
+            else:
+                append(0.0 + _trade_score(attacker, enemy[target], ready_atk))
+        elif action == "play":
+            cid = hand[idx]
+            if idx != base_idx:
+                base_idx, base = idx, _play_base_score(p2, cid)
+            ctype = CARD_TYPE[cid]
+            if ctype == TYPE_MINION:
+                battlecry = BATTLECRY_EFFECTS.get(CARD_EFFECT[cid])
+                append(0.0 + (base + battlecry.score(p2, p1, target, CARD_VALUE[cid]) if battlecry else base))
+            elif ctype == TYPE_WEAPON:
+                append(0.0 + base)
+            else:
+                append(0.0 + base + SPELL_EFFECTS[CARD_EFFECT[cid]].score(p2, p1, target, CARD_VALUE[cid]))
+        elif action == "hero_power":
+            append(0.0 + power.score(p2, p1, target) if power else 0.0)
+        elif action == "hero_attack" and target == "hero":
+            w_atk = p2.weapon["atk"]
+            append(0.0 + (1000 if p1_ehp <= w_atk else 0) + w_atk)
+        else:
+            append(evaluate_ai_move(p2, p1, move))
+
+    if trades:
+        if len(trades) >= _NUMPY_MIN_TRADES:
+            trade_scores = _trade_scores_numpy([(a, d) for _, a, d in trades], ready_atk)
+        else:
+            trade_scores = [_trade_score(a, d, ready_atk) for _, a, d in trades]
+        for (i, _, _), score in zip(trades, trade_scores):
+            scores[i] = 0.0 + score
+    return scores
+
+
+# ---- Lethal solver -----------------------------------------------------------
+# find_lethal() searches every order of the moves that can add face damage
+# this turn (attacks, burn, buffs, weapons, charge minions, taunt removal and
+# damage hero powers) for a line that kills the opponent.  A cheap upper bound
+# on reachable face damage is checked first and again at every node, so the
+# usual no-lethal position costs one bound computation and hopeless branches
+# are cut at once.  Moves that only heal, draw or summon idle bodies are
+# skipped, which also keeps the search from touching the RNG or the deck.
+# run_ai_turn calls it before any other AI logic (except on easy) and the
+# server offers it to the player as /api/lethal_hint.
+
+AI_LETHAL_NODES = 20_000
+
+_HERO_POWER_FACE_DAMAGE = {"Mage": 1, "Rogue": 1}
+_LETHAL_SPELL_EFFECTS = frozenset({
+    EFFECT_COIN, EFFECT_DAMAGE, EFFECT_DAMAGE_ALL, EFFECT_BUFF, EFFECT_BUFF_ALL, EFFECT_SILENCE,
+})
+
+
+def _damage_upper_bound(p2: PlayerState, p1: PlayerState) -> float:
+    """Most face damage p2 could possibly deal for the rest of this turn.
 
-    p1_eff_hp = p1["hp"] + p1.get("armor", 0)
-    p2_eff_hp = p2["hp"] + p2.get("armor", 0)
+    Ignores taunts and targeting, and fills the mana budget fractionally by
+    damage per mana, so the true best line can never exceed it.
+    """
+    ready = [m for m in p2.board if m.can_attack]
+    damage = float(sum(m.atk for m in ready))
+    damage += sum(m.deathrattle["val"] for m in p2.board
+                  if m.deathrattle and m.deathrattle.get("effect") == "dmg_hero")
+    can_swing = not p2.hero_attacked_this_turn
+    if p2.weapon and p2.hero_can_attack:
+        damage += p2.weapon["atk"]
+
+    mana = effective_mana(p2)
+    chargers = sum(1 for cid in p2.hand if CARD_KEYWORDS[cid] & KW_CHARGE)
+    items: list[tuple[int, float]] = []
+    for cid in p2.hand:
+        effect, val = CARD_EFFECT[cid], CARD_VALUE[cid]
+        if CARD_TYPE[cid] == TYPE_SPELL:
+            if effect == EFFECT_COIN:
+                mana += val
+            elif effect == EFFECT_DAMAGE:
+                items.append((CARD_COST[cid], val))
+            elif effect == EFFECT_BUFF and (ready or chargers):
+                items.append((CARD_COST[cid], val[0]))
+            elif effect == EFFECT_BUFF_ALL:
+                items.append((CARD_COST[cid], val[0] * (len(ready) + chargers)))
+        elif CARD_TYPE[cid] == TYPE_WEAPON and can_swing:
+            items.append((CARD_COST[cid], CARD_ATK[cid]))
+        elif CARD_KEYWORDS[cid] & KW_CHARGE:
+            items.append((CARD_COST[cid], CARD_ATK[cid]))
+    power_damage = _HERO_POWER_FACE_DAMAGE.get(p2.hero_class, 0)
+    if power_damage and not p2.hero_power_used:
+        items.append((HERO_POWER_COST, power_damage))
+
+    if p2.infinite_mana:
+        return damage + sum(d for _, d in items)
+    items.sort(key=lambda item: item[1] / item[0] if item[0] else float("inf"), reverse=True)
+    for cost, dmg in items:
+        if cost <= mana:
+            damage += dmg
+            mana -= cost
+        else:
+            damage += dmg * mana / cost
+            break
+    return damage
 
+
+def _can_add_face_damage(player: PlayerState, move: tuple) -> bool:
+    action, idx, _ = move
     if action == "play":
-        card_name = p2["hand"][idx]
-        card = CARD_DB[card_name]
-        score += card["cost"] * 2
-
-        if card["type"] == "minion":
-            score += 3
-            if card.get("poisonous"): score += 2
-            if card.get("charge"):    score += 2
-            if "battlecry" in card:
-                bc = card["battlecry"]
-                if bc["effect"] == "heal_hero" and p2["hp"] < 25:
-                    score += 3
-
-        elif card["type"] == "weapon":
-            score += card["atk"] * 2 if not p2["weapon"] else -4
-
-        elif card["type"] == "spell":
-            if card["effect"] == "damage":
-                if target != "hero":
-                    tm = p1["board"][target]
-                    if tm.get("divine_shield"):  score += 3
-                    elif tm["hp"] <= card["val"]: score += 6
-                    else:                         score += 2
-                else:
-                    if p1_eff_hp <= card["val"]: score += 1000
-                    score += 1
-
-            elif card["effect"] == "heal":
-                hp_missing = _hero_missing_hp(p2)
-                effective_heal = min(card["val"], hp_missing)
-                score += effective_heal if effective_heal > 0 else -3
-
-            elif card["effect"] == "draw":
-                score += card["val"] * 4 if len(p2["hand"]) < 9 else -10
-
-            elif card["effect"] == "coin":
-                unspent = p2["mana"]
-                playable_costs = [
-                    CARD_DB[n]["cost"] for n in p2["hand"]
-                    if CARD_DB[n].get("cost", 0) > unspent
-                ]
-                score += 3 if playable_costs else -2
-
-            elif card["effect"] == "damage_all":
-                hits = sum(5 if m["hp"] <= card["val"] else 1 for m in p1["board"])
-                score += hits * 2 if hits else -10
-
-            elif card["effect"] == "buff":
-                score += sum(card["val"]) * 2
-                tm = p2["board"][target]
-                if tm["can_attack"]: score += card["val"][0] * 3
-                if tm["hp"] > 2:     score += 2
-
-            elif card["effect"] == "buff_all":
-                n = len(p2["board"])
-                score += n * sum(card["val"]) if n else -8
-
-            elif card["effect"] == "heal_all":
-                heal_val = card["val"]
-                score += 3 if _hero_missing_hp(p2) >= 10 else 0
-                score += sum(
-                    min(heal_val, m.get("max_hp", m["hp"]) - m["hp"])
-                    for m in p2["board"]
-                )
-
-            elif card["effect"] == "add_shield":
-                tm = p2["board"][target]
-                score += tm["atk"] * 2 if tm["can_attack"] else tm["hp"]
-
-            elif card["effect"] == "silence":
-                if 0 <= target < len(p1["board"]):
-                    tm = p1["board"][target]
-                    kw_count = sum(1 for kw in ("taunt", "divine_shield", "poisonous", "deathrattle")
-                                   if tm.get(kw))
-                    score += kw_count * 6
-                    if tm.get("taunt"):    score += 4   # removing taunt opens up better targets
-                    if tm.get("divine_shield"): score += 4
-
-    elif action == "attack":
-        attacker = p2["board"][idx]
-        if target == "hero":
-            if p1_eff_hp <= attacker["atk"]: score += 1000
-            score += attacker["atk"]
+        cid = player.hand[idx]
+        if CARD_TYPE[cid] == TYPE_SPELL:
+            return CARD_EFFECT[cid] in _LETHAL_SPELL_EFFECTS
+        if CARD_TYPE[cid] == TYPE_WEAPON:
+            return not player.hero_attacked_this_turn
+        return bool(CARD_KEYWORDS[cid] & KW_CHARGE)
+    if action == "hero_power":
+        return player.hero_class in _HERO_POWER_FACE_DAMAGE
+    return True
+
+
+def find_lethal(player: PlayerState, opp: PlayerState, node_budget: int = AI_LETHAL_NODES) -> list[tuple] | None:
+    """A list of moves for ``player`` that kills ``opp`` this turn, or None."""
+    if _damage_upper_bound(player, opp) < opp.hp + opp.armor:
+        return None
+    state = GameState(p1=opp, p2=player, is_player_turn=False)
+    seen: set[int] = set()
+    budget = node_budget
+
+    def search() -> list[tuple] | None:
+        nonlocal budget
+        if opp.hp <= 0:
+            return [] if player.hp > 0 else None
+        if player.hp <= 0 or budget <= 0:
+            return None
+        if _damage_upper_bound(player, opp) < opp.hp + opp.armor:
+            return None
+        key = zobrist_hash(state)
+        if key in seen:
+            return None
+        seen.add(key)
+        budget -= 1
+        moves = [mv for mv in get_legal_moves(player, opp) if _can_add_face_damage(player, mv)]
+        moves.sort(key=lambda mv: mv[2] != "hero")
+        for move in moves:
+            token = apply_move(state, move)
+            line = search()
+            undo(state, token)
+            if line is not None:
+                return [move, *line]
+        return None
+
+    with silent_logging():
+        return search()
+
+
+# ---- Turn planner (expert) --------------------------------------------------
+# The expert tier searches whole sequences of moves inside one turn instead of
+# picking greedily one ply at a time, so it can see lines like "clear the
+# taunt, then go face".  It runs a depth-first search with apply_move/undo,
+# dedupes positions reached by different move orders in a transposition table
+# keyed by zobrist_hash, and scores the positions where the turn could end
+# with _evaluate_position.  A lethal line from find_lethal always wins out.
+
+AI_PLANNER_NODES = int(os.environ.get("LITSTONE_AI_PLANNER_NODES", "3000"))
+AI_PLANNER_MS = float(os.environ.get("LITSTONE_AI_PLANNER_MS", "150"))
+
+_WIN_SCORE = 1_000_000.0
+
+
+def _minion_value(m: Minion) -> float:
+    return (m.atk + m.hp + 2 * (m.taunt + m.divine_shield + m.poisonous)
+            + (m.deathrattle is not None))
+
+
+def _evaluate_position(p2: PlayerState, p1: PlayerState) -> float:
+    """Static score of a position for p2 (the side planning its turn)."""
+    if p1.hp <= 0:
+        return 0.0 if p2.hp <= 0 else _WIN_SCORE
+    if p2.hp <= 0:
+        return -_WIN_SCORE
+    score = 0.7 * (p2.hp + p2.armor) - (p1.hp + p1.armor)
+    score += sum(_minion_value(m) for m in p2.board)
+    score -= 1.25 * sum(_minion_value(m) for m in p1.board)
+    score += 0.5 * len(p2.hand)
+    if p2.weapon:
+        score += p2.weapon["atk"] * p2.weapon["durability"] * 0.5
+    threat = sum(m.atk for m in p1.board) + (p1.weapon["atk"] if p1.weapon else 0)
+    if threat >= p2.hp + p2.armor and not any(m.taunt for m in p2.board):
+        score -= 50
+    return score
+
+
+class TurnPlanner:
+    """Search one AI turn for its best sequence of moves.
+
+    The transposition table maps a position key to ``(value, best_move)``
+    for every position it expanded and is kept across calls, so after a move is
+    executed the rest of the plan is read straight from the table.  A fresh
+    search (with a fresh node/time budget) only runs when the real position
+    was never expanded, e.g. after drawing an unseen card.
+    """
+
+    def __init__(self, node_budget: int = AI_PLANNER_NODES, time_budget_ms: float = AI_PLANNER_MS) -> None:
+        self.node_budget = node_budget
+        self.time_budget_ms = time_budget_ms
+        self.table: dict[int, tuple[float, tuple | None]] = {}
+        self.nodes = 0
+        self.tt_hits = 0
+        self._deadline = 0.0
+        self._limit = 0
+
+    def best_move(self, p2: PlayerState, p1: PlayerState, *, lethal_checked: bool = False) -> tuple | None:
+        """First move of the best plan for p2, or None to end the turn.
+
+        ``lethal_checked`` says the caller has already run find_lethal on this
+        exact position and found nothing, so that search is not repeated.
+        """
+        state = GameState(p1=p1, p2=p2, is_player_turn=False)
+        key = zobrist_hash(state)
+        entry = self.table.get(key)
+        if entry is None:
+            self._deadline = time.perf_counter() + self.time_budget_ms / 1000
+            self._limit = self.nodes + self.node_budget
+            line = None if lethal_checked else find_lethal(p2, p1)
+            if line:
+                return line[0]
+            with silent_logging():
+                self._search(state, root=True)
+            entry = self.table.get(key, (0.0, None))
+        return entry[1]
+
+    def _out_of_budget(self) -> bool:
+        return self.nodes >= self._limit or time.perf_counter() >= self._deadline
+
+    def _candidate_moves(self, p2: PlayerState, p1: PlayerState) -> list[tuple]:
+        legal = get_legal_moves(p2, p1)
+        scored = [(score, move) for score, move in zip(evaluate_ai_moves(p2, p1, legal), legal)
+                  if move[0] != "hero_power" or score > 0]
+        scored.sort(key=lambda pair: -pair[0])
+        return [move for _, move in scored]
+
+    def _search(self, state: GameState, root: bool = False) -> float:
+        key = zobrist_hash(state)
+        entry = self.table.get(key)
+        if entry is not None:
+            self.tt_hits += 1
+            return entry[0]
+        self.nodes += 1
+        p2, p1 = state.p2, state.p1
+        value, best = _evaluate_position(p2, p1), None
+        if abs(value) >= _WIN_SCORE or (not root and self._out_of_budget()):
+            return value
+        for move in self._candidate_moves(p2, p1):
+            if not root and self._out_of_budget():
+                break
+            token = apply_move(state, move)
+            child = self._search(state)
+            undo(state, token)
+            if child > value:
+                value, best = child, move
+                if value >= _WIN_SCORE:
+                    break
+        self.table[key] = (value, best)
+        return value
+
+
+# ---- Information-set MCTS (master) ------------------------------------------
+# The master tier runs single-observer ISMCTS over the AI's current turn.
+# Every iteration samples a determinization (the player's hand and deck are
+# redealt from the unseen cards, the AI's own deck is reshuffled), walks the
+# tree with UCB1 over the moves legal in that sample, expands one move, then
+# rolls out greedily with evaluate_ai_move until AI_MCTS_ROLLOUT_TURNS more
+# turns have passed.  Search stops at a wall-clock deadline and returns the
+# most visited move found so far, so a move never takes much longer than its
+# budget.  run_ai_turn also caps the whole turn (AI_MCTS_TURN_MS) and falls
+# back to the greedy hard policy once that is spent.
+
+AI_MCTS_MS = float(os.environ.get("LITSTONE_AI_MCTS_MS", "80"))
+AI_MCTS_TURN_MS = float(os.environ.get("LITSTONE_AI_MCTS_TURN_MS", "800"))
+AI_MCTS_ROLLOUT_TURNS = 2
+_MCTS_EXPLORATION = 0.7
+_MCTS_SCALE = 12.0        # _evaluate_position points per logistic unit
+END_TURN = ("end_turn", None, None)
+
+
+class _MctsNode:
+    __slots__ = ("move", "parent", "children", "visits", "wins", "avail")
+
+    def __init__(self, move: tuple | None = None, parent: _MctsNode | None = None) -> None:
+        self.move = move
+        self.parent = parent
+        self.children: dict[tuple, _MctsNode] = {}
+        self.visits = 0
+        self.wins = 0.0
+        self.avail = 0
+
+    def ucb(self, c: float) -> float:
+        return self.wins / self.visits + c * math.sqrt(math.log(self.avail) / self.visits)
+
+
+def determinize(p2: PlayerState, p1: PlayerState, rng: random.Random) -> tuple[PlayerState, PlayerState]:
+    """Copies of (p2, p1) with everything p2 cannot see resampled."""
+    me, opp = p2.copy(), p1.copy()
+    unseen = opp.hand + opp.deck
+    rng.shuffle(unseen)
+    opp.hand, opp.deck = unseen[:len(opp.hand)], unseen[len(opp.hand):]
+    rng.shuffle(me.deck)
+    opp._zh_hand = None
+    return me, opp
+
+
+def _greedy_move(player: PlayerState, opp: PlayerState) -> tuple | None:
+    """Rollout policy: the best evaluate_ai_move, or None to end the turn."""
+    legal = get_legal_moves(player, opp)
+    if not legal:
+        return None
+    score, move = max(zip(evaluate_ai_moves(player, opp, legal), legal), key=lambda pair: pair[0])
+    if score < 0 or (move[0] == "hero_power" and score <= 0):
+        return None
+    return move
+
+
+def _finish_turn_greedily(player: PlayerState, opp: PlayerState, max_moves: int = 20) -> None:
+    for _ in range(max_moves):
+        if check_win(player, opp):
+            return
+        move = _greedy_move(player, opp)
+        if move is None:
+            return
+        execute_move(player, opp, move)
+
+
+def _rollout(me: PlayerState, opp: PlayerState, *, turn_over: bool) -> float:
+    """Play a determinization forward; reward in [0, 1] for ``me``."""
+    if not turn_over:
+        _finish_turn_greedily(me, opp)
+    sides = ((opp, me), (me, opp))
+    for turn in range(AI_MCTS_ROLLOUT_TURNS):
+        if check_win(me, opp):
+            break
+        player, enemy = sides[turn % 2]
+        start_turn(player)
+        _finish_turn_greedily(player, enemy)
+    value = _evaluate_position(me, opp)
+    if value >= _WIN_SCORE:
+        return 1.0
+    if value <= -_WIN_SCORE:
+        return 0.0
+    return 1.0 / (1.0 + math.exp(-value / _MCTS_SCALE))
+
+
+def _ismcts_root_stats(
+    p2: PlayerState,
+    p1: PlayerState,
+    deadline_ms: float,
+    rng: random.Random,
+    max_iterations: int | None = None,
+) -> dict[tuple, tuple[int, float]]:
+    """Run ISMCTS and return the root's ``move -> (visits, wins)``."""
+    deadline = time.perf_counter() + deadline_ms / 1000
+    root = _MctsNode()
+    iterations = 0
+    with silent_logging():
+        while iterations == 0 or time.perf_counter() < deadline:
+            if max_iterations is not None and iterations >= max_iterations:
+                break
+            iterations += 1
+            _ismcts_iteration(root, p2, p1, rng)
+    return {move: (ch.visits, ch.wins) for move, ch in root.children.items()}
+
+
+def _ismcts_iteration(root: _MctsNode, p2: PlayerState, p1: PlayerState, rng: random.Random) -> None:
+    """One select / expand / rollout / backpropagate pass over a fresh determinization."""
+    me, opp = determinize(p2, p1, rng)
+    node, turn_over = root, False
+    while not turn_over and not check_win(me, opp):
+        legal = get_legal_moves(me, opp)
+        legal.append(END_TURN)
+        for move in legal:
+            child = node.children.get(move)
+            if child is not None:
+                child.avail += 1
+        untried = [mv for mv in legal if mv not in node.children]
+        if untried:
+            priors = evaluate_ai_moves(me, opp, untried)
+            move = untried[priors.index(max(priors))]
+            child = node.children[move] = _MctsNode(move, node)
+            child.avail = 1
         else:
-            defender = p1["board"][target]
-            atk_dmg = 0 if defender.get("divine_shield") else attacker["atk"]
-            if atk_dmg > 0 and attacker.get("poisonous"): atk_dmg = defender["hp"]
-            def_dmg = 0 if attacker.get("divine_shield") else defender["atk"]
-            if def_dmg > 0 and defender.get("poisonous"): def_dmg = attacker["hp"]
-
-            if defender.get("taunt") and sum(
-                m["atk"] for m in p2["board"] if m.get("can_attack")
-            ) > attacker["atk"]:
-                score += 4
-
-            if def_dmg < attacker["hp"] and atk_dmg >= defender["hp"]: score += 15
-            elif atk_dmg >= defender["hp"]:                              score += 5
-            else:                                                         score -= 5
-
-    elif action == "hero_attack":
-        w_atk = p2["weapon"]["atk"]
-        if target == "hero":
-            if p1_eff_hp <= w_atk: score += 1000
-            score += w_atk
+            child = max((node.children[mv] for mv in legal),
+                        key=lambda ch: ch.ucb(_MCTS_EXPLORATION))
+        node = child
+        if child.move == END_TURN:
+            turn_over = True
         else:
-            defender = p1["board"][target]
-            atk_dmg = 0 if defender.get("divine_shield") else w_atk
-            def_dmg = defender["atk"]
-            if def_dmg >= p2_eff_hp:   score -= 1000
-            elif atk_dmg >= defender["hp"]:
-                score += 6
-                score -= def_dmg
-            else:
-                score -= 5
-
-    elif action == "hero_power":
-        cls = p2["hero_class"]
-        if cls == "Warrior":
-            missing = _hero_missing_hp(p2)
-            if missing == 0 and p2.get("armor", 0) >= 8:
-                score -= 8
-            elif missing == 0:
-                score -= 3
-            else:
-                score += min(4, missing)
-        elif cls == "Mage":
-            if target != "hero":
-                tm = p1["board"][target]
-                if tm.get("divine_shield"): score += 4
-                elif tm["hp"] == 1:         score += 12
-                else:                       score += 1
-            else:
-                if p1_eff_hp <= 1: score += 1000
-                score += 1
-        elif cls == "Priest":
-            if target == "hero":
-                healable = clamp_heal(p2, 2)
-                score += healable * 2 if healable > 0 else -6
-            else:
-                tm = p2["board"][target]
-                max_hp = tm.get("max_hp", tm["hp"])
-                missing = max(0, max_hp - tm["hp"])
-                score += min(4, missing) if missing > 0 else -5
-        elif cls == "Rogue":
-            # Dagger Mastery: equip 1/2 weapon — worth it if no weapon already
-            score += 4 if not p2.get("weapon") else -2
-        elif cls == "Paladin":
-            # Reinforce: always decent if board isn't full
-            score += 3 if len(p2["board"]) < 7 else -10
-        elif cls == "Shaman":
-            score += 3 if len(p2["board"]) < 7 else -10
+            execute_move(me, opp, child.move)
+        if untried:
+            break
+    reward = _rollout(me, opp, turn_over=turn_over)
+    while node is not None:
+        node.visits += 1
+        node.wins += reward
+        node = node.parent
 
-    return score
+
+def ismcts_move(
+    p2: PlayerState,
+    p1: PlayerState,
+    deadline_ms: float = AI_MCTS_MS,
+    *,
+    rng: random.Random | None = None,
+    max_iterations: int | None = None,
+) -> tuple | None:
+    """Best move for p2 found within ``deadline_ms``; None means end the turn.
+
+    With a search pool configured the iterations are spread over its workers
+    (root parallelism) and ``max_iterations`` is the total across them.
+    """
+    rng = rng or random.Random(active_rng().getrandbits(32))
+    pool = search_pool()
+    if pool is not None:
+        stats = _parallel_root_stats(pool, p2, p1, deadline_ms, rng, max_iterations)
+    else:
+        stats = _ismcts_root_stats(p2, p1, deadline_ms, rng, max_iterations)
+    if not stats:
+        return None
+    best = max(stats, key=lambda move: stats[move][0])
+    return None if best == END_TURN else best
+
+
+# ---- Root-parallel search ---------------------------------------------------
+# With LITSTONE_AI_WORKERS >= 2, ismcts_move fans each search out to a
+# long-lived process pool: every worker searches its own determinizations
+# from a pack_players() blob and returns its root statistics, which are summed
+# per move.  The pool uses the "spawn" start method so it is safe to create
+# from a threaded server; it starts on first use and shuts down at exit.
+# Every worker stops at the same wall-clock deadline; ones that miss it by more
+# than _POOL_GRACE_MS are cancelled or ignored, and if none answer in time the
+# search runs in-process instead.
+
+AI_SEARCH_WORKERS = int(os.environ.get("LITSTONE_AI_WORKERS", "0"))
+_POOL_GRACE_MS = 50.0
+_SEARCH_POOL: ProcessPoolExecutor | None = None
+_SEARCH_POOL_LOCK = threading.Lock()
+
+
+def search_pool() -> ProcessPoolExecutor | None:
+    """The shared worker pool, or None when root parallelism is off."""
+    global _SEARCH_POOL
+    if AI_SEARCH_WORKERS < 2:
+        return None
+    with _SEARCH_POOL_LOCK:
+        if _SEARCH_POOL is None:
+            _SEARCH_POOL = ProcessPoolExecutor(
+                AI_SEARCH_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(shutdown_search_pool)
+        return _SEARCH_POOL
+
+
+def shutdown_search_pool() -> None:
+    global _SEARCH_POOL
+    with _SEARCH_POOL_LOCK:
+        if _SEARCH_POOL is not None:
+            _SEARCH_POOL.shutdown(cancel_futures=True)
+            _SEARCH_POOL = None
+
+
+def _ismcts_worker(payload: bytes, stop_at: float, seed: int,
+                   max_iterations: int | None) -> list[tuple[tuple, int, float]]:
+    """Search until the wall-clock time ``stop_at`` shared by the whole fan-out.
+
+    A task that only starts once the caller has given up returns nothing
+    rather than running a full search nobody will read.
+    """
+    remaining_ms = (stop_at - time.time()) * 1000
+    if remaining_ms <= 0:
+        return []
+    p2, p1 = unpack_players(payload)
+    stats = _ismcts_root_stats(p2, p1, remaining_ms, random.Random(seed), max_iterations)
+    return [(move, visits, wins) for move, (visits, wins) in stats.items()]
+
+
+def _parallel_root_stats(
+    pool: ProcessPoolExecutor,
+    p2: PlayerState,
+    p1: PlayerState,
+    deadline_ms: float,
+    rng: random.Random,
+    max_iterations: int | None,
+) -> dict[tuple, tuple[int, float]]:
+    payload = pack_players(p2, p1)
+    share = None if max_iterations is None else -(-max_iterations // AI_SEARCH_WORKERS)
+    stop_at = time.time() + deadline_ms / 1000
+    futures = [
+        pool.submit(_ismcts_worker, payload, stop_at, rng.getrandbits(32), share)
+        for _ in range(AI_SEARCH_WORKERS)
+    ]
+    done, not_done = wait(futures, timeout=(deadline_ms + _POOL_GRACE_MS) / 1000)
+    for future in not_done:
+        # Still queued behind another search: drop it.  One already running
+        # stops by itself at stop_at and its late result is never read.
+        future.cancel()
+    merged: dict[tuple, tuple[int, float]] = {}
+    for future in done:
+        if future.exception() is not None:
+            continue
+        for move, visits, wins in future.result():
+            total_visits, total_wins = merged.get(move, (0, 0.0))
+            merged[move] = (total_visits + visits, total_wins + wins)
+    if not merged:
+        return _ismcts_root_stats(p2, p1, min(deadline_ms, _POOL_GRACE_MS), rng, max_iterations)
+    return merged
+
+
+def _mcts_move_ms() -> float:
+    """Wall-clock budget per master move: AI_MCTS_MS of CPU spread over the pool."""
+    return AI_MCTS_MS / AI_SEARCH_WORKERS if search_pool() is not None else AI_MCTS_MS
+
+
+def _heuristic_turn_move(
+    p2: PlayerState, p1: PlayerState, difficulty: str, rng: random.Random | None = None,
+) -> tuple | None:
+    """One-ply select_ai_move pick, or None when the AI should end its turn."""
+    legal = get_legal_moves(p2, p1)
+    if not legal:
+        return None
+    best = select_ai_move(legal, p2, p1, difficulty, rng=rng)
+    if best is None:
+        return None
+    best_score = evaluate_ai_move(p2, p1, best)
+    if _ai_should_pass_turn(legal, best, best_score, p2, p1):
+        return None
+    return best
 
 
 def run_ai_turn(
-    p2: dict,
-    p1: dict,
+    p2: PlayerState,
+    p1: PlayerState,
     max_moves: int = 40,
     *,
     draw: bool = True,
     difficulty: str = "normal",
+    rng: random.Random | None = None,
+    decision_rng: random.Random | None = None,
+    moves: Sequence[tuple] | None = None,
+    on_move: Callable[[tuple], None] | None = None,
+    on_event=None,
 ) -> list[tuple]:
-    """Execute AI turn synchronously. Returns the list of moves made."""
+    """Execute AI turn synchronously. Returns the list of moves made.
+
+    ``rng`` (default: the active game RNG) drives every random choice of the
+    turn, so a seeded turn is reproducible -- except on the master tier,
+    whose search depth depends on the wall clock.
+
+    ``decision_rng`` moves the AI's own choices (search, tie-breaks) onto a
+    separate stream from card effects.  Turns played that way can later be
+    replayed from their recorded ``moves`` without searching again, and the
+    effects still roll exactly as they did.
+
+    ``on_event`` receives the turn's notifications as ``execute_move`` emits
+    them, and ``on_move(move)`` is called after each move resolves, so a
+    caller can report the turn while it is still being played.
+    """
     difficulty = normalize_difficulty(difficulty)
-    start_turn(p2, draw=draw)
+    hooks = (on_move, on_event)
+    if rng is None:
+        return _play_ai_turn(p2, p1, max_moves, draw, difficulty, active_rng(), decision_rng, moves, hooks)
+    token = _ACTIVE_RNG.set(rng)
+    try:
+        return _play_ai_turn(p2, p1, max_moves, draw, difficulty, rng, decision_rng, moves, hooks)
+    finally:
+        _ACTIVE_RNG.reset(token)
+
+
+def _play_ai_turn(
+    p2, p1, max_moves, draw, difficulty, rng, decision_rng=None, script=None, hooks=(None, None),
+) -> list[tuple]:
+    on_move, on_event = hooks
+    start_turn(p2, on_event, draw=draw)
     if check_win(p1, p2):
         return []
+    if script is not None:
+        moves_made = [tuple(move) for move in script]
+        for move in moves_made:
+            execute_move(p2, p1, move, on_event)
+            if on_move:
+                on_move(move)
+        return moves_made
+    if decision_rng is None:
+        return _choose_and_play(p2, p1, max_moves, difficulty, rng, hooks=hooks)
+    token = _ACTIVE_RNG.set(decision_rng)
+    try:
+        return _choose_and_play(p2, p1, max_moves, difficulty, decision_rng, effects_rng=rng, hooks=hooks)
+    finally:
+        _ACTIVE_RNG.reset(token)
+
+
+def _choose_and_play(p2, p1, max_moves, difficulty, rng, effects_rng=None, hooks=(None, None)) -> list[tuple]:
+    # Runs with the decision stream active; each chosen move is executed
+    # under ``effects_rng`` when the two streams are split.
+    on_move, on_event = hooks
+
+    def play(move) -> None:
+        if effects_rng is None:
+            execute_move(p2, p1, move, on_event)
+        else:
+            token = _ACTIVE_RNG.set(effects_rng)
+            try:
+                execute_move(p2, p1, move, on_event)
+            finally:
+                _ACTIVE_RNG.reset(token)
+        if on_move:
+            on_move(move)
+
     moves_made = []
+    lethal = find_lethal(p2, p1) if difficulty != "easy" else None
+    if lethal:
+        for move in lethal:
+            play(move)
+            moves_made.append(move)
+        return moves_made
+    planner = TurnPlanner() if difficulty == "expert" else None
+    turn_deadline = time.perf_counter() + AI_MCTS_TURN_MS / 1000
     for _ in range(max_moves):
         if check_win(p1, p2):
             break
-        legal = get_legal_moves(p2, p1)
-        if not legal:
-            break
-        best = select_ai_move(legal, p2, p1, difficulty)
+        remaining_ms = (turn_deadline - time.perf_counter()) * 1000
+        if planner:
+            # The position before the first move was searched for lethal above.
+            best = planner.best_move(p2, p1, lethal_checked=not moves_made)
+        elif difficulty == "master" and remaining_ms > 0:
+            best = ismcts_move(p2, p1, min(_mcts_move_ms(), remaining_ms), rng=rng)
+        else:
+            best = _heuristic_turn_move(p2, p1, difficulty, rng)
         if best is None:
             break
-        best_score = evaluate_ai_move(p2, p1, best)
-        if _ai_should_pass_turn(legal, best, best_score, p2, p1):
-            break
-        execute_move(p2, p1, best)
+        play(best)
         moves_made.append(best)
     return moves_made
@@ -3,23 +3,158 @@
 from __future__ import annotations
 
 import json
+import logging
+import os
 import sqlite3
+import threading
 import time
-from typing import Any
+import zlib
+from collections.abc import Callable, Iterable
+from typing import Any, NamedTuple
+
+from state_codec import CodecError, decode_state, encode_state
+
+log = logging.getLogger(__name__)
+
+
+_SQL_SAVE = (
+    "INSERT OR REPLACE INTO games (game_id, state_json, updated_at, codec) VALUES (?, ?, ?, ?)"
+)
+_SQL_ARCHIVE = "INSERT OR REPLACE INTO game_log_archive (game_id, seq, line) VALUES (?, ?, ?)"
+_SQL_EVENT = "INSERT INTO game_events (game_id, seq, kind, payload) VALUES (?, ?, ?, ?)"   # append-only
+_SQL_DELETE = "DELETE FROM games WHERE game_id = ?"
+_SQL_DELETE_ARCHIVE = "DELETE FROM game_log_archive WHERE game_id = ?"
+_SQL_DELETE_EVENTS = "DELETE FROM game_events WHERE game_id = ?"
+_SQL_LOAD = "SELECT state_json, codec FROM games WHERE game_id = ?"
+_SQL_LOAD_LOG = (
+    "SELECT line FROM game_log_archive WHERE game_id = ? AND seq >= ? AND seq < ? ORDER BY seq"
+)
+_SQL_LOAD_EVENTS = "SELECT seq, kind, payload FROM game_events WHERE game_id = ? AND seq > ? ORDER BY seq"
+_SQL_LAST_EVENT = "SELECT MAX(seq) FROM game_events WHERE game_id = ?"
+_SQL_LOAD_ALL = "SELECT game_id, state_json, codec FROM games"
+_SQL_COUNT = "SELECT COUNT(*) FROM games"
+_SQL_SAVE_JOB = (
+    "INSERT OR REPLACE INTO ai_jobs (job_id, game_id, status, info, updated_at) VALUES (?, ?, ?, ?, ?)"
+)
+_SQL_LOAD_JOB = "SELECT info FROM ai_jobs WHERE job_id = ?"
+_SQL_PRUNE_JOBS = "DELETE FROM ai_jobs WHERE updated_at < ?"
+
+# Applied once per connection.  NORMAL is durable across application
+# crashes in WAL mode; only an OS crash or power loss can drop the last
+# commits.
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    f"PRAGMA synchronous={os.environ.get('LITSTONE_DB_SYNCHRONOUS', 'NORMAL')}",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-8000",      # KiB, i.e. 8 MB of page cache
+)
+
+# Row codecs.  "binary" rows hold state_codec bytes (the state_json column
+# keeps its old name); "json" rows are the original text format and still
+# load, whatever codec new saves use.
+STATE_CODECS = ("json", "binary", "binary+zlib")
+
+
+class GameEvent(NamedTuple):
+    """One recorded action; ``seq`` numbers a game's events from 1."""
+
+    seq: int
+    kind: str
+    payload: dict[str, Any]
+
+
+class EventConflict(sqlite3.IntegrityError):
+    """A game's event log already holds an event numbered like one being written.
+
+    The writer's copy of the game is behind the log (a stale cache, another
+    server process, a replay bug); the recorded history is left untouched.
+    """
+
+    def __init__(self, game_id: str) -> None:
+        super().__init__(f"game {game_id} already has an event with that seq")
+        self.game_id = game_id
+
+
+class GameWrite(NamedTuple):
+    """Everything one game needs written: a snapshot, new events, archived log lines.
+
+    ``delete`` drops the game's existing rows first, so a delete followed by
+    a save still ends with the save.
+    """
+
+    state: dict[str, Any] | None = None
+    archive: tuple[tuple[int, str], ...] = ()
+    events: tuple[GameEvent, ...] = ()
+    delete: bool = False
+
+    def merge(self, later: GameWrite) -> GameWrite:
+        """Coalesce ``later`` (queued after this write) into a single write."""
+        if later.delete:
+            return later
+        return GameWrite(
+            later.state if later.state is not None else self.state,
+            self.archive + later.archive,
+            self.events + later.events,
+            self.delete,
+        )
 
 
 class GameStore:
-    """Persist active game state so sessions survive server restarts."""
+    """Persist active game state so sessions survive server restarts.
+
+    A game is stored as an occasional full snapshot plus an append-only
+    ``game_events`` log of the actions taken since.  A snapshot's
+    ``event_seq`` field says how many events it already includes, so loading
+    is one snapshot read plus the (short) tail of later events to replay.
+
+    ``codec`` picks how new snapshots are written (see STATE_CODECS); the
+    codec is recorded per row, so rows written any other way still load.
+
+    Each thread gets its own connection, opened and configured on first use
+    and kept for the life of the store.  The SQL text above is fixed, so
+    every statement is prepared once per connection and then served from
+    sqlite3's statement cache.
+    """
 
-    def __init__(self, db_path: str = "litstone.db") -> None:
+    def __init__(self, db_path: str = "litstone.db", codec: str = "binary") -> None:
+        if codec not in STATE_CODECS:
+            raise ValueError(f"Unknown state codec: {codec!r} (expected one of {STATE_CODECS})")
         self.db_path = db_path
+        self.codec = codec
+        self._local = threading.local()
+        self._connections: dict[int, sqlite3.Connection] = {}
+        self._lock = threading.Lock()
         self._ensure_schema()
 
     def _connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
-        conn.execute("PRAGMA journal_mode=WAL")
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread is off only so close() can reach every
+            # thread's connection; each one is otherwise used by its owner.
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=64)
+            for pragma in _PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._lock:
+                self._prune_connections()
+                self._connections[threading.get_ident()] = conn
         return conn
 
+    def _prune_connections(self) -> None:
+        # Close connections left behind by threads that have exited.
+        alive = {thread.ident for thread in threading.enumerate()}
+        for ident in [ident for ident in self._connections if ident not in alive]:
+            self._connections.pop(ident).close()
+
+    def close(self) -> None:
+        """Close every thread's connection; later calls reconnect on demand."""
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        self._local = threading.local()
+        for conn in connections:
+            conn.close()
+
     def _ensure_schema(self) -> None:
         with self._connect() as conn:
             conn.execute(
@@ -27,38 +162,368 @@ class GameStore:
                 CREATE TABLE IF NOT EXISTS games (
                     game_id TEXT PRIMARY KEY,
                     state_json TEXT NOT NULL,
-                    updated_at REAL NOT NULL
+                    updated_at REAL NOT NULL,
+                    codec TEXT NOT NULL DEFAULT 'json'
                 )
                 """
             )
-
-    def save(self, game_id: str, state: dict[str, Any]) -> None:
-        payload = json.dumps(state)
-        with self._connect() as conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(games)")}
+            if "codec" not in columns:     # database from before per-row codecs
+                conn.execute("ALTER TABLE games ADD COLUMN codec TEXT NOT NULL DEFAULT 'json'")
             conn.execute(
                 """
-                INSERT OR REPLACE INTO games (game_id, state_json, updated_at)
-                VALUES (?, ?, ?)
-                """,
-                (game_id, payload, time.time()),
+                CREATE TABLE IF NOT EXISTS game_log_archive (
+                    game_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    line TEXT NOT NULL,
+                    PRIMARY KEY (game_id, seq)
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS game_events (
+                    game_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    PRIMARY KEY (game_id, seq)
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ai_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    game_id TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    info TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
             )
 
-    def delete(self, game_id: str) -> None:
+    def save(
+        self,
+        game_id: str,
+        state: dict[str, Any],
+        archive: Iterable[tuple[int, str]] = (),
+    ) -> None:
+        """Save ``state``; ``archive`` holds ``(seq, line)`` log lines that left the state."""
+        self.write_batch({game_id: GameWrite(state, tuple(archive))})
+
+    def append_events(
+        self,
+        game_id: str,
+        events: Iterable[GameEvent],
+        archive: Iterable[tuple[int, str]] = (),
+    ) -> None:
+        self.write_batch({game_id: GameWrite(None, tuple(archive), tuple(events))})
+
+    def write_batch(self, batch: dict[str, GameWrite]) -> None:
+        """Apply the writes for many games in one transaction.
+
+        Raises EventConflict, having written nothing, if an event's seq is
+        already taken: events are only ever appended.
+        """
+        now = time.time()
         with self._connect() as conn:
-            conn.execute("DELETE FROM games WHERE game_id = ?", (game_id,))
+            for game_id, write in batch.items():
+                if write.delete:
+                    conn.execute(_SQL_DELETE, (game_id,))
+                    conn.execute(_SQL_DELETE_ARCHIVE, (game_id,))
+                    conn.execute(_SQL_DELETE_EVENTS, (game_id,))
+                if write.state is not None:
+                    payload, codec = self._encode(write.state)
+                    conn.execute(_SQL_SAVE, (game_id, payload, now, codec))
+                conn.executemany(_SQL_ARCHIVE, ((game_id, seq, line) for seq, line in write.archive))
+                try:
+                    conn.executemany(_SQL_EVENT, (
+                        (game_id, event.seq, event.kind, json.dumps(event.payload)) for event in write.events
+                    ))
+                except sqlite3.IntegrityError:
+                    raise EventConflict(game_id) from None
+
+    def load_events(self, game_id: str, after: int = 0) -> list[GameEvent]:
+        """Recorded events numbered above ``after``, oldest first."""
+        rows = self._connect().execute(_SQL_LOAD_EVENTS, (game_id, after)).fetchall()
+        return [GameEvent(seq, kind, json.loads(payload)) for seq, kind, payload in rows]
+
+    def last_event_seq(self, game_id: str) -> int:
+        """The highest recorded event seq for ``game_id`` (0 if it has none)."""
+        row = self._connect().execute(_SQL_LAST_EVENT, (game_id,)).fetchone()
+        return row[0] or 0
+
+    def load_with_tail(self, game_id: str) -> tuple[dict[str, Any] | None, list[GameEvent]]:
+        """The latest snapshot and the events recorded after it."""
+        conn = self._connect()
+        with conn:      # one read transaction, so a concurrent save cannot split the pair
+            conn.execute("BEGIN")
+            state = self.load(game_id)
+            if state is None:
+                return None, []
+            return state, self.load_events(game_id, state.get("event_seq") or 0)
+
+    def load_log(self, game_id: str, since: int = 0, until: int | None = None) -> list[str]:
+        """Archived log lines with ``since <= seq < until``, oldest first."""
+        rows = self._connect().execute(
+            _SQL_LOAD_LOG, (game_id, since, until if until is not None else 2**62),
+        ).fetchall()
+        return [line for (line,) in rows]
+
+    def delete(self, game_id: str) -> None:
+        self.write_batch({game_id: GameWrite(delete=True)})
+
+    def load(self, game_id: str) -> dict[str, Any] | None:
+        row = self._connect().execute(_SQL_LOAD, (game_id,)).fetchone()
+        return self._decode(*row) if row is not None else None
 
     def load_all(self) -> dict[str, dict[str, Any]]:
-        with self._connect() as conn:
-            rows = conn.execute("SELECT game_id, state_json FROM games").fetchall()
+        rows = self._connect().execute(_SQL_LOAD_ALL).fetchall()
         games: dict[str, dict[str, Any]] = {}
-        for game_id, raw in rows:
-            try:
-                games[game_id] = json.loads(raw)
-            except json.JSONDecodeError:
-                continue
+        for game_id, raw, codec in rows:
+            state = self._decode(raw, codec)
+            if state is not None:
+                games[game_id] = state
         return games
 
-    def count(self) -> int:
+    def _encode(self, state: dict[str, Any]) -> tuple[str | bytes, str]:
+        if self.codec != "json":
+            try:
+                return encode_state(state, compress=self.codec == "binary+zlib"), "binary"
+            except CodecError as exc:
+                log.debug("Saving %s as JSON: %s", state.get("game_id"), exc)
+        return json.dumps(state), "json"
+
+    @staticmethod
+    def _decode(raw: str | bytes, codec: str) -> dict[str, Any] | None:
+        try:
+            if codec == "binary":
+                return decode_state(raw)
+            return json.loads(raw)
+        except (CodecError, ValueError, zlib.error):
+            return None
+
+    def save_job(self, job_id: str, game_id: str, status: str, info: dict[str, Any]) -> None:
+        """Record an AI job's status (and result) where every server process can read it."""
         with self._connect() as conn:
-            row = conn.execute("SELECT COUNT(*) FROM games").fetchone()
+            conn.execute(_SQL_SAVE_JOB, (job_id, game_id, status, json.dumps(info), time.time()))
+
+    def load_job(self, job_id: str) -> dict[str, Any] | None:
+        row = self._connect().execute(_SQL_LOAD_JOB, (job_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def prune_jobs(self, older_than: float) -> None:
+        """Forget job records last updated more than ``older_than`` seconds ago."""
+        with self._connect() as conn:
+            conn.execute(_SQL_PRUNE_JOBS, (time.time() - older_than,))
+
+    def count(self) -> int:
+        row = self._connect().execute(_SQL_COUNT).fetchone()
         return int(row[0]) if row else 0
+
+
+PERSIST_MODES = ("sync", "batched", "interval")
+
+
+class GameWriter:
+    """Write-behind queue that coalesces saves in front of a GameStore.
+
+    * ``sync`` writes each save in the calling thread, as before.
+    * ``batched`` hands saves to a writer thread, which commits everything
+      queued in one transaction as soon as it is free.  Saves of the same
+      game that pile up meanwhile collapse into one write: the latest
+      snapshot plus every event and archived log line.
+    * ``interval`` commits the queue every ``interval`` seconds, which
+      bounds how much play a crash can lose.
+
+    Callers pass a state snapshot (``to_dict()``), never a live object.
+    flush() and close() drain the queue; pending() tells a reader that a
+    game has writes that have not reached SQLite yet.
+
+    A game whose events clash with ones already recorded (EventConflict)
+    has its write dropped, along with anything queued after it, and
+    ``on_conflict(game_id)`` is told so its owner can discard the stale copy.
+    The other games in the batch are written as usual.
+    """
+
+    def __init__(
+        self,
+        store: GameStore,
+        mode: str = "batched",
+        interval: float = 1.0,
+        *,
+        on_conflict: Callable[[str], None] | None = None,
+    ) -> None:
+        if mode not in PERSIST_MODES:
+            raise ValueError(f"Unknown persistence mode: {mode!r} (expected one of {PERSIST_MODES})")
+        self.store = store
+        self.mode = mode
+        self.interval = interval
+        self._on_conflict = on_conflict
+        self._pending: dict[str, GameWrite] = {}
+        self._cond = threading.Condition()
+        self._in_flight: set[str] = set()
+        self._flush_requested = False
+        self._closed = False
+        self.saves = 0
+        self.events = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.flush_timeouts = 0
+        self.errors = 0
+        self.conflicts = 0
+        self.max_queue_depth = 0
+        self.last_batch_ms = 0.0
+        self._thread: threading.Thread | None = None
+        if mode != "sync":
+            self._thread = threading.Thread(target=self._run, name="litstone-writer", daemon=True)
+            self._thread.start()
+
+    def save(
+        self,
+        game_id: str,
+        state: dict[str, Any],
+        archive: Iterable[tuple[int, str]] = (),
+        events: Iterable[GameEvent] = (),
+    ) -> None:
+        self._submit(game_id, GameWrite(state, tuple(archive), tuple(events)))
+
+    def append_events(
+        self,
+        game_id: str,
+        events: Iterable[GameEvent],
+        archive: Iterable[tuple[int, str]] = (),
+    ) -> None:
+        self._submit(game_id, GameWrite(None, tuple(archive), tuple(events)))
+
+    def delete(self, game_id: str) -> None:
+        self._submit(game_id, GameWrite(delete=True))
+
+    def _submit(self, game_id: str, write: GameWrite) -> None:
+        if self.mode == "sync":
+            self._count(write)
+            try:
+                self.store.write_batch({game_id: write})
+            except EventConflict:
+                with self._cond:
+                    self.conflicts += 1
+                self._conflicted(game_id)
+            return
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("GameWriter is closed")
+            self._count(write)
+            queued = self._pending.get(game_id)
+            if queued is not None:
+                self.coalesced += 1
+                write = queued.merge(write)
+            self._pending[game_id] = write
+            self.max_queue_depth = max(self.max_queue_depth, len(self._pending))
+            if self.mode == "batched":
+                self._cond.notify_all()
+
+    def _count(self, write: GameWrite) -> None:
+        self.saves += write.state is not None
+        self.events += len(write.events)
+
+    def pending(self, game_id: str) -> bool:
+        """True while ``game_id`` has queued writes not yet committed."""
+        with self._cond:
+            return game_id in self._pending or game_id in self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until everything queued so far is committed; False on timeout."""
+        if self._thread is None:
+            return True
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            if self._cond.wait_for(lambda: not self._pending and not self._in_flight, timeout):
+                return True
+            self.flush_timeouts += 1
+            return False
+
+    def close(self, timeout: float | None = 10.0) -> None:
+        """Flush and stop the writer thread (safe to call more than once)."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "mode": self.mode,
+                "queue_depth": len(self._pending),
+                "max_queue_depth": self.max_queue_depth,
+                "saves": self.saves,
+                "events": self.events,
+                "coalesced": self.coalesced,
+                "batches": self.batches,
+                "errors": self.errors,
+                "conflicts": self.conflicts,
+                "flush_timeouts": self.flush_timeouts,
+                "last_batch_ms": round(self.last_batch_ms, 3),
+            }
+
+    def _conflicted(self, game_id: str) -> None:
+        log.error("Game %s is behind its recorded events; dropped its write", game_id)
+        if self._on_conflict is None:
+            return
+        try:
+            self._on_conflict(game_id)
+        except Exception:
+            log.exception("on_conflict failed for game %s", game_id)
+
+    def _ready(self) -> bool:
+        if self._closed or self._flush_requested:
+            return True
+        return self.mode == "batched" and bool(self._pending)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(self._ready, None if self.mode == "batched" else self.interval)
+                batch, self._pending = self._pending, {}
+                self._flush_requested = False
+                if not batch:
+                    self._cond.notify_all()
+                    if self._closed:
+                        return
+                    continue
+                self._in_flight = set(batch)
+            started = time.perf_counter()
+            try:
+                self.store.write_batch(batch)
+            except EventConflict as exc:
+                with self._cond:
+                    self.conflicts += 1
+                    self._pending.pop(exc.game_id, None)
+                    del batch[exc.game_id]
+                    for game_id, write in batch.items():     # retried on the next pass
+                        queued = self._pending.get(game_id)
+                        self._pending[game_id] = write.merge(queued) if queued else write
+                    self._flush_requested = True
+                self._conflicted(exc.game_id)
+            except Exception:
+                log.exception("Failed to write %d game(s); re-queueing", len(batch))
+                with self._cond:
+                    self.errors += 1
+                    for game_id, write in batch.items():
+                        queued = self._pending.get(game_id)
+                        self._pending[game_id] = write.merge(queued) if queued else write
+                time.sleep(min(self.interval, 1.0))
+            else:
+                self.batches += 1
+            finally:
+                self.last_batch_ms = (time.perf_counter() - started) * 1000
+                with self._cond:
+                    self._in_flight = set()
+                    self._cond.notify_all()
@@ -7,3 +7,13 @@ threads = int(os.environ.get("GUNICORN_THREADS", "4"))
 timeout = 120
 accesslog = "-"
 errorlog = "-"
+
+
+def worker_exit(server, worker):
+    """Finish queued AI turns, then drain the write-behind queue, before a worker goes away."""
+    import sys
+
+    app_module = sys.modules.get("server")
+    if app_module is not None:
+        app_module.JOBS.close()
+        app_module.WRITER.close()
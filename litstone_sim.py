@@ -0,0 +1,276 @@
+"""
+litstone_sim.py — Headless AI-vs-AI self-play simulator for LitStone.
+
+Plays complete matches with create_ai_opponent() / run_ai_turn() /
+check_win() and no server, spread over a process pool.  Entrants are the
+product of the --classes, --decks and --difficulties lists; every pair of
+entrants plays --games seeded games (with side B taken from the --vs-*
+lists when given, otherwise round-robin).  A deck is "curved" or a
+BOSS_PRESETS id, which brings its own class and hero HP.  Reports
+games/sec and each pairing's win rate with a Wilson confidence interval.
+
+Run with:  python litstone_sim.py --classes Mage,Warrior --difficulties normal,hard --games 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import NamedTuple
+
+import game_logic as gl
+
+MAX_TURNS = 80          # a match still running after this many turns is a draw
+CHUNK_GAMES = 250       # games per pool task
+Z_95 = 1.959964
+
+
+class Entrant(NamedTuple):
+    hero_class: str
+    deck: str           # "curved" or a BOSS_PRESETS id
+    difficulty: str
+
+    @property
+    def label(self) -> str:
+        deck = "" if self.deck == "curved" else f"[{self.deck}]"
+        return f"{self.hero_class}{deck}/{self.difficulty}"
+
+
+class PairResult(NamedTuple):
+    a: Entrant
+    b: Entrant
+    wins: int
+    losses: int
+    draws: int
+    turns: int
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.losses + self.draws
+
+
+def game_seed(base_seed: int, pair: int, game: int) -> int:
+    """Stable 63-bit seed for one game, independent of worker count and order."""
+    digest = hashlib.blake2b(f"{base_seed}:{pair}:{game}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1
+
+
+def wilson_interval(successes: float, n: int, z: float = Z_95) -> tuple[float, float]:
+    """Wilson score interval for a binomial proportion (draws count as half a win)."""
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    denom = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+def build_entrants(classes: list[str], decks: list[str], difficulties: list[str]) -> list[Entrant]:
+    entrants: list[Entrant] = []
+    for hero_class, deck, difficulty in itertools.product(classes, decks, difficulties):
+        if deck != "curved":
+            hero_class = gl.BOSS_PRESETS[deck]["hero_class"]
+        if difficulty not in gl.AI_DIFFICULTIES:
+            raise ValueError(f"unknown difficulty: {difficulty}")
+        entrant = Entrant(hero_class, deck, difficulty)
+        if entrant not in entrants:
+            entrants.append(entrant)
+    return entrants
+
+
+def _create(entrant: Entrant, rng) -> gl.PlayerState:
+    if entrant.deck == "curved":
+        return gl.create_ai_opponent(hero_class=entrant.hero_class, rng=rng)
+    return gl.create_ai_opponent(boss_id=entrant.deck, rng=rng)
+
+
+def play_game(a: Entrant, b: Entrant, seed: int) -> tuple[str, int]:
+    """Play one match; returns ("a" | "b" | "draw", turns played)."""
+    with gl.silent_logging():
+        return _play_game(a, b, seed)
+
+
+def _play_game(a: Entrant, b: Entrant, seed: int) -> tuple[str, int]:
+    setup = gl.game_rng(seed, 0)
+    pa, pb = _create(a, setup), _create(b, setup)
+    pa.name, pb.name = "A", "B"
+    first, second = (pa, pb) if setup.random() < 0.5 else (pb, pa)
+    diff = {id(pa): a.difficulty, id(pb): b.difficulty}
+    for _ in range(gl.OPENING_HAND_FIRST):
+        gl.draw_card(first)
+    for _ in range(gl.OPENING_HAND_SECOND):
+        gl.draw_card(second)
+    mulligan = gl.game_rng(seed, 1)
+    gl.ai_do_mulligan(first, rng=mulligan)
+    gl.ai_do_mulligan(second, rng=mulligan)
+    gl.give_coin(second)
+
+    turn = 0
+    winner = None
+    while turn < MAX_TURNS and not winner:
+        mover, opp = (first, second) if turn % 2 == 0 else (second, first)
+        gl.run_ai_turn(mover, opp, draw=turn > 0, difficulty=diff[id(mover)],
+                       rng=gl.game_rng(seed, turn + 2))
+        turn += 1
+        winner = gl.check_win(pa, pb)
+    if winner == "A":
+        return "a", turn
+    if winner == "B":
+        return "b", turn
+    return "draw", turn
+
+
+def run_chunk(pair: int, a: Entrant, b: Entrant, base_seed: int,
+              start: int, stop: int) -> tuple[int, int, int, int, int]:
+    """Play games [start, stop) of one pairing; returns (pair, wins, losses, draws, turns)."""
+    wins = losses = draws = turns = 0
+    for game in range(start, stop):
+        outcome, played = play_game(a, b, game_seed(base_seed, pair, game))
+        turns += played
+        if outcome == "a":
+            wins += 1
+        elif outcome == "b":
+            losses += 1
+        else:
+            draws += 1
+    return pair, wins, losses, draws, turns
+
+
+def _init_worker() -> None:
+    # Simulation workers are pool processes themselves; no nested search pools.
+    gl.AI_SEARCH_WORKERS = 0
+
+
+def simulate(
+    pairs: list[tuple[Entrant, Entrant]],
+    games: int,
+    *,
+    seed: int = 1,
+    workers: int = 0,
+    chunk: int = CHUNK_GAMES,
+) -> list[PairResult]:
+    """Play ``games`` games for every pairing; ``workers`` < 2 runs in-process.
+
+    Results depend only on ``seed``, never on the worker count or on which
+    chunk finishes first (master-tier games excepted: their search depth
+    follows the wall clock).
+    """
+    tasks = [
+        (i, a, b, seed, start, min(start + chunk, games))
+        for i, (a, b) in enumerate(pairs)
+        for start in range(0, games, chunk)
+    ]
+    totals = [[0, 0, 0, 0] for _ in pairs]
+    if workers < 2:
+        outputs = (run_chunk(*task) for task in tasks)
+        _collect(outputs, totals)
+    else:
+        with ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker,
+        ) as pool:
+            futures = [pool.submit(run_chunk, *task) for task in tasks]
+            _collect((f.result() for f in as_completed(futures)), totals)
+    return [PairResult(a, b, *totals[i]) for i, (a, b) in enumerate(pairs)]
+
+
+def _collect(outputs, totals: list[list[int]]) -> None:
+    for pair, wins, losses, draws, turns in outputs:
+        row = totals[pair]
+        row[0] += wins
+        row[1] += losses
+        row[2] += draws
+        row[3] += turns
+
+
+def report(results: list[PairResult], elapsed: float) -> str:
+    total = sum(r.games for r in results)
+    width = max([len(r.a.label) for r in results] + [len(r.b.label) for r in results] + [6])
+    lines = [
+        f"{'A':<{width}}  {'B':<{width}}  {'games':>7}  {'A win%':>7}  {'95% CI':>15}  "
+        f"{'draws':>5}  {'turns':>5}",
+    ]
+    for r in results:
+        score = r.wins + r.draws / 2
+        lo, hi = wilson_interval(score, r.games)
+        rate = score / r.games if r.games else 0.0
+        avg_turns = r.turns / r.games if r.games else 0.0
+        lines.append(
+            f"{r.a.label:<{width}}  {r.b.label:<{width}}  {r.games:>7}  {rate:>7.1%}  "
+            f"{f'{lo:.1%}-{hi:.1%}':>15}  {r.draws:>5}  {avg_turns:>5.1f}"
+        )
+    rate = total / elapsed if elapsed > 0 else 0.0
+    lines.append(f"\n{total} games in {elapsed:.1f}s ({rate:,.0f} games/sec)")
+    return "\n".join(lines)
+
+
+def _csv(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--classes", type=_csv, default=sorted(gl.HERO_CLASSES))
+    parser.add_argument("--decks", type=_csv, default=["curved"],
+                        help="'curved' and/or BOSS_PRESETS ids")
+    parser.add_argument("--difficulties", type=_csv, default=["normal"])
+    parser.add_argument("--vs-classes", type=_csv)
+    parser.add_argument("--vs-decks", type=_csv)
+    parser.add_argument("--vs-difficulties", type=_csv)
+    parser.add_argument("--games", type=int, default=1000, help="games per pairing")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk", type=int, default=CHUNK_GAMES)
+    parser.add_argument("--json", dest="json_path", help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    for cls in (args.classes or []) + (args.vs_classes or []):
+        if cls not in gl.HERO_CLASSES:
+            parser.error(f"unknown hero class: {cls}")
+    for deck in (args.decks or []) + (args.vs_decks or []):
+        if deck != "curved" and deck not in gl.BOSS_PRESETS:
+            parser.error(f"unknown deck: {deck}")
+    for difficulty in (args.difficulties or []) + (args.vs_difficulties or []):
+        if difficulty not in gl.AI_DIFFICULTIES:
+            parser.error(f"unknown difficulty: {difficulty}")
+
+    side_a = build_entrants(args.classes, args.decks, args.difficulties)
+    if args.vs_classes or args.vs_decks or args.vs_difficulties:
+        side_b = build_entrants(
+            args.vs_classes or args.classes,
+            args.vs_decks or args.decks,
+            args.vs_difficulties or args.difficulties,
+        )
+        pairs = list(itertools.product(side_a, side_b))
+    else:
+        pairs = list(itertools.combinations_with_replacement(side_a, 2))
+
+    started = time.perf_counter()
+    results = simulate(pairs, args.games, seed=args.seed, workers=args.workers, chunk=args.chunk)
+    elapsed = time.perf_counter() - started
+    print(report(results, elapsed))
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump({
+                "seed": args.seed,
+                "elapsed": elapsed,
+                "results": [
+                    {"a": r.a._asdict(), "b": r.b._asdict(), "wins": r.wins,
+                     "losses": r.losses, "draws": r.draws, "turns": r.turns}
+                    for r in results
+                ],
+            }, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
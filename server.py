@@ -3,14 +3,25 @@ server.py — Flask web server for LitStone.
 Serves the browser-based UI and exposes a JSON REST API for all game actions.
 """
 
+import atexit
+import functools
+import hashlib
+import logging
 import os
+import queue
 import random
+import threading
+import time
 import uuid
+from collections import OrderedDict
 from contextlib import contextmanager
+from typing import NamedTuple
 
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, render_template, request
 from whitenoise import WhiteNoise
 
+from ai_jobs import AIJob, AIJobQueue, QueueFull
+from game_cache import GameCache, GameLocks
 from game_logic import (
     BOSS_PRESETS,
     CAMPAIGN_NODES,
@@ -18,10 +29,11 @@ from game_logic import (
     CURVE_TARGETS,
     DECK_SIZE,
     DEFAULT_HERO_HP,
-    GAME_LOG,
     HERO_CLASSES,
     OPENING_HAND_FIRST,
     OPENING_HAND_SECOND,
+    GameState,
+    PlayerState,
     ai_do_mulligan,
     apply_practice_options,
     build_curved_ai_deck,
@@ -35,17 +47,22 @@ from game_logic import (
     create_player,
     do_mulligan,
     draw_card,
+    engine_context,
     execute_move,
+    find_lethal,
+    game_rng,
     get_campaign_node,
     get_legal_moves,
     give_coin,
     log_action,
+    new_game_seed,
     normalize_difficulty,
     run_ai_turn,
-    set_active_log,
     start_turn,
 )
-from game_store import GameStore
+from game_store import GameEvent, GameStore, GameWriter
+
+log = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "litstone-dev-secret")
@@ -56,17 +73,262 @@ app.wsgi_app = WhiteNoise(app.wsgi_app, root=_static_root, prefix="static/")
 # ---------------------------------------------------------------------------
 # Per-session game state (keyed by game_id UUID)
 # ---------------------------------------------------------------------------
-STORE = GameStore(os.environ.get("LITSTONE_DB_PATH", "litstone.db"))
-GAMES: dict[str, dict] = STORE.load_all()
+STORE = GameStore(
+    os.environ.get("LITSTONE_DB_PATH", "litstone.db"),
+    codec=os.environ.get("LITSTONE_STATE_CODEC", "binary"),
+)
+LOG_TAIL = 60   # log lines in a full state response
+
+# Each action is appended to the game's event log; a full snapshot is
+# written only at turn boundaries (mulligan, end of turn) and after every
+# SNAPSHOT_EVERY events, so a reload replays at most that many moves.
+SNAPSHOT_EVERY = max(1, int(os.environ.get("LITSTONE_SNAPSHOT_EVERY", "20")))
+
+def _drop_stale_game(game_id: str) -> None:
+    """Forget a game whose writes clashed with its recorded events; the next request reloads it."""
+    GAMES.pop(game_id, None)
+    UNSAVED.take(game_id)
+    VIEWS.forget(game_id)
+
+
+# Saves go through a write-behind queue: "sync" writes inline, "batched"
+# commits whatever is queued on a writer thread, "interval" commits every
+# LITSTONE_PERSIST_INTERVAL seconds.  The queue is drained at exit.  Events
+# are append-only: a save that would renumber recorded history is dropped
+# along with this process's copy of the game.
+WRITER = GameWriter(
+    STORE,
+    mode=os.environ.get("LITSTONE_PERSIST_MODE", "batched"),
+    interval=float(os.environ.get("LITSTONE_PERSIST_INTERVAL", "1.0")),
+    on_conflict=_drop_stale_game,
+)
+atexit.register(WRITER.close)
+
+# Loading a game with writes still queued, or reading archived log lines,
+# waits for the writer to commit first.  That wait happens under the game's
+# lock, so it is capped at LITSTONE_FLUSH_TIMEOUT seconds; past it the
+# request gets a 503 rather than a stale or gappy read.
+PERSIST_FLUSH_TIMEOUT = float(os.environ.get("LITSTONE_FLUSH_TIMEOUT", "5.0"))
+
+
+class WritesBehind(RuntimeError):
+    """Queued saves did not reach SQLite within PERSIST_FLUSH_TIMEOUT."""
+
+
+def _flush_writes() -> None:
+    if not WRITER.flush(PERSIST_FLUSH_TIMEOUT):
+        raise WritesBehind(f"Queued saves not committed within {PERSIST_FLUSH_TIMEOUT:g} s")
+
+
+@app.errorhandler(WritesBehind)
+def _writes_behind_response(exc: WritesBehind):
+    resp = jsonify({"error": "Saving is running behind; try again shortly", "write_behind": WRITER.stats()})
+    resp.headers["Retry-After"] = "1"
+    return resp, 503
+
+# Each job's status, and its result once finished, is also written to
+# STORE, so /api/jobs/<id> answers from whichever Gunicorn worker it reaches.
+AI_JOB_MAX_WAIT = 30.0      # seconds /api/jobs/<id>?wait= may block, well inside gunicorn's timeout
+AI_JOB_POLL_INTERVAL = 0.05  # seconds between reads of a job another process is running
+AI_JOB_RETENTION = 3600.0   # seconds a finished job's record is kept
+
+
+def _job_body(job: AIJob) -> dict:
+    info = job.to_dict()
+    if job.status == "done":
+        info["result"] = job.result
+    return info
+
+
+def _share_job(job: AIJob) -> None:
+    STORE.save_job(job.job_id, job.game_id, job.status, _job_body(job))
+    if job.finished_at is not None:
+        STORE.prune_jobs(AI_JOB_RETENTION)
+
+
+JOBS = AIJobQueue(
+    workers=int(os.environ.get("LITSTONE_AI_JOB_WORKERS", "2")),
+    max_queued=int(os.environ.get("LITSTONE_AI_QUEUE_SIZE", "32")),
+    on_change=_share_job,
+)
+atexit.register(JOBS.close)     # runs before WRITER.close, so finished turns are saved
+
+
+def _load_game(game_id: str) -> GameState | None:
+    gs = UNSAVED.take(game_id)
+    if gs is not None:      # evicted before its final save: hand it straight back
+        return gs
+    if WRITER.pending(game_id):
+        _flush_writes()
+    state, tail = STORE.load_with_tail(game_id)
+    if state is None:
+        return None
+    gs = GameState.from_dict(state)
+    if gs.seed is None:     # saved before games were seeded: pin one before any events
+        gs.seed = new_game_seed()
+        _persist_game(gs)
+    for event in tail:
+        _replay_event(gs, event)
+    return gs
+
+
+def _persist_game(gs: GameState) -> None:
+    WRITER.save(gs.game_id, gs.to_dict(), gs.log.take_evicted())
+
+
+def _record_event(gs: GameState, kind: str, payload: dict, *, snapshot: bool = False) -> None:
+    """Append an applied action to the game's event log, with a snapshot when one is due."""
+    gs.event_seq += 1
+    event = GameEvent(gs.event_seq, kind, payload)
+    if snapshot or gs.event_seq % SNAPSHOT_EVERY == 0:
+        WRITER.save(gs.game_id, gs.to_dict(), gs.log.take_evicted(), [event])
+    else:
+        WRITER.append_events(gs.game_id, [event], gs.log.take_evicted())
+
+
+def _replay_event(gs: GameState, event: GameEvent) -> None:
+    """Re-apply a recorded action to a game loaded from an older snapshot."""
+    payload = event.payload
+    if event.kind != "new_game":
+        with _with_game_log(gs):
+            if event.kind == "move":
+                _apply_move(gs, tuple(payload["move"]))
+            elif event.kind == "end_turn":
+                _apply_end_turn(gs, payload["ai_moves"])
+            elif event.kind == "mulligan":
+                _apply_mulligan(gs, payload["indices"], payload["ai_moves"])
+    gs.event_seq = event.seq
+
+
+# Every read or change of a game happens under its lock in GAME_LOCKS (see
+# _game_lock and _locked_game): requests on one game are serialized, other
+# games go on in parallel.  The lock is never held while waiting for an AI job.
+GAME_LOCKS = GameLocks(int(os.environ.get("LITSTONE_LOCK_STRIPES", "64")))
+
+
+class UnsavedGames:
+    """Evicted games whose final save is waiting for their stripe's lock.
+
+    A game dropped from GAMES while another thread holds its stripe is not
+    snapshotted then, as that could save half an action.  It waits here
+    until a thread finds the stripe free and saves it (see _save_unsaved),
+    or until a request for it takes it back into the cache.
+    """
+
+    def __init__(self) -> None:
+        self._games: dict[str, GameState] = {}
+        self._lock = threading.Lock()
+        self.deferred = 0
+
+    def add(self, game_id: str, gs: GameState) -> None:
+        with self._lock:
+            self._games[game_id] = gs
+            self.deferred += 1
+
+    def take(self, game_id: str) -> GameState | None:
+        with self._lock:
+            return self._games.pop(game_id, None)
+
+    def take_stripe(self, lock) -> list[GameState]:
+        """Remove and return every waiting game guarded by ``lock``."""
+        with self._lock:
+            ids = [gid for gid in self._games if GAME_LOCKS.for_game(gid) is lock]
+            return [self._games.pop(gid) for gid in ids]
+
+    def waiting(self, lock) -> bool:
+        with self._lock:
+            return any(GAME_LOCKS.for_game(gid) is lock for gid in self._games)
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+
+UNSAVED = UnsavedGames()
+
+
+def _save_unsaved(lock) -> None:
+    """Save the games waiting in UNSAVED on ``lock``'s stripe while it is free."""
+    while UNSAVED.waiting(lock) and lock.acquire(blocking=False):
+        try:
+            for gs in UNSAVED.take_stripe(lock):
+                _persist_game(gs)
+        finally:
+            lock.release()
+
+
+def _evict_game(game_id: str, gs: GameState) -> None:
+    VIEWS.forget(game_id)
+    lock = GAME_LOCKS.for_game(game_id)
+    if lock.acquire(blocking=False):
+        try:
+            _persist_game(gs)
+        finally:
+            lock.release()
+        return
+    log.warning("Game %s evicted while its lock is held; saving it once the lock is free", game_id)
+    UNSAVED.add(game_id, gs)
+    _save_unsaved(lock)     # in case the holder let go before the game was queued
+
+
+@contextmanager
+def _game_lock(game_id: str):
+    """Hold ``game_id``'s lock for the block, then save games evicted meanwhile."""
+    lock = GAME_LOCKS.for_game(game_id)
+    try:
+        with lock:
+            yield
+    finally:
+        _save_unsaved(lock)
+
+
+# Games are loaded from STORE on first access and dropped (after a final
+# save) when the cache is full or a game sits idle past the TTL.
+GAMES: GameCache[GameState] = GameCache(
+    _load_game,
+    capacity=int(os.environ.get("LITSTONE_GAME_CACHE_SIZE", "512")),
+    ttl_seconds=float(os.environ.get("LITSTONE_GAME_CACHE_TTL", "1800")),
+    on_evict=_evict_game,
+)
+
+
+class ViewHistory:
+    """The last few state views sent for each game, keyed by state_version.
+
+    A client that reports the version it holds gets a patch against that
+    view instead of the full state; older versions fall back to full.
+    Games are forgotten from eviction and stale-reload paths that do not
+    hold the game's stripe, so the history has a lock of its own.
+    """
 
+    def __init__(self, depth: int) -> None:
+        self.depth = max(1, depth)
+        self._views: dict[str, OrderedDict[int, dict]] = {}
+        self._lock = threading.Lock()
 
-def _persist_game(gs: dict) -> None:
-    STORE.save(gs["game_id"], gs)
+    def remember(self, game_id: str, version: int, view: dict, since: int | None) -> dict | None:
+        """Record ``view`` as ``version``; return the view at ``since`` if still known."""
+        with self._lock:
+            history = self._views.setdefault(game_id, OrderedDict())
+            base = history.get(since) if since is not None else None
+            history[version] = view
+            history.move_to_end(version)
+            while len(history) > self.depth:
+                history.popitem(last=False)
+            return base
+
+    def forget(self, game_id: str) -> None:
+        with self._lock:
+            self._views.pop(game_id, None)
+
+
+VIEWS = ViewHistory(int(os.environ.get("LITSTONE_STATE_HISTORY", "8")))
 
 
 def _remove_game(game_id: str) -> None:
     GAMES.pop(game_id, None)
-    STORE.delete(game_id)
+    UNSAVED.take(game_id)
+    VIEWS.forget(game_id)
+    WRITER.delete(game_id)
 
 
 def _resolve_game_id() -> str | None:
@@ -75,10 +337,43 @@ def _resolve_game_id() -> str | None:
     return gid or None
 
 
-def _get_game(game_id: str | None) -> dict | None:
+def _resolve_since_version() -> int | None:
+    """The ``since_version`` (a ``state_version`` the client holds), if any."""
+    data = request.get_json(silent=True) or {}
+    raw = data.get("since_version", request.args.get("since_version"))
+    try:
+        version = int(raw)
+    except (TypeError, ValueError):
+        return None
+    return version if version >= 0 else None
+
+
+def _resolve_log_since() -> int | None:
+    """The client's ``log_since`` cursor (the ``log_seq`` it last saw), if any."""
+    data = request.get_json(silent=True) or {}
+    raw = data.get("log_since", request.args.get("log_since"))
+    try:
+        since = int(raw)
+    except (TypeError, ValueError):
+        return None
+    return since if since >= 0 else None
+
+
+def _get_game(game_id: str | None) -> GameState | None:
+    """The game, reloaded first if another server process has moved it on.
+
+    Each Gunicorn worker caches games separately, so a cached copy is only
+    served while its event_seq matches the last event in STORE (unless this
+    process still has writes of its own queued for the game).
+    """
     if not game_id:
         return None
-    return GAMES.get(game_id)
+    gs = GAMES.get(game_id)
+    if gs is not None and not WRITER.pending(game_id) and STORE.last_event_seq(game_id) != gs.event_seq:
+        GAMES.pop(game_id, None)
+        VIEWS.forget(game_id)
+        gs = GAMES.get(game_id)
+    return gs
 
 
 def _validate_deck(deck: list, hero_class: str) -> bool:
@@ -94,65 +389,143 @@ def _validate_deck(deck: list, hero_class: str) -> bool:
     )
 
 
-def _serialize(player: dict) -> dict:
-    """Return a JSON-safe copy of a player dict."""
-    p = dict(player)
-    p["board"] = [dict(m) for m in player["board"]]
-    return p
+def _serialize(player: PlayerState) -> dict:
+    """Return a JSON-safe copy of a player."""
+    return player.to_dict()
 
 
-def _serialize_opponent(player: dict) -> dict:
+def _serialize_opponent(player: PlayerState) -> dict:
     """Return a JSON-safe copy of an opponent player dict with hidden information masked."""
     p = _serialize(player)
-    p["hand"] = ["?"] * len(player["hand"])
-    p["deck"] = ["?"] * len(player["deck"])
+    p["hand"] = ["?"] * len(player.hand)
+    p["deck"] = ["?"] * len(player.deck)
     return p
 
 
-def _state_response(gs: dict, *, include_card_db: bool = False) -> dict:
+def _log_lines_since(gs: GameState, since: int) -> list[str]:
+    """Every log line numbered ``since`` or later, reading archived ones from the store."""
+    log = gs.log
+    since = min(since, log.next_seq)
+    lines: list[str] = []
+    if since < log.first_seq:
+        pending = log.evicted
+        archived_until = pending[0][0] if pending else log.first_seq
+        if since < archived_until:
+            _flush_writes()
+            lines = STORE.load_log(gs.game_id, since, archived_until)
+        lines += [line for seq, line in pending if seq >= since]
+    return lines + log.since(since)
+
+
+def _state_view(gs: GameState) -> dict:
+    """Everything a state response carries except the log and the card DB."""
     winner = check_win(gs["p1"], gs["p2"])
     mulligan = gs.get("mulligan_phase", False)
     legal = get_legal_moves(gs["p1"], gs["p2"]) if not winner and not mulligan else []
-    resp = {
+    view = {
         "game_id":          gs["game_id"],
+        "state_version":    gs.event_seq,
         "p1":               _serialize(gs["p1"]),
         "p2":               _serialize_opponent(gs["p2"]),
         "is_player_turn":   gs.get("is_player_turn", True),
         "player_goes_first": gs.get("player_goes_first", True),
         "turn_number":      gs.get("turn_number", 1),
-        "log":              list(gs.get("log", [])[-60:]),
+        "log_seq":          gs.log.next_seq,
         "winner":           winner,
         "_legal_moves":     legal,
         "mulligan_phase":   mulligan,
     }
-    if include_card_db:
-        resp["card_db"] = collectible_card_db()
-    resp["ai_difficulty"] = gs.get("ai_difficulty", "normal")
-    resp["opponent_name"] = gs["p2"].get("name", "AI")
-    resp["campaign_node"] = gs.get("campaign_node")
-    resp["boss_id"] = gs.get("boss_id")
-    resp["tutorial"] = gs.get("tutorial", False)
-    resp["mode"] = gs.get("mode", "standard")
+    view["ai_difficulty"] = gs.get("ai_difficulty", "normal")
+    view["opponent_name"] = gs["p2"].get("name", "AI")
+    view["campaign_node"] = gs.get("campaign_node")
+    view["boss_id"] = gs.get("boss_id")
+    view["tutorial"] = gs.get("tutorial", False)
+    view["mode"] = gs.get("mode", "standard")
     if gs.get("practice"):
-        resp["practice"] = gs["practice"]
+        view["practice"] = gs["practice"]
+    return view
+
+
+def _state_response(
+    gs: GameState,
+    *,
+    include_card_db: bool = False,
+    log_since: int | None = None,
+    since_version: int | None = None,
+) -> dict:
+    """The full state, or -- when the client still has ``since_version`` -- a patch from it.
+
+    A patch response carries ``base_version``, ``state_version``, the
+    ``patch`` ops that turn that version's view into the current one, and
+    the log lines written since.  A version that is no longer remembered
+    gets the full state instead.
+    """
+    view = _state_view(gs)
+    base = VIEWS.remember(gs.game_id, view["state_version"], view, since_version)
+    if base is not None:
+        return {
+            "game_id":       gs.game_id,
+            "base_version":  since_version,
+            "state_version": view["state_version"],
+            "patch":         _diff_view(base, view),
+            "log":           _log_lines_since(gs, base["log_seq"]),
+        }
+    resp = dict(view)
+    resp["log"] = gs.log.tail(LOG_TAIL) if log_since is None else _log_lines_since(gs, log_since)
+    if include_card_db:
+        resp["card_db"] = _card_db()
     return resp
 
 
+def _diff_view(old, new, path: list | None = None, ops: list | None = None) -> list[dict]:
+    """Patch ops (``set`` / ``del`` at a key path) turning ``old`` into ``new``.
+
+    Dicts and equal-length lists are compared item by item; a list whose
+    length changed is sent whole.
+    """
+    path = path or []
+    ops = [] if ops is None else ops
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "set", "path": path + [key], "value": value})
+            elif old[key] != value:
+                _diff_view(old[key], value, path + [key], ops)
+        ops.extend({"op": "del", "path": path + [key]} for key in old if key not in new)
+    elif isinstance(old, (list, tuple)) and isinstance(new, (list, tuple)) and len(old) == len(new):
+        for i, (a, b) in enumerate(zip(old, new)):
+            if a != b:
+                _diff_view(a, b, path + [i], ops)
+    elif old != new:
+        ops.append({"op": "set", "path": path, "value": new})
+    return ops
+
+
 @contextmanager
-def _with_game_log(gs: dict):
-    """Activate per-game logging for rule engine calls."""
-    set_active_log(gs.setdefault("log", []))
-    try:
+def _with_game_log(gs: GameState):
+    """Scope the game's log and next random stream to this thread's rule engine calls."""
+    with engine_context(gs.log, gs.next_rng()):
         yield gs
-    finally:
-        set_active_log(None)
 
 
-def _require_game() -> tuple[dict | None, tuple | None]:
-    gs = _get_game(_resolve_game_id())
-    if not gs:
-        return None, (jsonify({"error": "No game in progress"}), 400)
-    return gs, None
+@contextmanager
+def _locked_game(game_id: str | None):
+    """Hold ``game_id``'s lock for the block and yield the game (None if there is none).
+
+    Loading happens under the lock too, so a game is never loaded twice.
+    """
+    if not game_id:
+        yield None
+        return
+    with _game_lock(game_id):
+        yield _get_game(game_id)
+
+
+@contextmanager
+def _require_game():
+    """Yield ``(game, error response)`` for the request's game, holding its lock."""
+    with _locked_game(_resolve_game_id()) as gs:
+        yield (gs, None) if gs else (None, (jsonify({"error": "No game in progress"}), 400))
 
 
 def _normalize_target(raw) -> int | str | None:
@@ -161,14 +534,14 @@ def _normalize_target(raw) -> int | str | None:
     return None
 
 
-def _log_winner_if_any(p1: dict, p2: dict) -> str | None:
+def _log_winner_if_any(p1: PlayerState, p2: PlayerState) -> str | None:
     winner = check_win(p1, p2)
     if winner:
-        log_action(f"=== {winner} wins! ===")
+        log_action("=== %s wins! ===", winner)
     return winner
 
 
-def _deal_opening_hands(gs: dict) -> None:
+def _deal_opening_hands(gs: GameState) -> None:
     """Deal opening hands based on who goes first."""
     first, second = (gs["p1"], gs["p2"]) if gs["player_goes_first"] else (gs["p2"], gs["p1"])
     for _ in range(OPENING_HAND_FIRST):
@@ -177,8 +550,50 @@ def _deal_opening_hands(gs: dict) -> None:
         draw_card(second)
 
 
-def _finish_mulligan(gs: dict) -> None:
-    """AI mulligan, grant The Coin, and begin the first turn."""
+def _run_ai_turn(
+    gs: GameState, ai_moves: list | None = None, *, draw: bool = True, on_move=None, on_event=None,
+) -> list[tuple]:
+    """Play the AI's turn, or replay ``ai_moves`` recorded for it earlier."""
+    return run_ai_turn(
+        gs["p2"], gs["p1"], draw=draw, difficulty=gs.get("ai_difficulty", "normal"),
+        decision_rng=gs.next_rng(), moves=ai_moves, on_move=on_move, on_event=on_event,
+    )
+
+
+def _apply_mulligan(gs: GameState, indices: list[int], ai_moves: list | None = None) -> list[tuple]:
+    do_mulligan(gs["p1"], indices)
+    return _finish_mulligan(gs, ai_moves)
+
+
+def _apply_move(gs: GameState, move: tuple) -> None:
+    execute_move(gs["p1"], gs["p2"], move)
+    _log_winner_if_any(gs["p1"], gs["p2"])
+
+
+def _apply_end_turn(gs: GameState, ai_moves: list | None = None, *, on_move=None, on_event=None) -> list[tuple]:
+    """Hand the turn to the AI and, unless someone has won, back to the player.
+
+    ``on_move`` and ``on_event`` observe the AI's turn as it is played (see
+    ``run_ai_turn``); ``on_event`` also sees the player's start-of-turn draw.
+    """
+    p1, p2 = gs["p1"], gs["p2"]
+    gs["is_player_turn"] = False
+    log_action("--- AI's Turn ---")
+    ai_moves = _run_ai_turn(gs, ai_moves, on_move=on_move, on_event=on_event)
+    if not _log_winner_if_any(p1, p2):
+        gs["turn_number"] += 1
+        gs["is_player_turn"] = True
+        start_turn(p1, on_event)
+        if not _log_winner_if_any(p1, p2):
+            log_action("--- Your Turn (Turn %d) ---", gs["turn_number"])
+    return ai_moves
+
+
+def _finish_mulligan(gs: GameState, ai_moves: list | None = None) -> list[tuple]:
+    """AI mulligan, grant The Coin, and begin the first turn.
+
+    Returns the AI's moves when it goes first (replayed from ``ai_moves``).
+    """
     ai_do_mulligan(gs["p2"])
 
     if gs["player_goes_first"]:
@@ -194,19 +609,203 @@ def _finish_mulligan(gs: dict) -> None:
         start_turn(gs["p1"], draw=False)
         if not _log_winner_if_any(gs["p1"], gs["p2"]):
             log_action("--- Your Turn (Turn 1) ---")
-        return
+        return []
 
     gs["is_player_turn"] = False
     gs["turn_number"] = 1
     log_action("--- AI goes first ---")
-    run_ai_turn(gs["p2"], gs["p1"], draw=False, difficulty=gs.get("ai_difficulty", "normal"))
+    ai_moves = _run_ai_turn(gs, ai_moves, draw=False)
     if _log_winner_if_any(gs["p1"], gs["p2"]):
-        return
+        return ai_moves
     gs["is_player_turn"] = True
     gs["turn_number"] = 2
     start_turn(gs["p1"])
     if not _log_winner_if_any(gs["p1"], gs["p2"]):
         log_action("--- Your Turn (Turn 2) ---")
+    return ai_moves
+
+
+# ---------------------------------------------------------------------------
+# AI turn jobs
+# ---------------------------------------------------------------------------
+# An end of turn is played on the JOBS worker pool, never on the request
+# thread: /api/action either waits for the job or, with ``async``, answers
+# 202 with its id for /api/jobs/<id> to poll or await.  At most
+# LITSTONE_AI_QUEUE_SIZE turns wait for LITSTONE_AI_JOB_WORKERS workers; past
+# that, end_turn is refused with 503 until the backlog drains.
+
+def _end_turn_job(game_id: str, log_since: int | None, since_version: int | None, *, observe=None) -> dict:
+    """Play the AI's turn, record it, and return the action response.
+
+    Runs on a JOBS worker under the game's lock, against whatever copy of
+    the game the cache holds by then.  ``observe(gs)`` may return
+    ``(on_move, on_event)`` hooks to watch the turn being played.
+    """
+    with _locked_game(game_id) as gs:
+        if gs is None:
+            raise LookupError(f"Game {game_id} no longer exists")
+        on_move, on_event = observe(gs) if observe else (None, None)
+        with _with_game_log(gs):
+            ai_moves = _apply_end_turn(gs, on_move=on_move, on_event=on_event)
+        _record_event(gs, "end_turn", {"ai_moves": ai_moves}, snapshot=True)
+        return _state_response(gs, log_since=log_since, since_version=since_version)
+
+
+def _job_response(body: dict):
+    """Poll view of a job (see _job_body): 202 while pending, its action response once done."""
+    if body["status"] == "done":
+        return jsonify(body)
+    if body["status"] == "failed":
+        return jsonify(body), 500
+    return jsonify(body), 202
+
+
+def _queue_full_response():
+    resp = jsonify({"error": "The AI is busy; try again shortly", "ai_jobs": JOBS.stats()})
+    resp.headers["Retry-After"] = "1"
+    return resp, 503
+
+
+def _check_turn_open(gs: GameState) -> tuple | None:
+    """An error response unless the player may act in ``gs`` right now."""
+    if gs.get("mulligan_phase"):
+        return jsonify({"error": "Mulligan phase in progress"}), 400
+    if check_win(gs["p1"], gs["p2"]):
+        return jsonify({"error": "Game over"}), 400
+    job = JOBS.active(gs.game_id)
+    if job is not None:
+        return jsonify({"error": "AI turn in progress", "job_id": job.job_id}), 409
+    if not gs.get("is_player_turn"):
+        return jsonify({"error": "Not your turn"}), 400
+    return None
+
+
+# /api/end_turn/stream runs the same job and relays it as Server-Sent
+# Events while it runs: ``job`` once queued, an ``effect`` per rule-engine
+# notification, a ``move`` frame (both boards plus new log lines) after each
+# AI move, then ``done`` with the same body /api/action would have returned.
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {app.json.dumps(data)}\n\n"
+
+
+def _stream_end_turn(game_id: str, log_since: int | None, since_version: int | None):
+    """Queue the AI's turn and return an iterator over its SSE frames.
+
+    Raises QueueFull, before anything is streamed, when the queue is full.
+    """
+    frames: queue.SimpleQueue[str | None] = queue.SimpleQueue()
+
+    def observe(gs: GameState):
+        sides = {id(gs["p1"]): "p1", id(gs["p2"]): "p2"}
+        cursor = gs.log.next_seq
+
+        def on_event(kind, player, target, value) -> None:
+            frames.put(_sse("effect", {
+                "type": kind, "side": sides.get(id(player)), "target": target, "value": value,
+            }))
+
+        def on_move(move) -> None:
+            nonlocal cursor
+            lines = _log_lines_since(gs, cursor)
+            cursor += len(lines)
+            frames.put(_sse("move", {
+                "move":    list(move),
+                "p1":      _serialize(gs["p1"]),
+                "p2":      _serialize_opponent(gs["p2"]),
+                "log_seq": cursor,
+                "log":     lines,
+            }))
+
+        return on_move, on_event
+
+    def play() -> dict:
+        try:
+            result = _end_turn_job(game_id, log_since, since_version, observe=observe)
+        except Exception as exc:        # surface the failure instead of a silently cut stream
+            frames.put(_sse("error", {"error": str(exc)}))
+            raise
+        else:
+            frames.put(_sse("done", result))
+            return result
+        finally:
+            frames.put(None)
+
+    # Queued before the response is returned, so an accepted end of turn
+    # is played and saved even if the client goes away mid-stream.
+    job = JOBS.submit(game_id, play)
+
+    def relay():
+        yield _sse("job", job.to_dict())
+        while (frame := frames.get()) is not None:
+            yield frame
+
+    return relay()
+
+
+# ---------------------------------------------------------------------------
+# Conditional GET
+# ---------------------------------------------------------------------------
+# Read-only payloads carry strong ETags and answer a matching If-None-Match
+# with 304 Not Modified.  The card and campaign catalogs never change while
+# the process runs, so they are serialized once and tagged with a hash of
+# their bytes; a game's state is tagged by its version, checked before the
+# response is built.
+
+class CachedPayload(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def _cached_payload(data) -> CachedPayload:
+    body = app.json.dumps(data).encode()
+    return CachedPayload(body, hashlib.blake2b(body, digest_size=16).hexdigest())
+
+
+@functools.cache
+def _card_db() -> dict[str, dict]:
+    """collectible_card_db() built once; responses share it read-only."""
+    return collectible_card_db()
+
+
+@functools.cache
+def _cards_payload() -> CachedPayload:
+    return _cached_payload({
+        "card_db": _card_db(),
+        "hero_classes": HERO_CLASSES,
+        "deck_size": DECK_SIZE,
+    })
+
+
+@functools.cache
+def _campaign_payload() -> CachedPayload:
+    nodes = _enrich_campaign_nodes()
+    return _cached_payload({
+        "nodes": nodes,
+        "deck_size": DECK_SIZE,
+        "total_chapters": len(nodes),
+    })
+
+
+def _not_modified(etag: str) -> Response | None:
+    """A 304 response if the client already holds ``etag``."""
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
+    return None
+
+
+def _tagged(body: bytes | Response, etag: str) -> Response:
+    resp = body if isinstance(body, Response) else Response(body, mimetype="application/json")
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"     # always revalidate; a 304 is cheap
+    return resp
+
+
+def _payload_response(payload: CachedPayload) -> Response:
+    return _not_modified(payload.etag) or _tagged(payload.body, payload.etag)
 
 
 # ---------------------------------------------------------------------------
@@ -226,18 +825,17 @@ def health():
         "deck_size": DECK_SIZE,
         "active_games": len(GAMES),
         "persisted_games": STORE.count(),
+        "game_cache": {**GAMES.stats(), "deferred_saves": UNSAVED.deferred, "awaiting_save": len(UNSAVED)},
         "persistence": "sqlite",
+        "write_behind": WRITER.stats(),
+        "ai_jobs": JOBS.stats(),
     })
 
 
 @app.route("/api/cards", methods=["GET"])
 def cards():
     """Return the card database and hero class list — available before any game starts."""
-    return jsonify({
-        "card_db": collectible_card_db(),
-        "hero_classes": HERO_CLASSES,
-        "deck_size": DECK_SIZE,
-    })
+    return _payload_response(_cards_payload())
 
 
 def _parse_practice_options(data: dict) -> dict | None:
@@ -250,7 +848,14 @@ def _parse_practice_options(data: dict) -> dict | None:
     }
 
 
-def _resolve_match_setup(data: dict) -> dict:
+def _parse_seed(data: dict) -> int | None:
+    seed = data.get("seed")
+    if isinstance(seed, int) and not isinstance(seed, bool) and seed >= 0:
+        return seed
+    return None
+
+
+def _resolve_match_setup(data: dict, rng: random.Random) -> dict:
     """Derive AI opponent, difficulty, and mode flags from a new-game request."""
     practice = _parse_practice_options(data)
     tutorial = bool(data.get("tutorial"))
@@ -274,6 +879,7 @@ def _resolve_match_setup(data: dict) -> dict:
         hero_class=ai_class,
         boss_id=boss_id,
         campaign_node=campaign_node if node and not boss_id else None,
+        rng=rng,
     )
 
     if practice:
@@ -316,26 +922,35 @@ def _enrich_campaign_nodes() -> list[dict]:
 
 @app.route("/api/campaign", methods=["GET"])
 def campaign_info():
-    nodes = _enrich_campaign_nodes()
-    return jsonify({
-        "nodes": nodes,
-        "deck_size": DECK_SIZE,
-        "total_chapters": len(nodes),
-    })
+    return _payload_response(_campaign_payload())
 
 
 @app.route("/api/starter_deck", methods=["GET"])
 def starter_deck():
-    """Return a curved 30-card starter list for deck builder (mirrors AI curve)."""
+    """Return a curved 30-card starter list for deck builder (mirrors AI curve).
+
+    Each call deals a fresh random list; pass ``seed`` for a fixed one,
+    which is then cacheable by ETag.
+    """
     hero_class = request.args.get("hero_class", "Mage")
     if hero_class not in HERO_CLASSES:
         return jsonify({"error": f"Unknown hero class: {hero_class}"}), 400
-    return jsonify({
+    seed = _parse_seed({"seed": request.args.get("seed", type=int)})
+    if seed is not None:
+        etag = f"{_cards_payload().etag[:16]}-{hero_class}-{seed}"
+        cached = _not_modified(etag)
+        if cached:
+            return cached
+    resp = jsonify({
         "hero_class": hero_class,
-        "deck": build_curved_ai_deck(hero_class),
+        "deck": build_curved_ai_deck(hero_class, rng=game_rng(seed, 0) if seed is not None else None),
         "deck_size": DECK_SIZE,
         "curve_targets": CURVE_TARGETS,
     })
+    if seed is None:
+        resp.headers["Cache-Control"] = "no-store"
+        return resp
+    return _tagged(resp, etag)
 
 
 @app.route("/api/new_game", methods=["POST"])
@@ -363,25 +978,29 @@ def new_game():
             return jsonify({"error": f"Unknown campaign node: {campaign_node}"}), 400
 
     game_id = str(uuid.uuid4())
-    GAME_LOG.clear()
-
-    match = _resolve_match_setup(data)
-    player_goes_first = random.choice([True, False])
-    gs = {
-        "game_id":           game_id,
-        "p1":                create_player("Player", player_cls, deck),
-        "p2":                match["p2"],
-        "turn_number":       1,
-        "is_player_turn":    True,
-        "mulligan_phase":    True,
-        "player_goes_first": player_goes_first,
-        "ai_difficulty":     match["difficulty"],
-        "campaign_node":     match["campaign_node"],
-        "boss_id":           match["boss_id"],
-        "tutorial":          match["tutorial"],
-        "mode":              match["mode"],
-        "log":               [],
-    }
+
+    seed = _parse_seed(data)
+    if seed is None:
+        seed = new_game_seed()
+    setup_rng = game_rng(seed, 0)
+    match = _resolve_match_setup(data, setup_rng)
+    player_goes_first = setup_rng.choice([True, False])
+    gs = GameState(
+        game_id=game_id,
+        p1=create_player("Player", player_cls, deck, rng=setup_rng),
+        p2=match["p2"],
+        turn_number=1,
+        is_player_turn=True,
+        mulligan_phase=True,
+        player_goes_first=player_goes_first,
+        ai_difficulty=match["difficulty"],
+        campaign_node=match["campaign_node"],
+        boss_id=match["boss_id"],
+        tutorial=match["tutorial"],
+        mode=match["mode"],
+        log=[],
+        seed=seed,
+    )
     if match["practice"]:
         opts = match["practice"]
         gs["practice"] = opts
@@ -389,129 +1008,189 @@ def new_game():
         apply_practice_options(gs["p2"], hp=opts["p2_hp"], infinite_mana=opts["infinite_mana"])
 
     GAMES[game_id] = gs
-    _persist_game(gs)
 
     with _with_game_log(gs):
         log_action("--- NEW GAME STARTED ---")
         if gs["mode"] == "campaign" and match["campaign_node"]:
             node = get_campaign_node(match["campaign_node"])
             if node:
-                log_action(f"--- Career: {node['name']} ---")
+                log_action("--- Career: %s ---", node["name"])
         if gs["tutorial"]:
             log_action("--- Tutorial Match — follow the hints ---")
         if gs.get("practice"):
             opts = gs["practice"]
             mana_note = " · infinite mana" if opts["infinite_mana"] else ""
-            log_action(
-                f"--- Practice Sandbox — You {opts['p1_hp']} HP · AI {opts['p2_hp']} HP{mana_note} ---"
-            )
-        log_action(f"Opponent: {gs['p2']['name']} ({gs['p2']['hero_class']}) · {gs['ai_difficulty'].title()} AI")
+            log_action("--- Practice Sandbox — You %s HP · AI %s HP%s ---",
+                       opts["p1_hp"], opts["p2_hp"], mana_note)
+        log_action("Opponent: %s (%s) · %s AI",
+                   gs["p2"]["name"], gs["p2"]["hero_class"], gs["ai_difficulty"].title())
         order = "You go first." if player_goes_first else "AI goes first — you'll receive The Coin."
         log_action(order)
         _deal_opening_hands(gs)
         log_action("--- Mulligan Phase: choose cards to replace ---")
+    _record_event(gs, "new_game", {"seed": seed}, snapshot=True)
 
     return jsonify(_state_response(gs, include_card_db=True))
 
 
 @app.route("/api/mulligan", methods=["POST"])
 def do_mulligan_route():
-    gs, err = _require_game()
-    if err:
-        return err
-    if not gs.get("mulligan_phase"):
-        return jsonify({"error": "Not in mulligan phase"}), 400
-
-    data    = request.get_json() or {}
-    indices = data.get("indices", [])
-    if not isinstance(indices, list):
-        indices = []
-    indices = [i for i in indices if isinstance(i, int) and 0 <= i < len(gs["p1"]["hand"])]
+    with _require_game() as (gs, err):
+        if err:
+            return err
+        if not gs.get("mulligan_phase"):
+            return jsonify({"error": "Not in mulligan phase"}), 400
 
-    with _with_game_log(gs):
-        do_mulligan(gs["p1"], indices)
-        _finish_mulligan(gs)
-        _persist_game(gs)
+        data    = request.get_json() or {}
+        indices = data.get("indices", [])
+        if not isinstance(indices, list):
+            indices = []
+        indices = [i for i in indices if isinstance(i, int) and 0 <= i < len(gs["p1"]["hand"])]
 
-    return jsonify(_state_response(gs, include_card_db=True))
+        with _with_game_log(gs):
+            ai_moves = _apply_mulligan(gs, indices)
+        _record_event(gs, "mulligan", {"indices": indices, "ai_moves": ai_moves}, snapshot=True)
+
+        return jsonify(_state_response(
+            gs, include_card_db=True, log_since=_resolve_log_since(), since_version=_resolve_since_version(),
+        ))
 
 
 @app.route("/api/state", methods=["GET"])
 def get_state():
-    gs, err = _require_game()
-    if err:
-        return err
-    return jsonify(_state_response(gs))
+    with _require_game() as (gs, err):
+        if err:
+            return err
+        since_version = _resolve_since_version()
+        if since_version is not None:   # patches depend on the remembered views: never cached
+            return jsonify(_state_response(
+                gs, log_since=_resolve_log_since(), since_version=since_version,
+            ))
+        # Every change to a game is an event, so (version, log position) names
+        # the state exactly.  The query string (log_since) is part of the URL.
+        etag = f"{gs.game_id}-{gs.event_seq}-{gs.log.next_seq}"
+        cached = _not_modified(etag)
+        if cached:
+            return cached
+        return _tagged(jsonify(_state_response(gs, log_since=_resolve_log_since())), etag)
 
 
 @app.route("/api/action", methods=["POST"])
 def do_action():
-    gs, err = _require_game()
-    if err:
-        return err
-
-    p1 = gs["p1"]
-    p2 = gs["p2"]
-
-    if gs.get("mulligan_phase"):
-        return jsonify({"error": "Mulligan phase in progress"}), 400
+    data = request.get_json() or {}
+    with _require_game() as (gs, err):
+        if err:
+            return err
 
-    if check_win(p1, p2):
-        return jsonify({"error": "Game over"}), 400
+        p1 = gs["p1"]
+        p2 = gs["p2"]
 
-    if not gs.get("is_player_turn"):
-        return jsonify({"error": "Not your turn"}), 400
+        err = _check_turn_open(gs)
+        if err:
+            return err
 
-    data   = request.get_json() or {}
-    action = data.get("action")
-    idx    = data.get("idx")
-    target = data.get("target")
+        action = data.get("action")
+        idx    = data.get("idx")
+        target = data.get("target")
 
-    target = _normalize_target(target)
+        target = _normalize_target(target)
 
-    with _with_game_log(gs):
         if action == "end_turn":
-            gs["is_player_turn"] = False
-            log_action("--- AI's Turn ---")
-            run_ai_turn(p2, p1, difficulty=gs.get("ai_difficulty", "normal"))
-            if not _log_winner_if_any(p1, p2):
-                gs["turn_number"] += 1
-                gs["is_player_turn"] = True
-                start_turn(p1)
-                if not _log_winner_if_any(p1, p2):
-                    log_action(f"--- Your Turn (Turn {gs['turn_number']}) ---")
-            _persist_game(gs)
-            return jsonify(_state_response(gs))
-
-        move  = (action, idx, target)
-        legal = get_legal_moves(p1, p2)
-        if move not in legal:
-            return jsonify({"error": "Illegal move", "legal": legal}), 400
+            turn = functools.partial(_end_turn_job, gs.game_id, _resolve_log_since(), _resolve_since_version())
+            try:
+                job = JOBS.submit(gs.game_id, turn)
+            except QueueFull:
+                return _queue_full_response()
+        else:
+            move  = (action, idx, target)
+            legal = get_legal_moves(p1, p2)
+            if move not in legal:
+                return jsonify({"error": "Illegal move", "legal": legal}), 400
+
+            with _with_game_log(gs):
+                _apply_move(gs, move)
+            _record_event(gs, "move", {"move": list(move)})
+
+            return jsonify(_state_response(
+                gs, log_since=_resolve_log_since(), since_version=_resolve_since_version(),
+            ))
+
+    # The job takes the game's lock itself, so wait for it only once released.
+    if data.get("async"):
+        return _job_response(_job_body(job))
+    job.wait()      # still throttled by the queue, just not detached from the request
+    return jsonify(job.result) if job.status == "done" else _job_response(_job_body(job))
+
+
+@app.route("/api/end_turn/stream", methods=["POST"])
+def end_turn_stream():
+    """End the player's turn and stream the AI's reply as Server-Sent Events."""
+    with _require_game() as (gs, err):
+        if err:
+            return err
+        err = _check_turn_open(gs)
+        if err:
+            return err
+        try:
+            frames = _stream_end_turn(gs.game_id, _resolve_log_since(), _resolve_since_version())
+        except QueueFull:
+            return _queue_full_response()
+    return Response(frames, mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",      # let a fronting nginx pass frames through unbuffered
+    })
 
-        execute_move(p1, p2, move)
-        _log_winner_if_any(p1, p2)
-        _persist_game(gs)
 
-    return jsonify(_state_response(gs))
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id: str):
+    """Poll an AI turn job; ``wait=<seconds>`` blocks until it finishes or the wait runs out."""
+    wait = min(max(request.args.get("wait", 0.0, type=float), 0.0), AI_JOB_MAX_WAIT)
+    job = JOBS.get(job_id)
+    if job is not None:
+        if wait:
+            job.wait(wait)
+        return _job_response(_job_body(job))
+    # Accepted by another worker process: follow its shared record instead.
+    deadline = time.monotonic() + wait
+    while True:
+        body = STORE.load_job(job_id)
+        if body is None:
+            return jsonify({
+                "error": "Unknown or expired job; fetch /api/state for the game's current state",
+            }), 404
+        if body["status"] in ("done", "failed") or time.monotonic() >= deadline:
+            return _job_response(body)
+        time.sleep(AI_JOB_POLL_INTERVAL)
 
 
 @app.route("/api/legal_moves", methods=["GET"])
 def legal_moves():
-    gs, err = _require_game()
-    if err:
-        return err
-    moves = get_legal_moves(gs["p1"], gs["p2"])
+    with _require_game() as (gs, err):
+        if err:
+            return err
+        moves = get_legal_moves(gs["p1"], gs["p2"])
     return jsonify({"moves": moves})
 
 
+@app.route("/api/lethal_hint", methods=["GET"])
+def lethal_hint():
+    with _require_game() as (gs, err):
+        if err:
+            return err
+        p1, p2 = gs["p1"], gs["p2"]
+        if gs.get("mulligan_phase") or not gs.get("is_player_turn") or check_win(p1, p2):
+            return jsonify({"lethal": False, "moves": []})
+        line = find_lethal(p1, p2)
+    return jsonify({"lethal": line is not None, "moves": line or []})
+
+
 @app.route("/api/resign", methods=["POST"])
 def resign():
     """Remove a game session so a new match can start cleanly."""
     game_id = _resolve_game_id()
     if game_id:
-        _remove_game(game_id)
-    if not GAMES:
-        GAME_LOG.clear()
+        with _game_lock(game_id):
+            _remove_game(game_id)
     return jsonify({"ok": True})
 
 
@@ -522,6 +1201,7 @@ if __name__ == "__main__":
     debug = os.environ.get("FLASK_DEBUG", "").lower() in ("1", "true", "yes")
     port = int(os.environ.get("PORT", "5000"))
     print(f"LitStone server starting — open http://localhost:{port} in your browser.")
-    if GAMES:
-        print(f"Restored {len(GAMES)} persisted game(s) from {STORE.db_path}.")
+    persisted = STORE.count()
+    if persisted:
+        print(f"{persisted} persisted game(s) in {STORE.db_path} will load on first access.")
     app.run(debug=debug, port=port)
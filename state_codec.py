@@ -0,0 +1,374 @@
+"""Versioned binary encoding of saved LitStone game states.
+
+encode_state() packs the dict produced by GameState.to_dict() into a short
+byte string; decode_state() turns it back into an equal dict.  Card names
+become their integer IDs in the compiled card table, minions become packed
+records (card ID, stats, one flags varint) whose static card fields are
+re-read from the table on decode, and every number is a varint.
+
+Layout (version 2)::
+
+    b"LS" | version | flags | card table | body    flags bit 0: body is zlib-compressed
+
+    card table = 8-byte fingerprint of the card table the IDs refer to
+
+    body   = game fields, log (line count, lines joined by \\x1e), player 1, player 2
+    player = hero class index, name, hp, max_hp, armor, mana, max_mana,
+             fatigue, flags, [weapon name, atk, durability], deck IDs,
+             hand IDs, minions
+    minion = card ID + 1 (0: no card, name follows), atk, hp, max_hp,
+             turns_on_board, flags
+
+Signed numbers are zigzag varints and optional strings are stored with
+length + 1 (0 meaning None).  A state the format cannot reproduce exactly --
+an unknown card, a minion with a custom battlecry, an unexpected field --
+raises CodecError, so the caller can store that one as JSON instead.
+
+Card IDs are positions in CARD_NAMES, so a blob only means something
+against the card table it was written with.  The header records that
+table's fingerprint (names, battlecries and deathrattles) and decoding
+under any other table raises CodecError instead of reading the wrong cards.
+Version 1 blobs carry no fingerprint; they were all written against the
+table whose fingerprint is _V1_CARD_TABLE and decode only while it is
+still current.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import zlib
+
+import game_logic as gl
+
+MAGIC = b"LS"
+VERSION = 2
+FLAG_ZLIB = 1
+_V1_CARD_TABLE = bytes.fromhex("b09d4a548cd08d27")
+
+_GAME_FLAGS = ("is_player_turn", "mulligan_phase", "player_goes_first", "tutorial")
+_PLAYER_INTS = ("hp", "max_hp", "armor", "mana", "max_mana", "fatigue")
+_PLAYER_FLAGS = ("hero_power_used", "hero_can_attack", "hero_attacked_this_turn", "infinite_mana")
+_MINION_FLAGS = ("can_attack", "taunt", "divine_shield", "charge", "poisonous")
+_BATTLECRY_BIT = 1 << len(_MINION_FLAGS)
+_DEATHRATTLE_BIT = _BATTLECRY_BIT << 1
+_GAME_KEYS = frozenset(gl.GameState._DEFAULTS) | {"log_seq"}
+_PLAYER_KEYS = frozenset(gl.PlayerState._DEFAULTS)
+_CLASS_INDEX = {name: i for i, name in enumerate(gl.HERO_CLASSES)}
+_LOG_SEP = "\x1e"     # log lines are stored as one string joined by this
+
+
+class CodecError(ValueError):
+    """The state (or byte string) cannot be represented by this codec."""
+
+
+_fingerprint: tuple = (None, None, b"")   # (CARD_NAMES, CARD_ENTRIES, digest) last hashed
+
+
+def card_table_fingerprint() -> bytes:
+    """8-byte digest of what card IDs mean: every card's name and effects, in ID order."""
+    global _fingerprint
+    names, entries, digest = _fingerprint
+    if names is not gl.CARD_NAMES or entries is not gl.CARD_ENTRIES:
+        table = [
+            [name, entry.get("battlecry"), entry.get("deathrattle")]
+            for name, entry in zip(gl.CARD_NAMES, gl.CARD_ENTRIES)
+        ]
+        raw = json.dumps(table, sort_keys=True, separators=(",", ":")).encode()
+        digest = hashlib.blake2b(raw, digest_size=8).digest()
+        _fingerprint = (gl.CARD_NAMES, gl.CARD_ENTRIES, digest)
+    return digest
+
+
+# ---- Writing ----------------------------------------------------------------
+
+class _Writer:
+    __slots__ = ("buf",)
+
+    def __init__(self) -> None:
+        self.buf = bytearray()
+
+    def uint(self, value: int) -> None:
+        if value < 0:
+            raise CodecError(f"negative value {value} in an unsigned field")
+        buf = self.buf
+        while value > 0x7F:
+            buf.append(value & 0x7F | 0x80)
+            value >>= 7
+        buf.append(value)
+
+    def int(self, value: int) -> None:
+        if type(value) is not int:
+            raise CodecError(f"expected an int, got {value!r}")
+        self.uint(value << 1 if value >= 0 else (-value << 1) - 1)
+
+    def str(self, value: str) -> None:
+        raw = value.encode()
+        self.uint(len(raw))
+        self.buf += raw
+
+    def opt_str(self, value: str | None) -> None:
+        if value is None:
+            self.uint(0)
+            return
+        if not isinstance(value, str):
+            raise CodecError(f"expected a string, got {value!r}")
+        raw = value.encode()
+        self.uint(len(raw) + 1)
+        self.buf += raw
+
+    def flags(self, data: dict, names: tuple[str, ...], extra: int = 0) -> None:
+        bits = extra
+        for i, name in enumerate(names):
+            value = data.get(name, False)
+            if type(value) is not bool:
+                raise CodecError(f"{name} is not a bool: {value!r}")
+            bits |= value << i
+        self.uint(bits)
+
+    def card_list(self, names: list[str]) -> None:
+        ids = gl.CARD_IDS
+        try:
+            cids = [ids[name] for name in names]
+        except KeyError as exc:
+            raise CodecError(f"unknown card {exc.args[0]!r}") from None
+        self.uint(len(cids))
+        if len(gl.CARD_NAMES) <= 0x80:      # every ID is a one-byte varint
+            self.buf += bytes(cids)
+            return
+        for cid in cids:
+            self.uint(cid)
+
+
+def encode_state(state: dict, *, compress: bool = False) -> bytes:
+    """Pack a GameState.to_dict() result; raises CodecError if it would not round-trip."""
+    if not _GAME_KEYS.issuperset(state):
+        raise CodecError(f"unknown game field(s): {sorted(set(state) - _GAME_KEYS)}")
+    try:
+        body = _write_game(state)
+    except (KeyError, TypeError, AttributeError) as exc:
+        raise CodecError(f"malformed state: {exc!r}") from exc
+    flags = 0
+    if compress:
+        body = zlib.compress(body, 6)
+        flags |= FLAG_ZLIB
+    return MAGIC + bytes((VERSION, flags)) + card_table_fingerprint() + body
+
+
+def _write_game(state: dict) -> bytes:
+    w = _Writer()
+    w.str(state.get("game_id", ""))
+    w.flags(state, _GAME_FLAGS)
+    w.int(state.get("turn_number", 1))
+    w.str(state.get("ai_difficulty", "normal"))
+    w.str(state.get("mode", "standard"))
+    w.opt_str(state.get("campaign_node"))
+    w.opt_str(state.get("boss_id"))
+    practice = state.get("practice")
+    w.opt_str(json.dumps(practice) if practice is not None else None)
+    seed = state.get("seed")
+    w.uint(0 if seed is None else 1)
+    if seed is not None:
+        w.int(seed)
+    w.int(state.get("rng_step", 0))
+    w.int(state.get("event_seq", 0))
+    log = state.get("log") or []
+    log_seq = state.get("log_seq")
+    w.uint(0 if log_seq is None else 1)
+    if log_seq is not None:
+        w.int(log_seq)
+    joined = _LOG_SEP.join(log)
+    if joined.count(_LOG_SEP) != max(len(log) - 1, 0):
+        raise CodecError("log line contains the record separator")
+    w.uint(len(log))
+    w.str(joined)
+    for key in ("p1", "p2"):
+        _write_player(w, state[key])
+    return bytes(w.buf)
+
+
+def _write_player(w: _Writer, player: dict) -> None:
+    if set(player) != _PLAYER_KEYS:
+        raise CodecError("player fields do not match PlayerState")
+    cls = _CLASS_INDEX.get(player["hero_class"])
+    if cls is None:
+        raise CodecError(f"unknown hero class {player['hero_class']!r}")
+    w.uint(cls)
+    w.str(player["name"])
+    for key in _PLAYER_INTS:
+        w.int(player[key])
+    weapon = player["weapon"]
+    w.flags(player, _PLAYER_FLAGS, extra=(weapon is not None) << len(_PLAYER_FLAGS))
+    if weapon is not None:
+        if set(weapon) != {"name", "atk", "durability"}:
+            raise CodecError(f"unexpected weapon fields: {sorted(weapon)}")
+        w.str(weapon["name"])
+        w.int(weapon["atk"])
+        w.int(weapon["durability"])
+    w.card_list(player["deck"])
+    w.card_list(player["hand"])
+    w.uint(len(player["board"]))
+    for minion in player["board"]:
+        _write_minion(w, minion)
+
+
+def _write_minion(w: _Writer, minion: dict) -> None:
+    name = minion["name"]
+    cid = gl.CARD_IDS.get(name)
+    entry = gl.CARD_ENTRIES[cid] if cid is not None else {}
+    extra = 0
+    for key, bit in (("battlecry", _BATTLECRY_BIT), ("deathrattle", _DEATHRATTLE_BIT)):
+        value = minion.get(key)
+        if value is None:
+            continue
+        if value != entry.get(key):
+            raise CodecError(f"{name} has a {key} its card does not")
+        extra |= bit
+    if cid is None:
+        if set(minion) - {"type", *gl.Minion._DEFAULTS}:
+            raise CodecError(f"card-less minion {name!r} has extra fields")
+        w.uint(0)
+        w.str(name)
+    else:
+        w.uint(cid + 1)
+    for key in ("atk", "hp", "max_hp", "turns_on_board"):
+        w.int(minion[key])
+    w.flags(minion, _MINION_FLAGS, extra)
+
+
+# ---- Reading ----------------------------------------------------------------
+
+class _Reader:
+    __slots__ = ("data", "pos")
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.pos = 0
+
+    def uint(self) -> int:
+        data, pos = self.data, self.pos
+        byte = data[pos]
+        if byte < 0x80:         # most fields fit in one byte
+            self.pos = pos + 1
+            return byte
+        result = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                self.pos = pos
+                return result
+            shift += 7
+
+    def int(self) -> int:
+        value = self.uint()
+        return -((value + 1) >> 1) if value & 1 else value >> 1
+
+    def str(self) -> str:
+        size = self.uint()
+        start = self.pos
+        self.pos += size
+        return self.data[start:self.pos].decode()
+
+    def opt_str(self) -> str | None:
+        size = self.uint()
+        if size == 0:
+            return None
+        start = self.pos
+        self.pos += size - 1
+        return self.data[start:self.pos].decode()
+
+    def card_list(self) -> list[str]:
+        names = gl.CARD_NAMES
+        count = self.uint()
+        chunk = self.data[self.pos:self.pos + count]
+        if len(chunk) == count and (not chunk or max(chunk) < 0x80):
+            self.pos += count
+            return [names[cid] for cid in chunk]
+        return [names[self.uint()] for _ in range(count)]
+
+
+def decode_state(data: bytes) -> dict:
+    """Unpack bytes from encode_state() into a GameState.to_dict()-style dict."""
+    if data[:2] != MAGIC or len(data) < 4:
+        raise CodecError("not a LitStone binary state")
+    version, flags = data[2], data[3]
+    if version == VERSION:
+        table, body = data[4:12], data[12:]
+    elif version == 1:
+        table, body = _V1_CARD_TABLE, data[4:]
+    else:
+        raise CodecError(f"unsupported state codec version {version}")
+    if table != card_table_fingerprint():
+        raise CodecError("state was written against a different card table")
+    if flags & FLAG_ZLIB:
+        body = zlib.decompress(body)
+    r = _Reader(body)
+    try:
+        state = _read_game(r)
+    except (IndexError, UnicodeDecodeError) as exc:
+        raise CodecError(f"truncated or corrupt state: {exc}") from exc
+    if r.pos != len(body):
+        raise CodecError("trailing bytes after state")
+    return state
+
+
+def _read_game(r: _Reader) -> dict:
+    state: dict = {"game_id": r.str()}
+    bits = r.uint()
+    state["turn_number"] = r.int()
+    for i, name in enumerate(_GAME_FLAGS):
+        state[name] = bool(bits >> i & 1)
+    state["ai_difficulty"] = r.str()
+    state["mode"] = r.str()
+    state["campaign_node"] = r.opt_str()
+    state["boss_id"] = r.opt_str()
+    practice = r.opt_str()
+    state["practice"] = json.loads(practice) if practice is not None else None
+    state["seed"] = r.int() if r.uint() else None
+    state["rng_step"] = r.int()
+    state["event_seq"] = r.int()
+    log_seq = r.int() if r.uint() else None
+    lines = r.uint()
+    joined = r.str()
+    state["log"] = joined.split(_LOG_SEP) if lines else []
+    if log_seq is not None:
+        state["log_seq"] = log_seq
+    state["p1"] = _read_player(r)
+    state["p2"] = _read_player(r)
+    return state
+
+
+def _read_player(r: _Reader) -> dict:
+    player: dict = {"hero_class": gl.HERO_CLASSES[r.uint()], "name": r.str()}
+    for key in _PLAYER_INTS:
+        player[key] = r.int()
+    bits = r.uint()
+    for i, name in enumerate(_PLAYER_FLAGS):
+        player[name] = bool(bits >> i & 1)
+    if bits >> len(_PLAYER_FLAGS) & 1:
+        player["weapon"] = {"name": r.str(), "atk": r.int(), "durability": r.int()}
+    else:
+        player["weapon"] = None
+    player["deck"] = r.card_list()
+    player["hand"] = r.card_list()
+    player["board"] = [_read_minion(r) for _ in range(r.uint())]
+    return player
+
+
+def _read_minion(r: _Reader) -> dict:
+    ref = r.uint()
+    cid = ref - 1 if ref else None
+    name = gl.CARD_NAMES[cid] if cid is not None else r.str()
+    atk, hp, max_hp, turns = r.int(), r.int(), r.int(), r.int()
+    bits = r.uint()
+    entry = gl.CARD_ENTRIES[cid] if cid is not None else {}
+    return gl.Minion(
+        name, atk, hp, max_hp=max_hp, turns_on_board=turns,
+        can_attack=bool(bits & 1), taunt=bool(bits & 2), divine_shield=bool(bits & 4),
+        charge=bool(bits & 8), poisonous=bool(bits & 16),
+        battlecry=entry.get("battlecry") if bits & _BATTLECRY_BIT else None,
+        deathrattle=entry.get("deathrattle") if bits & _DEATHRATTLE_BIT else None,
+        card_id=cid,
+    ).to_dict()
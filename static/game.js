@@ -42,6 +42,7 @@ const TUTORIAL_DONE_KEY = "litstoneTutorialDone";
 // Deck-builder constants
 const MANA_CURVE_MAX_COST   = 7;   // buckets 1-7; costs ≥7 are grouped under "7+"
 const MAX_AUTOFILL_ATTEMPTS = 500; // safety cap for the random auto-fill loop
+const STATE_LOG_TAIL        = 60;  // log lines the server keeps in a full state
 // Ideal curve targets (mirrors game_logic.CURVE_TARGETS + 7+ bucket for 6+ mana)
 const IDEAL_CURVE = { 1: 4, 2: 8, 3: 8, 4: 6, 5: 3, 6: 1 };
 let idealCurve = { ...IDEAL_CURVE };
@@ -93,6 +94,117 @@ async function apiFetch(url, options = {}) {
   return data;
 }
 
+// Action responses may be a patch against the state_version we sent as
+// since_version; rebuild the full snapshot the rest of the UI works with.
+async function resolveStateUpdate(data, base = gameState) {
+  if (!Array.isArray(data?.patch)) return data;
+  if (base?.state_version !== data.base_version) {
+    return apiFetch(`/api/state?game_id=${encodeURIComponent(data.game_id)}`);
+  }
+  const next = structuredClone(base);
+  for (const { op, path, value } of data.patch) {
+    const key = path[path.length - 1];
+    const parent = path.slice(0, -1).reduce((node, k) => node[k], next);
+    if (op === "del") delete parent[key];
+    else parent[key] = value;
+  }
+  next.log = [...(base.log || []), ...(data.log || [])].slice(-STATE_LOG_TAIL);
+  return next;
+}
+
+function parseSseFrame(block) {
+  const frame = { event: "message", data: "" };
+  for (const line of block.split("\n")) {
+    const sep = line.indexOf(": ");
+    if (sep < 0) continue;
+    const field = line.slice(0, sep);
+    if (field === "event") frame.event = line.slice(sep + 2);
+    else if (field === "data") frame.data += line.slice(sep + 2);
+  }
+  return { event: frame.event, data: frame.data ? JSON.parse(frame.data) : {} };
+}
+
+// End the turn through /api/end_turn/stream: each AI move is rendered as its
+// frame arrives, and the promise resolves with the final state -- the body
+// /api/action would have returned -- or null if the game was left meanwhile.
+async function streamEndTurn(body) {
+  const base = gameState;
+  const res = await fetch("/api/end_turn/stream", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(body),
+  });
+  if (!res.ok) {
+    const data = await res.json().catch(() => ({}));
+    const err = new Error(data.error || res.statusText || "Request failed");
+    err.data = data;
+    err.status = res.status;
+    throw err;
+  }
+  const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  let effects = [];
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+    let cut;
+    while ((cut = buffer.indexOf("\n\n")) >= 0) {
+      const { event, data } = parseSseFrame(buffer.slice(0, cut));
+      buffer = buffer.slice(cut + 2);
+      if (gameState === null) {
+        reader.cancel();
+        return null;
+      }
+      if (event === "effect") {
+        effects.push(data);
+      } else if (event === "move") {
+        renderAiMoveFrame(data, effects);
+        effects = [];
+        await new Promise(resolve => setTimeout(resolve, animMs(420)));
+      } else if (event === "done") {
+        return resolveStateUpdate(data, base);
+      } else if (event === "error") {
+        throw new Error(data.error || "AI turn failed");
+      }
+    }
+  }
+  throw new Error("AI turn ended without a result");
+}
+
+/** The element an effect notification points at: a hero panel or a board minion. */
+function effectTargetEl({ side, target }) {
+  const mine = side === "p1";
+  if (target === "hero" || target == null) return document.getElementById(mine ? "hero-player" : "hero-opp");
+  const board = document.getElementById(mine ? "board-player" : "board-opp");
+  return board?.querySelectorAll(".minion-card")[target] || null;
+}
+
+/** Show one streamed AI move: both boards and the new log lines, then its animations. */
+function renderAiMoveFrame(frame, effects) {
+  if (!gameState) return;
+  const ctx = buildAnimContext("end_turn", null, null);
+  gameState = {
+    ...gameState,
+    p1: frame.p1,
+    p2: frame.p2,
+    is_player_turn: false,
+    _legal_moves: [],
+    log_seq: frame.log_seq,
+    log: [...(gameState.log || []), ...frame.log].slice(-STATE_LOG_TAIL),
+  };
+  // Shield pops and silences leave no trace in the boards, so float their
+  // labels over the target before the re-render replaces it.
+  effects
+    .filter(e => e.type === "blocked")
+    .forEach(e => spawnFloat(e.value, "var(--col-gold)", effectTargetEl(e), "normal"));
+  renderGame();
+  applyActionAnimations(ctx);
+  applyPostRenderAnimations(ctx.prevSnap);
+  applyHeroAnimations(ctx.prevHeroSnap);
+  if (effects.some(e => e.type === "play")) playSfx("play");
+}
+
 function defaultSettings() {
   return { sfx: true, animations: true, combatLog: true, confirmResign: true, gameSpeed: "normal" };
 }
@@ -2424,7 +2536,7 @@ function applyActionAnimations(ctx) {
   if (!ctx || !gameState) return;
 
   const motion = motionEnabled();
-  const { prevSnap, prevRects, prevHandRects, action, idx, target, logFrom, prevHandLen, playedCardName } = ctx;
+  const { prevSnap, prevRects, prevHandRects, action, idx, target, logSeq, prevHandLen, playedCardName } = ctx;
   const p1Rects = [...(prevRects?.p1 || [])];
   const p2Rects = [...(prevRects?.p2 || [])];
 
@@ -2483,7 +2595,9 @@ function applyActionAnimations(ctx) {
 
   if (action === "end_turn" || !action) {
     const stagger = aiAttackStaggerMs();
-    const attacks = parseLogAttacks(gameState.log, logFrom);
+    const log = gameState.log || [];
+    const fresh = Math.min(log.length, Math.max(0, (gameState.log_seq ?? log.length) - logSeq));
+    const attacks = parseLogAttacks(log, log.length - fresh);
     if (stagger === 0) {
       if (motion) attacks.forEach(({ attacker, target: tgt }) => animateAttackPair(attacker, tgt));
       else if (attacks.length) playSfx("attack");
@@ -2509,7 +2623,7 @@ function buildAnimContext(action, idx, target) {
     prevRects: snapshotBoardRects(),
     prevHandRects: snapshotHandRects(),
     prevHandLen: gameState?.p1?.hand?.length ?? 0,
-    logFrom: gameState?.log?.length ?? 0,
+    logSeq: gameState?.log_seq ?? gameState?.log?.length ?? 0,
     playedCardName: (action === "play" && idx != null) ? gameState?.p1?.hand?.[idx] : null,
     prevHeroSnap: {
       p1: { hp: gameState.p1.hp, armor: gameState.p1.armor || 0 },
@@ -3242,11 +3356,13 @@ async function sendAction(action, idx, target) {
   const animCtx = buildAnimContext(action, idx, target);
 
   try {
-    const data = await apiFetch("/api/action", {
+    const data = await resolveStateUpdate(await apiFetch("/api/action", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ game_id: gameId, action, idx, target }),
-    });
+      body: JSON.stringify({
+        game_id: gameId, action, idx, target, since_version: gameState.state_version,
+      }),
+    }));
     onGameStateUpdated(data, animCtx);
   } catch (err) {
     spawnFloat(err.message || "Network error!", "var(--col-red)", null, "normal");
@@ -3265,17 +3381,14 @@ async function endTurn() {
   etBtn.disabled = true;
   setAiThinking(true);
 
-  const animCtx = buildAnimContext("end_turn", null, null);
-
   try {
-    const data = await apiFetch("/api/action", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ game_id: gameId, action: "end_turn", idx: null, target: null }),
-    });
+    const data = await streamEndTurn({ game_id: gameId, since_version: gameState.state_version });
     // Guard: player may have resigned while the AI was thinking
-    if (gameState === null) return;
+    if (gameState === null || data === null) return;
     setAiThinking(false);
+    // The AI's moves were animated as they streamed in; what is left is the
+    // player's new turn (draw, fatigue), so skip the end-of-turn log replay.
+    const animCtx = buildAnimContext("turn_start", null, null);
     if (!data.winner) turnNumber = data.turn_number || (turnNumber + 1);
     onGameStateUpdated(data, animCtx);
     if (!gameState.winner) showTurnBanner(true);
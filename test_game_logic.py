@@ -8,12 +8,18 @@ Run with:  python -m pytest test_game_logic.py -v
 import sys
 import random
 import unittest
+import unittest.mock
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 # Ensure the game_logic module is importable from this directory.
 sys.path.insert(0, ".")
 
 from game_logic import (
-    CARD_DB, HERO_CLASSES, GAME_LOG, DECK_SIZE, COIN_CARD,
+    CARD_DB, HERO_CLASSES, DECK_SIZE, COIN_CARD,
     create_player, draw_card, start_turn, do_mulligan,
     get_legal_moves, execute_move, check_win,
     run_ai_turn, log_action, damage_hero, get_valid_targets,
@@ -24,14 +30,20 @@ from game_logic import (
     card_allowed_for_class, cards_for_class,
     clamp_practice_hp, apply_practice_options, effective_mana,
     clamp_heal, _ai_should_pass_turn, _hero_missing_hp, CURVE_TARGETS,
+    Minion, PlayerState, GameState,
+    CARD_IDS, CARD_NAMES, card_ids, card_names, set_active_log,
 )
 
+# The engine keeps no global log; rules functions called directly by these
+# tests write to this list (the server scopes one log per game instead).
+GAME_LOG: list[str] = []
+set_active_log(GAME_LOG)
+
 
 def _make_minion(name, atk, hp, **kwargs):
-    """Helper: create a minimal board minion dict."""
-    m = {"name": name, "type": "minion", "cost": 1, "atk": atk, "hp": hp,
-         "max_hp": hp, "can_attack": True, **kwargs}
-    return m
+    """Helper: create a minimal board minion."""
+    kwargs.setdefault("can_attack", True)
+    return Minion(name, atk, hp, **kwargs)
 
 
 def _standard_test_deck():
@@ -43,6 +55,20 @@ def _standard_test_deck():
     return base * 2
 
 
+def _random_game_state(seed):
+    """Helper: a seeded GameState with random classes and opening hands."""
+    rng = random.Random(seed)
+    classes = sorted(HERO_CLASSES)
+    p1 = create_player("P", rng.choice(classes), shuffle=False)
+    p2 = create_player("AI", rng.choice(classes), shuffle=False)
+    rng.shuffle(p1.deck)
+    rng.shuffle(p2.deck)
+    for _ in range(3):
+        draw_card(p1)
+        draw_card(p2)
+    return rng, GameState(game_id=f"seed-{seed}", p1=p1, p2=p2, is_player_turn=True)
+
+
 class TestCreatePlayer(unittest.TestCase):
     def test_defaults(self):
         p = create_player("P1", "Mage")
@@ -1511,7 +1537,1029 @@ class TestGameplayPolish(unittest.TestCase):
         self.assertIn(move, legal)
 
 
+class TestStateModel(unittest.TestCase):
+    def test_summoned_minion_shares_card_entry(self):
+        p1 = create_player("P", "Mage", shuffle=False)
+        p2 = create_player("AI", "Warrior", shuffle=False)
+        p1["hand"] = ["Castle Guard"]
+        p1["mana"] = 10
+        execute_move(p1, p2, ("play", 0, None))
+        minion = p1["board"][0]
+        self.assertIsInstance(minion, Minion)
+        self.assertEqual(minion.card_id, CARD_IDS["Castle Guard"])
+        self.assertTrue(minion["taunt"])
+        self.assertEqual(minion["icon"], "CG")
+        self.assertFalse(hasattr(minion, "__dict__"))
+
+    def test_player_dict_round_trip(self):
+        p = create_player("P", "Paladin", shuffle=False)
+        p["board"] = [_make_minion("Castle Guard", 2, 3, taunt=True)]
+        p["weapon"] = {"name": "Heroic Blade", "atk": 3, "durability": 2}
+        data = p.to_dict()
+        self.assertEqual(data["board"][0]["icon"], "CG")
+        self.assertTrue(data["board"][0]["taunt"])
+        restored = PlayerState.from_dict(data)
+        self.assertEqual(restored.to_dict(), data)
+        self.assertIsNot(restored["weapon"], p["weapon"])
+
+    def test_game_state_round_trip_accepts_legacy_dicts(self):
+        legacy_minion = dict(CARD_DB["Tinker Alchemist"], name="Tinker Alchemist",
+                             max_hp=1, can_attack=False, turns_on_board=0)
+        p1 = create_player("Player", "Mage", shuffle=False).to_dict()
+        p2 = create_player("AI", "Rogue", shuffle=False).to_dict()
+        del p2["infinite_mana"]
+        p2["board"] = [legacy_minion]
+        gs = GameState.from_dict({"game_id": "g1", "p1": p1, "p2": p2, "log": ["hi"]})
+        self.assertEqual(gs["turn_number"], 1)
+        self.assertEqual(gs["p2"]["board"][0].deathrattle, {"effect": "dmg_hero", "val": 2})
+        self.assertFalse(gs["p2"]["infinite_mana"])
+        self.assertEqual(GameState.from_dict(gs.to_dict()).to_dict(), gs.to_dict())
+
+    def test_silence_pops_traits(self):
+        m = _make_minion("X", 1, 1, taunt=True, deathrattle={"effect": "dmg_hero", "val": 1})
+        self.assertIn("taunt", m)
+        m.pop("taunt", None)
+        m.pop("deathrattle", None)
+        self.assertNotIn("taunt", m)
+        self.assertNotIn("deathrattle", m)
+
+    def test_unknown_keys_rejected(self):
+        p = create_player("P", "Mage", shuffle=False)
+        with self.assertRaises(KeyError):
+            p["not_a_field"] = 1
+        with self.assertRaises(TypeError):
+            PlayerState(bogus=True)
+
+
+class TestCardTable(unittest.TestCase):
+    def test_ids_are_dense_and_round_trip(self):
+        from game_logic import TOKEN_DB
+        self.assertEqual(len(CARD_NAMES), len(CARD_DB) + len(TOKEN_DB))
+        self.assertEqual(sorted(CARD_IDS.values()), list(range(len(CARD_NAMES))))
+        names = list(CARD_DB)
+        self.assertEqual(card_names(card_ids(names)), names)
+
+    def test_columns_match_card_db(self):
+        from game_logic import (
+            CARD_COST, CARD_TYPE, CARD_ATK, CARD_HP, CARD_DURABILITY, CARD_KEYWORDS,
+            CARD_EFFECT, CARD_VALUE, CARD_CLASS_MASK, CARD_TYPES, EFFECTS,
+            KW_TAUNT, KW_DEATHRATTLE, CLASS_BITS,
+        )
+        for name, card in CARD_DB.items():
+            cid = CARD_IDS[name]
+            with self.subTest(card=name):
+                self.assertEqual(CARD_COST[cid], card["cost"])
+                self.assertEqual(CARD_TYPES[CARD_TYPE[cid]], card["type"])
+                self.assertEqual(CARD_ATK[cid], card.get("atk", 0))
+                self.assertEqual(CARD_HP[cid], card.get("hp", 0))
+                self.assertEqual(CARD_DURABILITY[cid], card.get("durability", 0))
+                self.assertEqual(bool(CARD_KEYWORDS[cid] & KW_TAUNT), bool(card.get("taunt")))
+                self.assertEqual(bool(CARD_KEYWORDS[cid] & KW_DEATHRATTLE), "deathrattle" in card)
+                if card["type"] == "spell":
+                    self.assertEqual(EFFECTS[CARD_EFFECT[cid]], card["effect"])
+                    expected = tuple(card["val"]) if isinstance(card["val"], list) else card["val"]
+                    self.assertEqual(CARD_VALUE[cid], expected)
+                elif "battlecry" in card:
+                    self.assertEqual(EFFECTS[CARD_EFFECT[cid]], card["battlecry"]["effect"])
+                for cls in HERO_CLASSES:
+                    allowed = not CARD_CLASS_MASK[cid] or bool(CARD_CLASS_MASK[cid] & CLASS_BITS[cls])
+                    self.assertEqual(allowed, cls in card.get("classes", HERO_CLASSES))
+
+    def test_player_holds_ids_and_view_speaks_names(self):
+        p = create_player("P", "Mage", custom_deck=_standard_test_deck(), shuffle=False)
+        self.assertTrue(all(isinstance(c, int) for c in p.deck))
+        self.assertEqual(p["deck"], _standard_test_deck())
+        p["hand"] = ["Quill Bolt"]
+        self.assertEqual(p.hand, [CARD_IDS["Quill Bolt"]])
+        self.assertEqual(p.to_dict()["hand"], ["Quill Bolt"])
+
+    def test_coin_is_an_id(self):
+        from game_logic import COIN_ID
+        p = create_player("P", "Mage", shuffle=False)
+        give_coin(p)
+        self.assertEqual(p.hand, [COIN_ID])
+
+
+class TestEffectRegistry(unittest.TestCase):
+    def test_every_card_effect_is_registered(self):
+        from game_logic import (
+            CARD_EFFECT, CARD_TYPE, TYPE_SPELL, TYPE_MINION, SPELL_EFFECTS, BATTLECRY_EFFECTS,
+            CARD_DEATHRATTLE, DEATHRATTLE_EFFECTS, EFFECT_NONE, HERO_POWERS,
+        )
+        for cid, name in enumerate(CARD_NAMES):
+            with self.subTest(card=name):
+                if CARD_TYPE[cid] == TYPE_SPELL:
+                    self.assertIn(CARD_EFFECT[cid], SPELL_EFFECTS)
+                elif CARD_TYPE[cid] == TYPE_MINION and CARD_EFFECT[cid] != EFFECT_NONE:
+                    self.assertIn(CARD_EFFECT[cid], BATTLECRY_EFFECTS)
+                if CARD_DEATHRATTLE[cid] != EFFECT_NONE:
+                    self.assertIn(CARD_DEATHRATTLE[cid], DEATHRATTLE_EFFECTS)
+        self.assertEqual(set(HERO_POWERS), set(HERO_CLASSES))
+
+    def test_new_hero_power_plugs_in(self):
+        from game_logic import HERO_POWERS, HeroPower
+
+        def siphon(player, opp, target, notify):
+            opp["hp"] -= 2
+            player["hp"] += 2
+
+        HERO_POWERS["Warlock"] = HeroPower(
+            "Siphon", lambda player, opp: [None], siphon, lambda p2, p1, target: 7,
+        )
+        try:
+            p1 = create_player("P", "Warlock", custom_deck=_standard_test_deck(), shuffle=False)
+            p2 = create_player("AI", "Mage", shuffle=False)
+            p1["mana"] = 2
+            p1["hp"] = 20
+            move = ("hero_power", None, None)
+            self.assertIn(move, get_legal_moves(p1, p2))
+            self.assertEqual(evaluate_ai_move(p1, p2, move), 7)
+            execute_move(p1, p2, move)
+            self.assertEqual((p1["hp"], p2["hp"], p1["mana"]), (22, 28, 0))
+            self.assertTrue(p1["hero_power_used"])
+        finally:
+            del HERO_POWERS["Warlock"]
+
+    def test_spell_effect_entry_drives_targets_apply_and_score(self):
+        from game_logic import SPELL_EFFECTS, SpellEffect, EFFECT_DRAW
+
+        calls = []
+        original = SPELL_EFFECTS[EFFECT_DRAW]
+        SPELL_EFFECTS[EFFECT_DRAW] = SpellEffect(
+            lambda player, opp: ["hero"],
+            lambda player, opp, target, val, notify, on_event: calls.append((target, val)),
+            lambda p2, p1, target, val: 100,
+        )
+        try:
+            p1 = create_player("P", "Mage", shuffle=False)
+            p2 = create_player("AI", "Mage", shuffle=False)
+            p1["hand"] = ["Library Whisper"]
+            p1["mana"] = 1
+            self.assertEqual(get_legal_moves(p1, p2), [("play", 0, "hero")])
+            self.assertEqual(evaluate_ai_move(p1, p2, ("play", 0, "hero")), 102)
+            execute_move(p1, p2, ("play", 0, "hero"))
+            self.assertEqual(calls, [("hero", 1)])
+        finally:
+            SPELL_EFFECTS[EFFECT_DRAW] = original
+
+
+class TestApplyUndo(unittest.TestCase):
+    def test_undo_restores_every_legal_move(self):
+        from game_logic import apply_move, undo, side_to_move
+
+        GAME_LOG.clear()
+        for seed in range(12):
+            rng, gs = _random_game_state(seed)
+            for _ in range(30):
+                player, opp = side_to_move(gs)
+                start_turn(player)
+                for _ in range(10):
+                    moves = get_legal_moves(player, opp)
+                    if not moves or check_win(gs.p1, gs.p2):
+                        break
+                    before = gs.to_dict()
+                    log_len = len(GAME_LOG)
+                    for move in moves:
+                        with self.subTest(seed=seed, move=move):
+                            undo(gs, apply_move(gs, move))
+                            self.assertEqual(gs.to_dict(), before)
+                            self.assertEqual(len(GAME_LOG), log_len)
+                    apply_move(gs, rng.choice(moves))
+                if check_win(gs.p1, gs.p2):
+                    break
+                gs.is_player_turn = not gs.is_player_turn
+        GAME_LOG.clear()
+
+    def test_nested_apply_unwinds_in_reverse(self):
+        from game_logic import apply_move, undo
+
+        p1 = create_player("P", "Warrior", custom_deck=_standard_test_deck(), shuffle=False)
+        p2 = create_player("AI", "Mage", shuffle=False)
+        p1.hand = card_ids(["Quill Bolt", "Castle Guard"])
+        p1.mana = 10
+        p1.board = [_make_minion("Town Crier", 2, 2)]
+        p2.board = [_make_minion("Castle Guard", 2, 5, taunt=True)]
+        gs = GameState(p1=p1, p2=p2, is_player_turn=True)
+        before = gs.to_dict()
+        tokens = [
+            apply_move(gs, ("play", 0, 0)),
+            apply_move(gs, ("attack", 0, 0)),
+            apply_move(gs, ("play", 0, None)),
+        ]
+        self.assertNotEqual(gs.to_dict(), before)
+        for token in reversed(tokens):
+            undo(gs, token)
+        self.assertEqual(gs.to_dict(), before)
+
+
+class TestZobristHash(unittest.TestCase):
+    def _fresh(self, gs):
+        from game_logic import zobrist_hash
+        return zobrist_hash(GameState.from_dict(gs.to_dict()))
+
+    def test_incremental_hash_matches_recomputed(self):
+        import game_logic
+        from game_logic import zobrist_hash, apply_move, side_to_move
+
+        rng, gs = _random_game_state(7)
+        GAME_LOG.clear()
+        with unittest.mock.patch.object(game_logic, "ZOBRIST_VERIFY", True):
+            zobrist_hash(gs)
+            for _ in range(30):
+                player, opp = side_to_move(gs)
+                start_turn(player)
+                for _ in range(6):
+                    moves = get_legal_moves(player, opp)
+                    if not moves or check_win(gs.p1, gs.p2):
+                        break
+                    apply_move(gs, rng.choice(moves))
+                    self.assertEqual(zobrist_hash(gs), self._fresh(gs))
+                if check_win(gs.p1, gs.p2):
+                    break
+                gs.is_player_turn = not gs.is_player_turn
+        GAME_LOG.clear()
+
+    def test_move_orders_reaching_same_position_share_a_key(self):
+        from game_logic import zobrist_hash, apply_move, undo
+
+        p1 = create_player("P", "Mage", custom_deck=_standard_test_deck(), shuffle=False)
+        p2 = create_player("AI", "Mage", shuffle=False)
+        p1["hand"] = ["Town Crier", "Castle Guard", "Town Crier"]
+        p1["mana"] = 10
+        gs = GameState(p1=p1, p2=p2, is_player_turn=True)
+        start = zobrist_hash(gs)
+        first = apply_move(gs, ("play", 0, None))
+        second = apply_move(gs, ("play", 1, None))
+        a_then_b = zobrist_hash(gs)
+        undo(gs, second)
+        undo(gs, first)
+        self.assertEqual(zobrist_hash(gs), start)
+        apply_move(gs, ("play", 2, None))
+        apply_move(gs, ("play", 0, None))
+        self.assertEqual(zobrist_hash(gs), a_then_b)
+        self.assertNotEqual(a_then_b, start)
+        gs.is_player_turn = False
+        self.assertNotEqual(zobrist_hash(gs), a_then_b)
+        GAME_LOG.clear()
+
+    def test_sides_and_fields_change_the_key(self):
+        from game_logic import zobrist_hash
+
+        p1 = create_player("P", "Mage", shuffle=False)
+        p2 = create_player("AI", "Mage", shuffle=False)
+        gs = GameState(p1=p1, p2=p2)
+        base = zobrist_hash(gs)
+        swapped = GameState(p1=p2, p2=p1)
+        p1["hand"] = ["Quill Bolt"]
+        self.assertNotEqual(zobrist_hash(gs), base)
+        self.assertNotEqual(zobrist_hash(gs), zobrist_hash(swapped))
+        p1["armor"] = 3
+        with_armor = zobrist_hash(gs)
+        p1["armor"] = 0
+        self.assertNotEqual(with_armor, zobrist_hash(gs))
+
+    def test_verify_mode_reports_untracked_edits(self):
+        import game_logic
+        from game_logic import zobrist_hash, rehash
+
+        p1 = create_player("P", "Mage", custom_deck=_standard_test_deck(), shuffle=False)
+        p2 = create_player("AI", "Mage", shuffle=False)
+        gs = GameState(p1=p1, p2=p2)
+        zobrist_hash(gs)
+        p1.hand = card_ids(["Quill Bolt"])
+        with unittest.mock.patch.object(game_logic, "ZOBRIST_VERIFY", True):
+            with self.assertRaises(RuntimeError):
+                zobrist_hash(gs)
+            rehash(p1)
+            self.assertEqual(zobrist_hash(gs), self._fresh(gs))
+
+
+class TestTurnPlanner(unittest.TestCase):
+    def setUp(self):
+        GAME_LOG.clear()
+        self.p1 = create_player("P", "Mage", shuffle=False)
+        self.p2 = create_player("AI", "Warrior", custom_deck=_standard_test_deck(), shuffle=False)
+        self.p2["hand"] = []
+        self.p2["mana"] = 0
+
+    def tearDown(self):
+        GAME_LOG.clear()
+
+    def test_clears_taunt_then_goes_face_for_lethal(self):
+        from game_logic import TurnPlanner
+
+        self.p1["hp"] = 5
+        self.p1["board"] = [_make_minion("Castle Guard", 1, 3, taunt=True)]
+        self.p2["board"] = [_make_minion("Highwayman", 5, 2), _make_minion("Town Crier", 3, 3)]
+        planner = TurnPlanner()
+        for _ in range(4):
+            move = planner.best_move(self.p2, self.p1)
+            if move is None:
+                break
+            execute_move(self.p2, self.p1, move)
+        self.assertEqual(check_win(self.p1, self.p2), "AI")
+
+    def test_transposition_table_dedupes_move_orders(self):
+        from game_logic import TurnPlanner
+
+        # Three ready minions can go face in any order: six paths, one position.
+        self.p2["board"] = [_make_minion("Town Crier", 2, 2), _make_minion("Highwayman", 3, 2),
+                            _make_minion("Errant Knight", 1, 4)]
+        planner = TurnPlanner()
+        move = planner.best_move(self.p2, self.p1)
+        self.assertEqual(move, ("attack", 1, "hero"))
+        self.assertGreater(planner.tt_hits, 0)
+
+        # Later moves in the same turn come straight from the table.
+        nodes = planner.nodes
+        execute_move(self.p2, self.p1, move)
+        self.assertIsNotNone(planner.best_move(self.p2, self.p1))
+        self.assertEqual(planner.nodes, nodes)
+
+    def test_expert_turn_searches_each_position_for_lethal_once(self):
+        import json
+        import game_logic
+
+        self.p2["board"] = [_make_minion("Town Crier", 2, 2), _make_minion("Highwayman", 3, 2)]
+        self.p1["board"] = [_make_minion("Castle Guard", 2, 5, taunt=True)]
+        searched = []
+        real = game_logic.find_lethal
+
+        def spy(p2, p1, *args, **kwargs):
+            searched.append(json.dumps([p2.to_dict(), p1.to_dict()], sort_keys=True))
+            return real(p2, p1, *args, **kwargs)
+
+        with unittest.mock.patch.object(game_logic, "find_lethal", spy):
+            run_ai_turn(self.p2, self.p1, draw=False, difficulty="expert")
+        self.assertGreater(len(searched), 0)
+        self.assertEqual(len(searched), len(set(searched)))
+
+    def test_node_budget_bounds_search(self):
+        from game_logic import TurnPlanner
+
+        self.p2["hand"] = ["Town Crier", "Castle Guard", "Highwayman", "Quill Bolt"]
+        self.p2["mana"] = 10
+        self.p2["board"] = [_make_minion("Town Crier", 2, 2), _make_minion("Errant Knight", 3, 2)]
+        self.p1["board"] = [_make_minion("Castle Guard", 2, 5), _make_minion("Town Crier", 2, 2)]
+        planner = TurnPlanner(node_budget=25, time_budget_ms=10_000)
+        self.assertIsNotNone(planner.best_move(self.p2, self.p1))
+        self.assertLessEqual(planner.nodes, 25 + len(get_legal_moves(self.p2, self.p1)) + 10)
+
+    def test_damage_upper_bound_covers_board_weapon_and_burn(self):
+        from game_logic import _damage_upper_bound
+
+        self.p2["board"] = [_make_minion("Town Crier", 2, 2), _make_minion("Errant Knight", 3, 2, can_attack=False)]
+        self.p2["weapon"] = {"name": "Axe", "atk": 3, "durability": 2}
+        self.p2["hero_can_attack"] = True
+        self.p2["hand"] = ["Quill Bolt", "Quill Bolt"]
+        bolt_cost = CARD_DB["Quill Bolt"]["cost"]
+        bolt_dmg = CARD_DB["Quill Bolt"]["val"]
+        self.p2["mana"] = bolt_cost
+        self.assertEqual(_damage_upper_bound(self.p2, self.p1), 2 + 3 + bolt_dmg)
+        self.p2["mana"] = 2 * bolt_cost
+        self.assertEqual(_damage_upper_bound(self.p2, self.p1), 2 + 3 + 2 * bolt_dmg)
+
+    def test_expert_difficulty_runs_planned_turn(self):
+        from game_logic import AI_DIFFICULTIES
+
+        self.assertIn("expert", AI_DIFFICULTIES)
+        self.assertEqual(normalize_difficulty("Expert"), "expert")
+        self.p2["deck"] = _standard_test_deck()
+        self.p2["hand"] = ["Town Crier", "Castle Guard"]
+        self.p2["max_mana"] = 4
+        moves = run_ai_turn(self.p2, self.p1, difficulty="expert")
+        self.assertTrue(moves)
+        self.assertTrue(all(mv[0] in ("play", "attack", "hero_attack", "hero_power") for mv in moves))
+
+
+class TestIsmcts(unittest.TestCase):
+    def setUp(self):
+        GAME_LOG.clear()
+        self.p1 = create_player("P", "Mage", custom_deck=_standard_test_deck(), shuffle=False)
+        self.p2 = create_player("AI", "Warrior", custom_deck=_standard_test_deck(), shuffle=False)
+        for _ in range(4):
+            draw_card(self.p1)
+            draw_card(self.p2)
+
+    def tearDown(self):
+        GAME_LOG.clear()
+
+    def test_player_copy_is_independent(self):
+        self.p2["board"] = [_make_minion("Town Crier", 2, 2)]
+        self.p2["weapon"] = {"name": "Axe", "atk": 3, "durability": 2}
+        clone = self.p2.copy()
+        clone.board[0].hp = 1
+        clone.weapon["durability"] = 1
+        clone.hand.pop()
+        self.assertEqual(self.p2.board[0].hp, 2)
+        self.assertEqual(self.p2.weapon["durability"], 2)
+        self.assertEqual(len(self.p2.hand), 4)
+
+    def test_determinize_resamples_only_hidden_cards(self):
+        from game_logic import determinize
+
+        before = self.p1.to_dict()
+        me, opp = determinize(self.p2, self.p1, random.Random(3))
+        self.assertEqual(self.p1.to_dict(), before)
+        self.assertEqual(len(opp.hand), len(self.p1.hand))
+        self.assertEqual(sorted(opp.hand + opp.deck), sorted(self.p1.hand + self.p1.deck))
+        self.assertEqual(me.hand, self.p2.hand)
+        self.assertEqual(sorted(me.deck), sorted(self.p2.deck))
+
+    def test_returns_best_so_far_at_deadline(self):
+        import time
+        from game_logic import ismcts_move
+
+        self.p2["board"] = [_make_minion("Town Crier", 2, 2), _make_minion("Highwayman", 3, 2)]
+        self.p2["mana"] = 5
+        start = time.perf_counter()
+        move = ismcts_move(self.p2, self.p1, 30)
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertIn(move, get_legal_moves(self.p2, self.p1) + [None])
+        self.assertEqual(GAME_LOG, [])
+
+    def test_finds_lethal(self):
+        from game_logic import ismcts_move
+
+        self.p1["hp"] = 3
+        self.p1["board"] = [_make_minion("Castle Guard", 1, 3)]
+        self.p2["board"] = [_make_minion("Highwayman", 3, 2)]
+        move = ismcts_move(self.p2, self.p1, 10_000, rng=random.Random(1), max_iterations=200)
+        self.assertEqual(move, ("attack", 0, "hero"))
+
+    def test_master_difficulty_runs_turn(self):
+        from game_logic import AI_DIFFICULTIES
+
+        self.assertIn("master", AI_DIFFICULTIES)
+        self.p2["max_mana"] = 3
+        moves = run_ai_turn(self.p2, self.p1, difficulty="master")
+        # Only the moves actually made are logged, not the search's rollouts.
+        self.assertEqual(sum(line.startswith(">>") for line in GAME_LOG), len(moves))
+
+
+class TestRootParallelSearch(unittest.TestCase):
+    def test_pack_players_round_trip(self):
+        from game_logic import pack_players, unpack_players
+
+        p1 = create_player("P", "Rogue", custom_deck=_standard_test_deck())
+        p2 = create_player("AI", "Shaman")
+        for _ in range(4):
+            draw_card(p1)
+        p1["board"] = [_make_minion("Castle Guard", 2, 5, taunt=True), _make_minion("Odd Token", 2, 3)]
+        p1["board"][0]["hp"] = 3
+        p1["weapon"] = {"name": "Wicked Dagger", "atk": 1, "durability": 2}
+        p1["hero_power_used"] = True
+        p2["armor"] = 4
+        blob = pack_players(p1, p2)
+        self.assertIsInstance(blob, bytes)
+        a, b = unpack_players(blob)
+        self.assertEqual(a.to_dict(), p1.to_dict())
+        self.assertEqual(b.to_dict(), p2.to_dict())
+        self.assertLess(len(blob), len(repr(p1.to_dict())) // 2)
+
+    def test_pool_merges_worker_root_statistics(self):
+        import game_logic
+        from game_logic import ismcts_move, search_pool, shutdown_search_pool
+
+        p1 = create_player("P", "Mage", custom_deck=_standard_test_deck(), shuffle=False)
+        p2 = create_player("AI", "Warrior", custom_deck=_standard_test_deck(), shuffle=False)
+        p1["hp"] = 3
+        p2["board"] = [_make_minion("Highwayman", 3, 2)]
+        with unittest.mock.patch.object(game_logic, "AI_SEARCH_WORKERS", 2):
+            try:
+                self.assertIs(search_pool(), search_pool())
+                move = ismcts_move(p2, p1, 30_000, rng=random.Random(1), max_iterations=60)
+            finally:
+                shutdown_search_pool()
+        self.assertEqual(move, ("attack", 0, "hero"))
+        self.assertIsNone(search_pool())
+
+    def test_unfinished_workers_are_cancelled(self):
+        from concurrent.futures import Future
+
+        import game_logic
+
+        class StalledPool:
+            def __init__(self):
+                self.futures = []
+
+            def submit(self, fn, *args):
+                self.futures.append(Future())
+                return self.futures[-1]
+
+        p1 = create_player("P", "Mage", custom_deck=_standard_test_deck(), shuffle=False)
+        p2 = create_player("AI", "Warrior", custom_deck=_standard_test_deck(), shuffle=False)
+        pool = StalledPool()
+        with unittest.mock.patch.object(game_logic, "AI_SEARCH_WORKERS", 2), \
+                unittest.mock.patch.object(game_logic, "_POOL_GRACE_MS", 1.0):
+            stats = game_logic._parallel_root_stats(pool, p2, p1, 1.0, random.Random(1), 5)
+        self.assertTrue(stats)  # fell back to an in-process search
+        self.assertEqual(len(pool.futures), 2)
+        self.assertTrue(all(future.cancelled() for future in pool.futures))
+
+    def test_worker_past_shared_deadline_returns_nothing(self):
+        import time
+
+        from game_logic import _ismcts_worker, pack_players
+
+        p1 = create_player("P", "Mage", custom_deck=_standard_test_deck(), shuffle=False)
+        p2 = create_player("AI", "Warrior", custom_deck=_standard_test_deck(), shuffle=False)
+        payload = pack_players(p2, p1)
+        self.assertEqual(_ismcts_worker(payload, time.time() - 1, 1, None), [])
+        self.assertTrue(_ismcts_worker(payload, time.time() + 5, 1, 3))
+
+
+class TestLethalSolver(unittest.TestCase):
+    def setUp(self):
+        GAME_LOG.clear()
+        self.p1 = create_player("P", "Warrior", shuffle=False)
+        self.p2 = create_player("AI", "Mage", custom_deck=_standard_test_deck(), shuffle=False)
+        self.p2["hand"] = []
+
+    def tearDown(self):
+        GAME_LOG.clear()
+
+    def _play_line(self, line):
+        for move in line:
+            self.assertIn(move, get_legal_moves(self.p2, self.p1))
+            execute_move(self.p2, self.p1, move)
+        return check_win(self.p1, self.p2)
+
+    def test_burn_plus_hero_power_past_taunt(self):
+        from game_logic import find_lethal
+
+        self.p1["hp"] = 4
+        self.p1["board"] = [_make_minion("Castle Guard", 1, 1, taunt=True)]
+        self.p2["hand"] = ["Quill Bolt"]
+        self.p2["mana"] = 4
+        line = find_lethal(self.p2, self.p1)
+        self.assertIsNotNone(line)
+        self.assertEqual(self._play_line(line), "AI")
+
+    def test_clears_taunt_with_one_minion_and_charges_face(self):
+        from game_logic import find_lethal
+
+        self.p1["hp"] = 6
+        self.p1["board"] = [_make_minion("Castle Guard", 2, 2, taunt=True)]
+        self.p2["board"] = [_make_minion("Town Crier", 2, 2)]
+        self.p2["hand"] = ["Errant Knight", "Quill Bolt"]
+        self.p2["mana"] = 5
+        line = find_lethal(self.p2, self.p1)
+        self.assertIsNotNone(line)
+        self.assertEqual(self._play_line(line), "AI")
+
+    def test_no_lethal_leaves_state_and_log_untouched(self):
+        from game_logic import find_lethal
+
+        self.p1["board"] = [_make_minion("Castle Guard", 2, 5, taunt=True)]
+        self.p2["board"] = [_make_minion("Town Crier", 2, 2)]
+        self.p2["hand"] = ["Quill Bolt", "Library Whisper"]
+        self.p2["mana"] = 10
+        self.p1["hp"] = 6
+        before = (self.p1.to_dict(), self.p2.to_dict())
+        self.assertIsNone(find_lethal(self.p2, self.p1))   # 2 + 3 + 1 < 6 + taunt
+        self.p1["hp"] = 30
+        self.assertIsNone(find_lethal(self.p2, self.p1))   # bound alone rules it out
+        self.p1["hp"] = 6
+        self.assertEqual((self.p1.to_dict(), self.p2.to_dict()), before)
+        self.assertEqual(GAME_LOG, [])
+
+    def test_damage_bound_prunes_hopeless_positions(self):
+        import game_logic
+
+        self.p1["hp"] = 30
+        self.p2["board"] = [_make_minion("Town Crier", 2, 2)]
+        with unittest.mock.patch.object(game_logic, "get_legal_moves") as legal:
+            self.assertIsNone(game_logic.find_lethal(self.p2, self.p1))
+        legal.assert_not_called()
+
+    def test_ai_turn_takes_multi_step_lethal(self):
+        self.p1["hp"] = 4
+        self.p1["board"] = [_make_minion("Castle Guard", 1, 1, taunt=True)]
+        self.p2["hand"] = ["Quill Bolt"]
+        self.p2["max_mana"] = 3
+        run_ai_turn(self.p2, self.p1, draw=False, difficulty="normal")
+        self.assertEqual(check_win(self.p1, self.p2), "AI")
+
+
+class TestBatchScoring(unittest.TestCase):
+    def _positions(self):
+        from game_logic import side_to_move
+
+        GAME_LOG.clear()
+        for seed in range(25):
+            rng, gs = _random_game_state(seed)
+            for _ in range(24):
+                player, opp = side_to_move(gs)
+                start_turn(player)
+                for _ in range(rng.randint(0, 5)):
+                    moves = get_legal_moves(player, opp)
+                    if not moves or check_win(gs.p1, gs.p2):
+                        break
+                    yield player, opp, moves
+                    execute_move(player, opp, rng.choice(moves))
+                if check_win(gs.p1, gs.p2):
+                    break
+                gs.is_player_turn = not gs.is_player_turn
+        GAME_LOG.clear()
+
+    def _assert_parity(self):
+        from game_logic import evaluate_ai_moves
+
+        checked = 0
+        for player, opp, moves in self._positions():
+            expected = [evaluate_ai_move(player, opp, mv) for mv in moves]
+            self.assertEqual(evaluate_ai_moves(player, opp, moves), expected)
+            checked += len(moves)
+        self.assertGreater(checked, 1000)
+
+    def test_matches_evaluate_ai_move(self):
+        import game_logic
+        with unittest.mock.patch.object(game_logic, "np", None):
+            self._assert_parity()
+
+    @unittest.skipIf(numpy is None, "NumPy not installed")
+    def test_numpy_path_matches_evaluate_ai_move(self):
+        import game_logic
+        with unittest.mock.patch.object(game_logic, "_NUMPY_MIN_TRADES", 1):
+            self._assert_parity()
+
+    def test_replaced_scorer_is_honoured(self):
+        from game_logic import MOVE_SCORERS, evaluate_ai_moves
+
+        p1 = create_player("P", "Mage", shuffle=False)
+        p2 = create_player("AI", "Mage", shuffle=False)
+        p2["board"] = [_make_minion("Town Crier", 2, 2)]
+        p1["board"] = [_make_minion("Castle Guard", 2, 5)]
+        moves = get_legal_moves(p2, p1)
+        with unittest.mock.patch.dict(MOVE_SCORERS, {"attack": lambda p2, p1, idx, target: 42}):
+            scores = evaluate_ai_moves(p2, p1, moves)
+        self.assertEqual([s for mv, s in zip(moves, scores) if mv[0] == "attack"], [42.0, 42.0])
+
+
+class TestSeededRng(unittest.TestCase):
+    def _play_out(self, seed, difficulty="normal", script=None):
+        from game_logic import ai_do_mulligan, game_rng, run_ai_turn
+
+        setup = game_rng(seed, 0)
+        p1 = create_ai_opponent(hero_class="Shaman", rng=setup)
+        p2 = create_ai_opponent(hero_class="Hunter", rng=setup)
+        first, second = (p1, p2) if setup.choice([True, False]) else (p2, p1)
+        for _ in range(3):
+            draw_card(first)
+        for _ in range(4):
+            draw_card(second)
+        mull = game_rng(seed, 1)
+        ai_do_mulligan(first, rng=mull)
+        ai_do_mulligan(second, rng=mull)
+        moves = []
+        for turn in range(2, 60):
+            mover, opp = (first, second) if turn % 2 == 0 else (second, first)
+            if script is None:
+                moves.append(run_ai_turn(mover, opp, difficulty=difficulty, rng=game_rng(seed, turn)))
+            else:
+                moves.append(run_ai_turn(
+                    mover, opp, difficulty=difficulty, rng=game_rng(seed, turn),
+                    decision_rng=game_rng(seed, -turn), moves=script[turn - 2] if script else None,
+                ))
+            if check_win(p1, p2):
+                break
+        return moves, p1.to_dict(), p2.to_dict()
+
+    def test_same_seed_replays_identically(self):
+        GAME_LOG.clear()
+        for difficulty in ("easy", "normal"):
+            self.assertEqual(self._play_out(7, difficulty), self._play_out(7, difficulty))
+        GAME_LOG.clear()
+
+    def test_recorded_turns_replay_without_search(self):
+        # With decisions on their own stream, replaying the recorded moves
+        # reproduces the game (and its log) even though nothing is searched.
+        for seed, difficulty in ((3, "normal"), (5, "hard")):
+            GAME_LOG.clear()
+            live = self._play_out(seed, difficulty, script=[])
+            live_log = list(GAME_LOG)
+            GAME_LOG.clear()
+            with unittest.mock.patch("game_logic.find_lethal", side_effect=AssertionError):
+                replayed = self._play_out(seed, difficulty, script=live[0])
+            self.assertEqual(replayed, live)
+            self.assertEqual(GAME_LOG, live_log)
+        GAME_LOG.clear()
+
+    def test_seeded_games_ignore_global_random(self):
+        GAME_LOG.clear()
+        random.seed(1)
+        first = self._play_out(11)
+        random.seed(2)
+        self.assertEqual(self._play_out(11), first)
+        GAME_LOG.clear()
+
+    def test_different_seeds_diverge(self):
+        from game_logic import game_rng
+
+        decks = {tuple(build_curved_ai_deck("Mage", rng=game_rng(seed, 0))) for seed in range(5)}
+        self.assertGreater(len(decks), 1)
+
+    def test_active_rng_drives_totemic_call(self):
+        from game_logic import game_rng, set_active_rng
+
+        totems = []
+        for _ in range(2):
+            p = create_player("S", "Shaman", shuffle=False)
+            p["mana"] = 10
+            opp = create_player("O", "Mage", shuffle=False)
+            set_active_rng(game_rng(3, 1))
+            try:
+                for _ in range(5):
+                    execute_move(p, opp, ("hero_power", None, None))
+                    p["hero_power_used"] = False
+                    p["mana"] = 10
+            finally:
+                set_active_rng(None)
+            totems.append([m["name"] for m in p["board"]])
+        self.assertEqual(totems[0], totems[1])
+
+    def test_game_state_steps_and_round_trip(self):
+        from game_logic import GameState
+
+        gs = GameState(game_id="g", p1=create_player("P", "Mage"), p2=create_player("A", "Mage"), seed=99)
+        a = gs.next_rng().random()
+        restored = GameState.from_dict(gs.to_dict())
+        self.assertEqual((restored.seed, restored.rng_step), (99, 1))
+        self.assertNotEqual(restored.next_rng().random(), a)
+        self.assertEqual(gs.next_rng().random(), GameState.from_dict(gs.to_dict() | {"rng_step": 1}).next_rng().random())
+
+    def test_legacy_state_gets_a_seed(self):
+        from game_logic import GameState
+
+        data = GameState(game_id="g", p1=create_player("P", "Mage"), p2=create_player("A", "Mage")).to_dict()
+        del data["seed"], data["rng_step"]
+        gs = GameState.from_dict(data)
+        gs.next_rng()
+        self.assertIsInstance(gs.seed, int)
+        self.assertEqual(gs.rng_step, 1)
+
+
+class TestSimulator(unittest.TestCase):
+    def test_results_independent_of_workers_and_chunking(self):
+        import litstone_sim as sim
+
+        entrants = sim.build_entrants(["Mage", "Warrior"], ["curved"], ["easy"])
+        pairs = [(entrants[0], entrants[1])]
+        serial = sim.simulate(pairs, 12, seed=5, workers=0, chunk=5)
+        pooled = sim.simulate(pairs, 12, seed=5, workers=2, chunk=4)
+        self.assertEqual(serial, pooled)
+        self.assertEqual(serial[0].games, 12)
+        self.assertEqual(GAME_LOG, [])
+
+    def test_boss_deck_sets_class(self):
+        import litstone_sim as sim
+
+        entrants = sim.build_entrants(["Mage", "Rogue"], ["moriarty"], ["normal"])
+        self.assertEqual(entrants, [sim.Entrant("Rogue", "moriarty", "normal")])
+
+    def test_unknown_difficulty_is_rejected(self):
+        import contextlib
+        import io
+
+        import litstone_sim as sim
+
+        with self.assertRaises(ValueError):
+            sim.build_entrants(["Mage"], ["curved"], ["normal", "bogus"])
+        for flag in ("--difficulties", "--vs-difficulties"):
+            with self.subTest(flag=flag), contextlib.redirect_stderr(io.StringIO()) as err:
+                with self.assertRaises(SystemExit):
+                    sim.main(["--classes", "Mage", flag, "hard,Expert", "--games", "1"])
+                self.assertIn("unknown difficulty: Expert", err.getvalue())
+
+    def test_play_game_reports_winner(self):
+        import litstone_sim as sim
+
+        a = sim.Entrant("Hunter", "curved", "hard")
+        b = sim.Entrant("Priest", "curved", "easy")
+        outcome, turns = sim.play_game(a, b, 42)
+        self.assertIn(outcome, ("a", "b", "draw"))
+        self.assertEqual(sim.play_game(a, b, 42), (outcome, turns))
+
+    def test_wilson_interval(self):
+        from litstone_sim import wilson_interval
+
+        lo, hi = wilson_interval(50, 100)
+        self.assertAlmostEqual(lo, 0.4038, places=3)
+        self.assertAlmostEqual(hi, 0.5962, places=3)
+        self.assertEqual(wilson_interval(0, 0), (0.0, 1.0))
+
+
+class TestLazyLogging(unittest.TestCase):
+    def setUp(self):
+        GAME_LOG.clear()
+        self.p1 = create_player("P", "Mage", shuffle=False)
+        self.p2 = create_player("AI", "Mage", shuffle=False)
+        self.p1["board"] = [_make_minion("Town Crier", 2, 2)]
+        self.p2["board"] = [_make_minion("Castle Guard", 1, 3)]
+
+    def tearDown(self):
+        GAME_LOG.clear()
+
+    def test_lines_match_formatted_text(self):
+        log_action("%s hits %s for %s!", "A", "B", 3)
+        log_action("100% literal")
+        self.assertEqual(GAME_LOG, ["A hits B for 3!", "100% literal"])
+
+    def test_silent_logging_drops_lines_and_events(self):
+        from game_logic import add_log_sink, remove_log_sink, silent_logging
+
+        events = []
+        add_log_sink(events.append)
+        try:
+            with silent_logging():
+                execute_move(self.p1, self.p2, ("attack", 0, 0))
+        finally:
+            remove_log_sink(events.append)
+        self.assertEqual(GAME_LOG, [])
+        self.assertEqual(events, [])
+        self.assertEqual(self.p2["board"][0]["hp"], 1)
+
+    def test_sink_gets_unformatted_events(self):
+        from game_logic import add_log_sink, remove_log_sink
+
+        events = []
+        add_log_sink(events.append)
+        try:
+            execute_move(self.p1, self.p2, ("attack", 0, 0))
+        finally:
+            remove_log_sink(events.append)
+        self.assertEqual(events[0].template, ">> %s attacks %s for %s damage!")
+        self.assertEqual(events[0].args, ("Town Crier", "Castle Guard", 2))
+        self.assertEqual([e.message for e in events], GAME_LOG)
+
+    def test_silence_is_scoped_to_the_current_thread(self):
+        import threading
+        from game_logic import silent_logging
+
+        other: list[str] = []
+
+        def log_elsewhere():
+            set_active_log(other)
+            log_action("from %s", "another thread")
+
+        with silent_logging():
+            worker = threading.Thread(target=log_elsewhere)
+            worker.start()
+            worker.join()
+            log_action("muted")
+        self.assertEqual(other, ["from another thread"])
+        self.assertEqual(GAME_LOG, [])
+
+    def test_search_leaves_logs_alone(self):
+        from game_logic import TurnPlanner, find_lethal
+
+        before = list(GAME_LOG)
+        self.p1["board"] = [_make_minion("Town Crier", 9, 2)]
+        self.p1["board"][0]["can_attack"] = True
+        self.p2["board"] = []
+        self.p2["hp"] = 5
+        self.assertIsNotNone(find_lethal(self.p1, self.p2))
+        TurnPlanner().best_move(self.p1, self.p2)
+        self.assertEqual(GAME_LOG, before)
+
+
+class TestLogContext(unittest.TestCase):
+    def test_no_active_log_drops_lines(self):
+        from game_logic import active_log, engine_context
+
+        with engine_context(None):
+            self.assertIsNone(active_log())
+            log_action("nobody listens")
+        self.assertIs(active_log(), GAME_LOG)
+        self.assertNotIn("nobody listens", GAME_LOG)
+
+    def test_engine_context_nests_and_restores(self):
+        from game_logic import engine_context
+
+        outer, inner = [], []
+        with engine_context(outer):
+            log_action("a")
+            with engine_context(inner):
+                log_action("b")
+            log_action("c")
+        self.assertEqual((outer, inner), (["a", "c"], ["b"]))
+
+    def test_concurrent_games_do_not_interleave(self):
+        import threading
+        from game_logic import engine_context
+
+        logs = {i: [] for i in range(8)}
+        barrier = threading.Barrier(len(logs))
+
+        def play(i):
+            with engine_context(logs[i]):
+                barrier.wait()
+                for n in range(200):
+                    log_action("game %s line %s", i, n)
+
+        threads = [threading.Thread(target=play, args=(i,)) for i in logs]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for i, lines in logs.items():
+            self.assertEqual(lines, [f"game {i} line {n}" for n in range(200)])
+
+    def test_asyncio_tasks_keep_their_own_log(self):
+        import asyncio
+        from game_logic import engine_context
+
+        async def game(i, log):
+            with engine_context(log):
+                for n in range(3):
+                    log_action("task %s/%s", i, n)
+                    await asyncio.sleep(0)
+
+        async def main():
+            logs = [[], []]
+            await asyncio.gather(game(0, logs[0]), game(1, logs[1]))
+            return logs
+
+        logs = asyncio.run(main())
+        self.assertEqual(logs, [[f"task {i}/{n}" for n in range(3)] for i in range(2)])
+
+
+class TestGameLogRing(unittest.TestCase):
+    def test_ring_keeps_newest_lines_and_numbers_them(self):
+        from game_logic import GameLog
+
+        log = GameLog(capacity=3)
+        for n in range(5):
+            log.append(f"line {n}")
+        self.assertEqual(list(log), ["line 2", "line 3", "line 4"])
+        self.assertEqual((log.first_seq, log.next_seq), (2, 5))
+        self.assertEqual(log.since(3), ["line 3", "line 4"])
+        self.assertEqual(log.since(0), ["line 2", "line 3", "line 4"])
+        self.assertEqual(log.since(5), [])
+        self.assertEqual(log.tail(2), ["line 3", "line 4"])
+        self.assertEqual(log.take_evicted(), [(0, "line 0"), (1, "line 1")])
+        self.assertEqual(log.take_evicted(), [])
+
+    def test_rewind_restores_evicted_lines(self):
+        from game_logic import GameLog
+
+        log = GameLog(["a", "b"], capacity=3)
+        mark = log.next_seq
+        for line in ("c", "d", "e"):
+            log.append(line)
+        log.rewind(mark)
+        self.assertEqual((list(log), log.next_seq, log.evicted), (["a", "b"], 2, []))
+
+    def test_apply_undo_rewinds_a_game_log(self):
+        from game_logic import GameLog, apply_move, engine_context, undo
+
+        p1 = create_player("P", "Mage", shuffle=False)
+        p2 = create_player("AI", "Mage", shuffle=False)
+        p1["board"] = [_make_minion("Town Crier", 2, 2)]
+        gs = GameState(p1=p1, p2=p2, log=GameLog(["start"], capacity=2))
+        with engine_context(gs.log):
+            undo(gs, apply_move(gs, ("attack", 0, "hero")))
+        self.assertEqual((list(gs.log), gs.log.next_seq), (["start"], 1))
+
+    def test_game_state_round_trip_keeps_sequence(self):
+        from game_logic import GameLog
+
+        gs = GameState(game_id="g", p1=create_player("P", "Mage"), p2=create_player("A", "Mage"),
+                       log=GameLog(["x", "y"], next_seq=40))
+        data = gs.to_dict()
+        self.assertEqual((data["log"], data["log_seq"]), (["x", "y"], 40))
+        restored = GameState.from_dict(data)
+        self.assertEqual((restored.log.first_seq, restored.log.next_seq), (38, 40))
+
+    def test_legacy_long_log_is_queued_for_archive(self):
+        from game_logic import GAME_LOG_CAPACITY
+
+        lines = [f"l{n}" for n in range(GAME_LOG_CAPACITY + 5)]
+        gs = GameState.from_dict({"game_id": "g", "p1": create_player("P", "Mage").to_dict(),
+                                  "p2": create_player("A", "Mage").to_dict(), "log": lines})
+        self.assertEqual(len(gs.log), GAME_LOG_CAPACITY)
+        self.assertEqual(gs.log.take_evicted(), list(enumerate(lines[:5])))
+
+
 class TestGameStore(unittest.TestCase):
+    def test_job_records_save_load_and_prune(self):
+        import os
+        import tempfile
+        from game_store import GameStore
+
+        with tempfile.TemporaryDirectory() as td:
+            store = GameStore(os.path.join(td, "test.db"))
+            self.assertIsNone(store.load_job("j1"))
+            store.save_job("j1", "g1", "queued", {"job_id": "j1", "status": "queued"})
+            store.save_job("j1", "g1", "done", {"job_id": "j1", "status": "done", "result": {"hp": 3}})
+            self.assertEqual(store.load_job("j1")["result"], {"hp": 3})
+            store.prune_jobs(3600)
+            self.assertIsNotNone(store.load_job("j1"))
+            store.prune_jobs(-1)
+            self.assertIsNone(store.load_job("j1"))
+            store.close()
+
     def test_save_load_delete(self):
         import os
         import tempfile
@@ -1525,9 +2573,403 @@ class TestGameStore(unittest.TestCase):
             self.assertEqual(store.count(), 1)
             loaded = store.load_all()
             self.assertEqual(loaded["g1"]["turn_number"], 1)
+            self.assertEqual(store.load("g1"), state)
+            self.assertIsNone(store.load("nope"))
             store.delete("g1")
             self.assertEqual(store.load_all(), {})
 
+    def test_log_archive(self):
+        import os
+        import tempfile
+        from game_store import GameStore
+
+        with tempfile.TemporaryDirectory() as td:
+            store = GameStore(os.path.join(td, "test.db"))
+            store.save("g1", {"game_id": "g1"}, [(0, "a"), (1, "b")])
+            store.save("g1", {"game_id": "g1"}, [(2, "c")])
+            store.save("g2", {"game_id": "g2"}, [(0, "other")])
+            self.assertEqual(store.load_log("g1"), ["a", "b", "c"])
+            self.assertEqual(store.load_log("g1", 1, 2), ["b"])
+            store.delete("g1")
+            self.assertEqual(store.load_log("g1"), [])
+            self.assertEqual(store.load_log("g2"), ["other"])
+
+
+    def test_connections_are_per_thread_and_reused(self):
+        import os
+        import tempfile
+        import threading
+        from game_store import GameStore
+
+        with tempfile.TemporaryDirectory() as td:
+            store = GameStore(os.path.join(td, "test.db"))
+            conn = store._connect()
+            self.assertIs(store._connect(), conn)
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], 5000)
+            other = []
+            worker = threading.Thread(target=lambda: other.append(store._connect()))
+            worker.start()
+            worker.join()
+            self.assertIsNot(other[0], conn)
+            store.save("g1", {"turn": 1})
+            store.close()
+            self.assertEqual(store.load("g1"), {"turn": 1})   # reconnects on demand
+            self.assertIsNot(store._connect(), conn)
+            store.close()
+
+class TestStateCodec(unittest.TestCase):
+    def _played_states(self):
+        import json
+        from game_logic import GameState, engine_context
+
+        rng = random.Random(4)
+        p1 = create_ai_opponent(hero_class="Shaman", rng=rng)
+        p2 = create_ai_opponent(hero_class="Rogue", rng=rng)
+        gs = GameState(game_id="g", p1=p1, p2=p2, seed=12, practice={"p1_hp": 40, "p2_hp": 30, "infinite_mana": False})
+        states = []
+        with engine_context(gs.log, rng):
+            for turn in range(30):
+                mover, opp = (p1, p2) if turn % 2 == 0 else (p2, p1)
+                run_ai_turn(mover, opp, draw=turn > 0, difficulty="hard")
+                states.append(json.loads(json.dumps(gs.to_dict())))
+                if check_win(p1, p2):
+                    break
+        return states
+
+    def test_round_trip_matches_json(self):
+        import json
+        from state_codec import decode_state, encode_state
+
+        for state in self._played_states():
+            for compress in (False, True):
+                blob = encode_state(state, compress=compress)
+                self.assertEqual(decode_state(blob), state)
+                self.assertLess(len(blob), len(json.dumps(state)))
+
+    def test_unrepresentable_states_are_rejected(self):
+        import json
+        from state_codec import CodecError, decode_state, encode_state
+
+        state = self._played_states()[0]
+        with self.assertRaises(CodecError):
+            encode_state(state | {"surprise": 1})
+        bad_card = json.loads(json.dumps(state))
+        bad_card["p1"]["hand"].append("Not A Card")
+        with self.assertRaises(CodecError):
+            encode_state(bad_card)
+        blob = encode_state(state)
+        with self.assertRaises(CodecError):
+            decode_state(blob[:-3])
+        with self.assertRaises(CodecError):
+            decode_state(blob[:2] + bytes([99]) + blob[3:])
+
+    def test_blobs_from_another_card_table_are_rejected(self):
+        import game_logic
+        from state_codec import CodecError, decode_state, encode_state
+
+        state = self._played_states()[0]
+        blob = encode_state(state)
+        v1_blob = blob[:2] + bytes([1, blob[3]]) + blob[12:]   # before the header named the table
+        self.assertEqual(decode_state(v1_blob), state)
+        names, entries = game_logic.CARD_NAMES, game_logic.CARD_ENTRIES
+        for label, new_names, new_entries in (
+            ("reordered", names[1:] + names[:1], entries[1:] + entries[:1]),
+            ("extended", names + ("Brand New Card",), entries + ({"type": "spell"},)),
+        ):
+            with self.subTest(label), \
+                    unittest.mock.patch.object(game_logic, "CARD_NAMES", new_names), \
+                    unittest.mock.patch.object(game_logic, "CARD_ENTRIES", new_entries):
+                for old in (blob, v1_blob):
+                    with self.assertRaises(CodecError):
+                        decode_state(old)
+        self.assertEqual(decode_state(blob), state)
+
+    def test_store_picks_codec_per_row(self):
+        import json
+        import os
+        import sqlite3
+        import tempfile
+        from game_store import GameStore
+
+        state = self._played_states()[-1]
+        with tempfile.TemporaryDirectory() as td:
+            path = os.path.join(td, "test.db")
+            with sqlite3.connect(path) as conn:     # a database from before per-row codecs
+                conn.execute("CREATE TABLE games (game_id TEXT PRIMARY KEY, state_json TEXT NOT NULL, updated_at REAL NOT NULL)")
+                conn.execute("INSERT INTO games VALUES ('old', ?, 0)", (json.dumps(state),))
+            conn.close()
+            store = GameStore(path, codec="binary+zlib")
+            store.save("new", state)
+            store.save("odd", {"game_id": "odd"})       # not a full state: stored as JSON
+            codecs = dict(store._connect().execute("SELECT game_id, codec FROM games"))
+            self.assertEqual(codecs, {"old": "json", "new": "binary", "odd": "json"})
+            self.assertEqual(store.load("old"), state)
+            self.assertEqual(store.load("new"), state)
+            self.assertEqual(store.load_all()["odd"], {"game_id": "odd"})
+            store.close()
+
+
+class TestGameWriter(unittest.TestCase):
+    def setUp(self):
+        import os
+        import tempfile
+        from game_store import GameStore
+
+        self._tmp = tempfile.TemporaryDirectory()
+        self.store = GameStore(os.path.join(self._tmp.name, "test.db"))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_sync_mode_writes_inline(self):
+        from game_store import GameWriter
+
+        writer = GameWriter(self.store, mode="sync")
+        writer.save("g1", {"turn": 1}, [(0, "a")])
+        self.assertEqual(self.store.load("g1"), {"turn": 1})
+        self.assertEqual(self.store.load_log("g1"), ["a"])
+        writer.delete("g1")
+        self.assertIsNone(self.store.load("g1"))
+
+    def test_interval_mode_coalesces_until_flush(self):
+        from game_store import GameWriter
+
+        writer = GameWriter(self.store, mode="interval", interval=60)
+        writer.save("g1", {"turn": 1}, [(0, "a")])
+        writer.save("g1", {"turn": 2}, [(1, "b")])
+        writer.save("g2", {"turn": 1})
+        self.assertIsNone(self.store.load("g1"))
+        self.assertTrue(writer.pending("g1"))
+        self.assertEqual(writer.stats()["queue_depth"], 2)
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(self.store.load("g1"), {"turn": 2})
+        self.assertEqual(self.store.load_log("g1"), ["a", "b"])
+        stats = writer.stats()
+        self.assertEqual((stats["saves"], stats["coalesced"], stats["batches"]), (3, 1, 1))
+        self.assertFalse(writer.pending("g1"))
+        writer.close()
+
+    def test_flush_times_out_while_a_batch_is_stuck(self):
+        import threading
+        from game_store import GameWriter
+
+        gate = threading.Event()
+        self.addCleanup(gate.set)
+        write_batch = self.store.write_batch
+        self.store.write_batch = lambda batch: (gate.wait(), write_batch(batch))
+        writer = GameWriter(self.store, mode="batched")
+        writer.save("g1", {"turn": 1})
+        self.assertFalse(writer.flush(timeout=0.05))
+        self.assertTrue(writer.pending("g1"))
+        self.assertEqual(writer.stats()["flush_timeouts"], 1)
+        gate.set()
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(self.store.load("g1"), {"turn": 1})
+        writer.close()
+
+    def test_queued_delete_wins(self):
+        from game_store import GameWriter
+
+        self.store.save("g1", {"turn": 1})
+        writer = GameWriter(self.store, mode="interval", interval=60)
+        writer.save("g1", {"turn": 2})
+        writer.delete("g1")
+        self.assertTrue(writer.pending("g1"))
+        writer.close()
+        self.assertIsNone(self.store.load("g1"))
+
+    def test_events_and_snapshots_coalesce(self):
+        from game_store import GameEvent, GameWriter
+
+        writer = GameWriter(self.store, mode="interval", interval=60)
+        writer.save("g1", {"event_seq": 1}, events=[GameEvent(1, "new_game", {"seed": 5})])
+        writer.append_events("g1", [GameEvent(2, "move", {"move": ["a"]})], [(0, "old line")])
+        writer.append_events("g1", [GameEvent(3, "move", {"move": ["b"]})])
+        writer.close()
+        state, tail = self.store.load_with_tail("g1")
+        self.assertEqual(state, {"event_seq": 1})
+        self.assertEqual([(e.seq, e.payload["move"]) for e in tail], [(2, ["a"]), (3, ["b"])])
+        self.assertEqual([e.kind for e in self.store.load_events("g1")], ["new_game", "move", "move"])
+        self.assertEqual(self.store.load_log("g1"), ["old line"])
+        stats = writer.stats()
+        self.assertEqual((stats["saves"], stats["events"], stats["batches"]), (1, 3, 1))
+        self.store.delete("g1")
+        self.assertEqual(self.store.load_events("g1"), [])
+        self.assertEqual(self.store.load_with_tail("g1"), (None, []))
+
+    def test_duplicate_event_seq_drops_the_stale_write(self):
+        from game_store import EventConflict, GameEvent, GameWriter
+
+        self.store.append_events("g1", [GameEvent(1, "new_game", {"seed": 5})])
+        with self.assertRaises(EventConflict):
+            self.store.append_events("g1", [GameEvent(1, "move", {"move": ["x"]})])
+        for mode in ("sync", "interval"):
+            with self.subTest(mode):
+                stale = []
+                writer = GameWriter(self.store, mode=mode, interval=60, on_conflict=stale.append)
+                writer.save("g1", {"event_seq": 1}, events=[GameEvent(1, "move", {"move": ["x"]})])
+                writer.save("g2", {"event_seq": 0})
+                writer.close()
+                self.assertEqual(stale, ["g1"])
+                self.assertEqual(writer.stats()["conflicts"], 1)
+                self.assertEqual([e.kind for e in self.store.load_events("g1")], ["new_game"])
+                self.assertIsNone(self.store.load("g1"))
+                self.assertEqual(self.store.load("g2"), {"event_seq": 0})
+
+    def test_close_drains_batched_queue(self):
+        from game_store import GameWriter
+
+        writer = GameWriter(self.store, mode="batched")
+        for turn in range(50):
+            writer.save(f"g{turn % 5}", {"turn": turn})
+        writer.close()
+        self.assertEqual(self.store.count(), 5)
+        self.assertEqual(self.store.load("g4"), {"turn": 49})
+        with self.assertRaises(RuntimeError):
+            writer.save("g1", {"turn": 99})
+
+    def test_unknown_mode_rejected(self):
+        from game_store import GameWriter
+
+        with self.assertRaises(ValueError):
+            GameWriter(self.store, mode="eventually")
+
+
+class TestGameCache(unittest.TestCase):
+    def _cache(self, store, **kwargs):
+        from game_cache import GameCache
+
+        self.now = 0.0
+        self.evicted = []
+        return GameCache(store.get, on_evict=lambda gid, g: self.evicted.append(gid),
+                         clock=lambda: self.now, **kwargs)
+
+    def test_lazy_load_and_counters(self):
+        cache = self._cache({"a": "game-a"})
+        self.assertEqual(cache.get("a"), "game-a")
+        self.assertEqual(cache["a"], "game-a")
+        self.assertIsNone(cache.get("missing"))
+        with self.assertRaises(KeyError):
+            cache["missing"]
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["loads"], stats["size"]), (1, 3, 1, 1))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = self._cache({}, capacity=2)
+        cache["a"], cache["b"] = 1, 2
+        cache.get("a")
+        cache["c"] = 3
+        self.assertEqual(self.evicted, ["b"])
+        self.assertNotIn("b", cache)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_idle_games_expire(self):
+        cache = self._cache({}, ttl_seconds=10)
+        cache["a"] = 1
+        self.now = 5
+        cache["b"] = 2
+        self.now = 12
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(self.evicted, ["a"])
+        self.assertEqual(cache.get("b"), 2)
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_pop_does_not_write_back(self):
+        cache = self._cache({})
+        cache["a"] = 1
+        self.assertEqual(cache.pop("a"), 1)
+        self.assertIsNone(cache.pop("a"))
+        self.assertEqual(self.evicted, [])
+
+
+class TestAIJobQueue(unittest.TestCase):
+    def _queue(self, **kwargs):
+        from ai_jobs import AIJobQueue
+
+        jobs = AIJobQueue(**kwargs)
+        self.addCleanup(jobs.close)
+        return jobs
+
+    def test_runs_job_and_records_timings(self):
+        jobs = self._queue(workers=1)
+        job = jobs.submit("g1", lambda: 42)
+        self.assertTrue(job.wait(5))
+        self.assertEqual((job.status, job.result), ("done", 42))
+        self.assertGreaterEqual(job.wait_ms, 0)
+        self.assertGreaterEqual(job.run_ms, 0)
+        self.assertIs(jobs.get(job.job_id), job)
+        self.assertIsNone(jobs.active("g1"))
+        stats = jobs.stats()
+        self.assertEqual((stats["submitted"], stats["completed"], stats["queue_depth"]), (1, 1, 0))
+
+    def test_full_queue_rejects_and_active_tracks_game(self):
+        import threading
+        import time
+        from ai_jobs import QueueFull
+
+        gate = threading.Event()
+        jobs = self._queue(workers=1, max_queued=1)
+        self.addCleanup(gate.set)
+        running = jobs.submit("g1", gate.wait)
+        while running.status != "running":
+            time.sleep(0.001)
+        queued = jobs.submit("g2", lambda: None)
+        with self.assertRaises(QueueFull):
+            jobs.submit("g3", lambda: None)
+        self.assertIs(jobs.active("g1"), running)
+        self.assertEqual(queued.status, "queued")
+        stats = jobs.stats()
+        self.assertEqual((stats["queue_depth"], stats["running"], stats["rejected"]), (1, 1, 1))
+        gate.set()
+        self.assertTrue(queued.wait(5))
+        self.assertIsNone(jobs.active("g1"))
+
+    def test_slow_on_change_does_not_hold_up_the_queue(self):
+        import threading
+
+        entered, gate = threading.Event(), threading.Event()
+        self.addCleanup(gate.set)
+        seen: dict[str, list[str]] = {}
+
+        def on_change(job):
+            seen.setdefault(job.game_id, []).append(job.status)
+            if job.game_id == "slow" and job.status == "queued":
+                entered.set()
+                gate.wait(5)      # e.g. a save stuck on SQLite's busy timeout
+
+        jobs = self._queue(workers=1, on_change=on_change)
+        submitter = threading.Thread(target=jobs.submit, args=("slow", lambda: 1))
+        submitter.start()
+        self.assertTrue(entered.wait(5))
+        slow = jobs.active("slow")
+        self.assertEqual(slow.status, "queued")
+        fast = jobs.submit("fast", lambda: 2)
+        self.assertTrue(fast.wait(5))
+        self.assertEqual(jobs.stats()["completed"], 1)
+        gate.set()
+        submitter.join(5)
+        self.assertTrue(slow.wait(5))
+        self.assertEqual(seen, {"slow": ["queued", "running", "done"], "fast": ["queued", "running", "done"]})
+
+    def test_failed_job_keeps_error_and_old_jobs_are_forgotten(self):
+        jobs = self._queue(workers=1, keep_finished=2)
+
+        def boom():
+            raise ValueError("no moves")
+
+        with self.assertLogs("ai_jobs", "ERROR"):
+            failed = jobs.submit("g1", boom)
+            failed.wait(5)
+        self.assertEqual((failed.status, failed.error), ("failed", "no moves"))
+        later = [jobs.submit(f"g{i}", lambda: None) for i in range(2)]
+        for job in later:
+            job.wait(5)
+        self.assertIsNone(jobs.get(failed.job_id))
+        self.assertIs(jobs.get(later[-1].job_id), later[-1])
+        self.assertEqual(jobs.stats()["failed"], 1)
+
 
 class TestServerApi(unittest.TestCase):
     def test_health_endpoint(self):
@@ -1694,6 +3136,24 @@ class TestServerApi(unittest.TestCase):
         data = res.get_json()
         self.assertEqual(data["winner"], "AI")
 
+    def test_lethal_hint(self):
+        from server import app, GAMES
+        client = app.test_client()
+        deck = create_player("P", "Mage", shuffle=False)["deck"]
+        start = client.post("/api/new_game", json={"hero_class": "Mage", "deck": deck})
+        gid = start.get_json()["game_id"]
+        client.post("/api/mulligan", json={"game_id": gid, "indices": []})
+        GAMES[gid]["is_player_turn"] = True
+        res = client.get(f"/api/lethal_hint?game_id={gid}")
+        self.assertEqual(res.get_json(), {"lethal": False, "moves": []})
+
+        GAMES[gid]["p2"]["hp"] = 3
+        GAMES[gid]["p2"]["board"] = []
+        GAMES[gid]["p1"]["board"] = [_make_minion("Town Crier", 3, 2)]
+        data = client.get(f"/api/lethal_hint?game_id={gid}").get_json()
+        self.assertTrue(data["lethal"])
+        self.assertEqual(data["moves"], [["attack", 0, "hero"]])
+
     def test_new_game_practice_mode(self):
         from server import app
         client = app.test_client()
@@ -1809,9 +3269,478 @@ class TestServerApi(unittest.TestCase):
         self.assertEqual(res.status_code, 400)
         self.assertIn("mulligan", res.get_json()["error"].lower())
 
-    def _start_match(self, client, hero_class="Mage", deck=None):
+    def test_new_game_seed_is_reproducible(self):
+        from server import GAMES, app
+        client = app.test_client()
+        deck = create_player("P", "Mage", shuffle=False)["deck"]
+        snapshots = []
+        for _ in range(2):
+            res = client.post("/api/new_game", json={"hero_class": "Mage", "deck": deck, "seed": 1234})
+            gid = res.get_json()["game_id"]
+            client.post("/api/mulligan", json={"game_id": gid, "indices": [0, 1]})
+            client.post("/api/action", json={"game_id": gid, "action": "end_turn"})
+            state = GAMES[gid].to_dict()
+            snapshots.append((state["p1"], state["p2"], state["player_goes_first"], state["rng_step"]))
+            self.assertEqual(state["seed"], 1234)
+            client.post("/api/resign", json={"game_id": gid})
+        self.assertEqual(snapshots[0], snapshots[1])
+
+    def test_evicted_game_reloads_from_store(self):
+        from server import GAMES, app
+        client = app.test_client()
+        gid = self._start_match(client)
+        hand = list(GAMES[gid]["p1"]["hand"])
+        loads = GAMES.stats()["loads"]
+        GAMES.pop(gid)
+        self.assertNotIn(gid, GAMES)
+        res = client.get(f"/api/state?game_id={gid}")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()["p1"]["hand"], hand)
+        self.assertIn(gid, GAMES)
+        self.assertEqual(GAMES.stats()["loads"], loads + 1)
+        health = client.get("/api/health").get_json()
+        self.assertEqual(health["game_cache"]["size"], len(GAMES))
+        self.assertIn("hit_rate", health["game_cache"])
+        self.assertIn("queue_depth", health["write_behind"])
+
+    def test_game_evicted_under_a_busy_lock_is_saved_once_it_frees(self):
+        import threading
+        import server
+        from server import GAMES, STORE, WRITER, app
+        client = app.test_client()
+        gid = self._start_match(client)
+        held, release = threading.Event(), threading.Event()
+        self.addCleanup(release.set)
+
+        def hold(lock_cm):
+            with lock_cm:
+                held.set()
+                release.wait(5)
+
+        def evict_while_held(lock_cm):
+            held.clear()
+            release.clear()
+            GAMES[gid]      # reload it if the previous round evicted it
+            holder = threading.Thread(target=hold, args=(lock_cm,))
+            holder.start()
+            held.wait(5)
+            gs = GAMES.pop(gid)
+            server._evict_game(gid, gs)
+            return gs, holder
+
+        # Released through _game_lock: the holder saves the evicted game.
+        before = client.get("/api/health").get_json()["game_cache"]["deferred_saves"]
+        gs, holder = evict_while_held(server._game_lock(gid))
+        gs.p1.armor = 7     # not an event: only a snapshot records it
+        cache = client.get("/api/health").get_json()["game_cache"]
+        self.assertEqual(cache["deferred_saves"], before + 1)
+        self.assertEqual(cache["awaiting_save"], 1)
+        release.set()
+        holder.join(5)
+        self.assertEqual(len(server.UNSAVED), 0)
+        WRITER.flush()
+        self.assertEqual(STORE.load(gid)["p1"]["armor"], 7)
+
+        # Requested before anyone saved it: the same game goes back in the cache.
+        gs, holder = evict_while_held(server.GAME_LOCKS.for_game(gid))
+        release.set()
+        holder.join(5)
+        self.assertEqual(client.get(f"/api/state?game_id={gid}").status_code, 200)
+        self.assertIs(GAMES[gid], gs)
+        self.assertEqual(len(server.UNSAVED), 0)
+
+    def test_load_answers_503_when_queued_saves_lag(self):
+        import server
+        from server import GAMES, WRITER, app
+        client = app.test_client()
+        gid = self._start_match(client)
+        WRITER.flush()
+        GAMES.pop(gid)
+        with unittest.mock.patch.object(WRITER, "pending", return_value=True), \
+                unittest.mock.patch.object(WRITER, "flush", return_value=False) as flush:
+            res = client.get(f"/api/state?game_id={gid}")
+        flush.assert_called_with(server.PERSIST_FLUSH_TIMEOUT)
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.headers["Retry-After"], "1")
+        self.assertIn("write_behind", res.get_json())
+        self.assertNotIn(gid, GAMES)
+        self.assertEqual(client.get(f"/api/state?game_id={gid}").status_code, 200)
+
+    def test_cached_game_is_reloaded_after_another_process_moves_it(self):
+        import server
+        from server import GAMES, WRITER, app
+        client = app.test_client()
+        for _ in range(20):     # find a game where the player has a move other than ending the turn
+            gid = self._start_match(client)
+            state = client.get(f"/api/state?game_id={gid}").get_json()
+            moves = [m for m in state["_legal_moves"] if m[0] != "end_turn"]
+            if moves and state["is_player_turn"]:
+                break
+            client.post("/api/resign", json={"game_id": gid})
+        self.assertTrue(moves)
+        cached = GAMES[gid]
+        # Another Gunicorn worker's copy of the game plays a move and records it.
+        other = GameState.from_dict(cached.to_dict())
+        with server._with_game_log(other):
+            server._apply_move(other, tuple(moves[0]))
+        server._record_event(other, "move", {"move": list(moves[0])})
+        WRITER.flush()
+        res = client.get(f"/api/state?game_id={gid}").get_json()
+        self.assertEqual(res["state_version"], other.event_seq)
+        self.assertEqual(res["p1"]["hand"], other.to_dict()["p1"]["hand"])
+        self.assertIsNot(GAMES[gid], cached)
+        client.post("/api/resign", json={"game_id": gid})
+
+    def test_reload_replays_events_after_snapshot(self):
+        import server
+        from server import GAMES, STORE, WRITER, app
+        client = app.test_client()
+        with unittest.mock.patch.object(server, "SNAPSHOT_EVERY", 1000):
+            gid = None
+            for _ in range(20):     # find a game where the player has moves to make
+                candidate = self._start_match(client)
+                state = client.get(f"/api/state?game_id={candidate}").get_json()
+                if any(m[0] != "end_turn" for m in state["_legal_moves"]) and state["is_player_turn"]:
+                    gid = candidate
+                    break
+                client.post("/api/resign", json={"game_id": candidate})
+            self.assertIsNotNone(gid)
+            for _ in range(2):
+                client.post("/api/action", json={"game_id": gid, "action": "end_turn"})
+            for _ in range(3):
+                legal = client.get(f"/api/state?game_id={gid}").get_json()["_legal_moves"]
+                moves = [m for m in legal if m[0] != "end_turn"]
+                if not moves:
+                    break
+                action, idx, target = moves[0]
+                client.post("/api/action", json={"game_id": gid, "action": action, "idx": idx, "target": target})
+            live = GAMES[gid].to_dict()
+            WRITER.flush()
+            snapshot, tail = STORE.load_with_tail(gid)
+            self.assertGreater(len(tail), 0)
+            self.assertTrue(all(event.kind == "move" for event in tail))
+            self.assertLess(snapshot["event_seq"], live["event_seq"])
+            GAMES.pop(gid)
+            self.assertEqual(GAMES[gid].to_dict(), live)
+            kinds = [event.kind for event in STORE.load_events(gid)]
+            self.assertEqual(kinds[:2], ["new_game", "mulligan"])
+            self.assertEqual(kinds.count("end_turn"), 2)
+            client.post("/api/resign", json={"game_id": gid})
+
+    def test_since_version_returns_patch(self):
+        import copy
+        import json
+        from server import app
+        client = app.test_client()
+        gid = self._start_match(client)
+        full = client.get(f"/api/state?game_id={gid}").get_json()
+        unchanged = client.get(f"/api/state?game_id={gid}&since_version={full['state_version']}").get_json()
+        self.assertEqual((unchanged["patch"], unchanged["log"]), ([], []))
+
+        res = client.post("/api/action", json={
+            "game_id": gid, "action": "end_turn", "since_version": full["state_version"],
+        }).get_json()
+        self.assertEqual(res["base_version"], full["state_version"])
+        self.assertGreater(res["state_version"], full["state_version"])
+        rebuilt = copy.deepcopy(full)
+        for op in res["patch"]:
+            *parents, key = op["path"]
+            node = rebuilt
+            for part in parents:
+                node = node[part]
+            if op["op"] == "del":
+                del node[key]
+            else:
+                node[key] = op["value"]
+        current = client.get(f"/api/state?game_id={gid}").get_json()
+        self.assertEqual(full["log"] + res["log"], current["log"][-len(full["log"] + res["log"]):])
+        del rebuilt["log"], current["log"]
+        self.assertEqual(rebuilt, current)
+        self.assertLess(len(json.dumps(res["patch"])), len(json.dumps(current)))
+
+    def test_unknown_since_version_gets_full_state(self):
+        from server import app
+        client = app.test_client()
+        gid = self._start_match(client)
+        res = client.get(f"/api/state?game_id={gid}&since_version=999").get_json()
+        self.assertNotIn("patch", res)
+        self.assertIn("p1", res)
+        self.assertEqual(res["state_version"], 2)   # new_game, mulligan
+
+    def test_log_since_returns_only_new_lines(self):
+        from server import app
+        client = app.test_client()
+        gid = self._start_match(client)
+        seq = client.get(f"/api/state?game_id={gid}").get_json()["log_seq"]
+        res = client.post("/api/action", json={"game_id": gid, "action": "end_turn", "log_since": seq})
+        data = res.get_json()
+        self.assertEqual(data["log_seq"] - seq, len(data["log"]))
+        self.assertEqual(data["log"][0], "--- AI's Turn ---")
+        again = client.get(f"/api/state?game_id={gid}&log_since={data['log_seq']}").get_json()
+        self.assertEqual(again["log"], [])
+
+    def test_log_since_reads_archived_lines(self):
+        import game_logic
+        from server import GAMES, app
+        client = app.test_client()
+        with unittest.mock.patch.object(game_logic, "GAME_LOG_CAPACITY", 6):
+            gid = self._start_match(client)
+        for _ in range(3):
+            client.post("/api/action", json={"game_id": gid, "action": "end_turn"})
+        self.assertEqual(len(GAMES[gid].log), 6)
+        data = client.get(f"/api/state?game_id={gid}&log_since=0").get_json()
+        self.assertEqual(len(data["log"]), data["log_seq"])
+        self.assertEqual(data["log"][0], "--- NEW GAME STARTED ---")
+        self.assertEqual(data["log"][-6:], list(GAMES[gid].log))
+        tail = client.get(f"/api/state?game_id={gid}").get_json()["log"]
+        self.assertEqual(tail, list(GAMES[gid].log))
+
+    def test_async_end_turn_returns_job_to_poll(self):
+        from server import app
+        client = app.test_client()
+        gid = self._start_match(client)
+        res = client.post("/api/action", json={"game_id": gid, "action": "end_turn", "async": True})
+        self.assertIn(res.status_code, (200, 202))
+        job_id = res.get_json()["job_id"]
+        polled = client.get(f"/api/jobs/{job_id}?wait=10")
+        self.assertEqual(polled.status_code, 200)
+        body = polled.get_json()
+        self.assertEqual((body["status"], body["game_id"]), ("done", gid))
+        self.assertGreaterEqual(body["run_ms"], 0)
+        self.assertEqual(body["result"], client.get(f"/api/state?game_id={gid}").get_json())
+        self.assertTrue(body["result"]["is_player_turn"])
+        self.assertEqual(client.get("/api/jobs/nope").status_code, 404)
+        stats = client.get("/api/health").get_json()["ai_jobs"]
+        self.assertGreaterEqual(stats["completed"], 1)
+        self.assertIn("avg_wait_ms", stats)
+
+    def test_job_pool_and_search_pool_have_separate_env_vars(self):
+        import os
+        import subprocess
+        import tempfile
+        probe = "import server, game_logic; print(server.JOBS.workers, game_logic.AI_SEARCH_WORKERS)"
+        with tempfile.TemporaryDirectory() as tmp:
+            for env, expected in (
+                ({"LITSTONE_AI_JOB_WORKERS": "3"}, "3 0"),
+                ({"LITSTONE_AI_WORKERS": "4"}, "2 4"),
+            ):
+                base = {k: v for k, v in os.environ.items() if not k.startswith("LITSTONE_AI_")}
+                out = subprocess.run(
+                    [sys.executable, "-c", probe], capture_output=True, text=True, check=True,
+                    cwd=os.path.dirname(os.path.abspath(__file__)),
+                    env={**base, **env, "LITSTONE_DB_PATH": os.path.join(tmp, "probe.db")},
+                ).stdout
+                self.assertEqual(out.split(), expected.split(), env)
+
+    def test_job_accepted_by_another_worker_is_polled_from_the_store(self):
+        import threading
+        from ai_jobs import AIJobQueue
+        from server import _share_job, app
+        client = app.test_client()
+        gate = threading.Event()
+        # Stands in for the job queue of a second Gunicorn worker process.
+        other = AIJobQueue(workers=1, on_change=_share_job)
+        self.addCleanup(other.close)
+        self.addCleanup(gate.set)
+        job = other.submit("g-elsewhere", lambda: (gate.wait(5), {"turn_number": 4})[1])
+        pending = client.get(f"/api/jobs/{job.job_id}")
+        self.assertEqual(pending.status_code, 202)
+        self.assertIn(pending.get_json()["status"], ("queued", "running"))
+        gate.set()
+        done = client.get(f"/api/jobs/{job.job_id}?wait=5")
+        self.assertEqual(done.status_code, 200)
+        self.assertEqual(done.get_json()["result"], {"turn_number": 4})
+        self.assertEqual(done.get_json()["game_id"], "g-elsewhere")
+
+    def test_actions_wait_for_queued_ai_turn(self):
+        import threading
+        import time
+        from ai_jobs import AIJobQueue
+        from server import app
+        client = app.test_client()
+        gid = self._start_match(client)
+        gate = threading.Event()
+        jobs = AIJobQueue(workers=1, max_queued=1)
+        self.addCleanup(jobs.close)
+        self.addCleanup(gate.set)
+        with unittest.mock.patch("server.JOBS", jobs):
+            blocker = jobs.submit("other", gate.wait)
+            while blocker.status != "running":
+                time.sleep(0.001)
+            res = client.post("/api/action", json={"game_id": gid, "action": "end_turn", "async": True})
+            self.assertEqual(res.status_code, 202)
+            self.assertEqual(res.get_json()["status"], "queued")
+            busy = client.post("/api/action", json={"game_id": gid, "action": "end_turn"})
+            self.assertEqual(busy.status_code, 409)
+            other = self._start_match(client)
+            full = client.post("/api/action", json={"game_id": other, "action": "end_turn"})
+            self.assertEqual(full.status_code, 503)
+            self.assertEqual(full.headers["Retry-After"], "1")
+            gate.set()
+            blocker.wait(5)
+            done = client.get(f"/api/jobs/{res.get_json()['job_id']}?wait=10").get_json()
+        self.assertEqual(done["status"], "done")
+        self.assertGreater(done["wait_ms"], 0)
+
+    def _hammer(self, gid, rounds, seed):
+        """Play ``rounds`` requests against one game, chosen by ``seed``; return the status codes seen."""
+        from server import app
+        client = app.test_client()
+        rng = random.Random(seed)
+        codes = []
+        for _ in range(rounds):
+            roll = rng.random()
+            if roll < 0.25:
+                res = client.get(f"/api/state?game_id={gid}")
+            elif roll < 0.35:
+                res = client.post("/api/action", json={"game_id": gid, "action": "end_turn"})
+            else:
+                legal = client.get(f"/api/legal_moves?game_id={gid}").get_json()["moves"]
+                moves = [m for m in legal if m[0] != "end_turn"] or [["end_turn", None, None]]
+                action, idx, target = rng.choice(moves)
+                res = client.post("/api/action", json={
+                    "game_id": gid, "action": action, "idx": idx, "target": target,
+                })
+            codes.append(res.status_code)
+        return codes
+
+    def _switch_often(self):
+        # Hand the GIL over every few bytecodes so unlocked races surface.
+        import sys
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+
+    def _assert_replays_to_live(self, gid):
+        from server import GAMES, WRITER
+        live = GAMES[gid].to_dict()
+        WRITER.flush()
+        GAMES.pop(gid)
+        self.assertEqual(GAMES[gid].to_dict(), live)
+
+    def test_concurrent_requests_on_one_game_are_serialized(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from server import app
+        self._switch_often()
+        for game in range(3):
+            # Long sandbox games, so the threads contend on each for every round.
+            gid = self._start_match(
+                app.test_client(), practice=True, p1_hp=60, p2_hp=60, infinite_mana=True,
+            )
+            seeds = [game * 8 + worker for worker in range(8)]
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                codes = [c for batch in pool.map(self._hammer, [gid] * 8, [25] * 8, seeds) for c in batch]
+            # Racing requests may be refused (stale move, AI still thinking, game
+            # over) but never fail, and the event log still replays to the live game.
+            self.assertLessEqual(set(codes), {200, 400, 409}, f"seeds {seeds}")
+            self.assertIn(200, codes, f"seeds {seeds}")
+            self._assert_replays_to_live(gid)
+
+    def test_concurrent_games_proceed_independently(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from server import app
+        client = app.test_client()
+        gids = [self._start_match(client) for _ in range(12)]
+        self._switch_often()
+        seeds = list(range(len(gids)))
+        with ThreadPoolExecutor(max_workers=12) as pool:
+            batches = list(pool.map(self._hammer, gids, [15] * len(gids), seeds))
+        for seed, codes in zip(seeds, batches):
+            self.assertLessEqual(set(codes), {200, 400}, f"seed {seed}")
+        for gid in gids:
+            self._assert_replays_to_live(gid)
+
+    def test_game_locks_are_striped_by_game_id(self):
+        from game_cache import GameLocks
+        locks = GameLocks(stripes=4)
+        self.assertEqual(len(locks), 4)
+        self.assertIs(locks.for_game("a"), locks.for_game("a"))
+        self.assertEqual(len({id(locks.for_game(f"g{i}")) for i in range(64)}), 4)
+
+    def _read_sse(self, res) -> list[tuple[str, dict]]:
+        import json
+        frames = []
+        for block in res.get_data(as_text=True).split("\n\n"):
+            if block.strip():
+                fields = dict(line.split(": ", 1) for line in block.splitlines())
+                frames.append((fields["event"], json.loads(fields["data"])))
+        return frames
+
+    def test_end_turn_stream_relays_moves_and_effects(self):
+        from server import GAMES, STORE, WRITER, app
+        client = app.test_client()
+        gid = self._start_match(client)
+        GAMES[gid]["p2"]["hand"] = ["Town Crier", "Quill Bolt"]
+        GAMES[gid]["p2"]["max_mana"] = 9
+        res = client.post("/api/end_turn/stream", json={"game_id": gid})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, "text/event-stream")
+        frames = self._read_sse(res)
+        kinds = [kind for kind, _ in frames]
+        self.assertEqual(kinds[-1], "done")
+        self.assertIn("effect", kinds)
+        self.assertTrue(all(
+            {"type", "side", "target", "value"} <= data.keys() for kind, data in frames if kind == "effect"
+        ))
+        move_frames = [data for kind, data in frames if kind == "move"]
+        WRITER.flush()
+        recorded = STORE.load_events(gid)[-1]
+        self.assertEqual(recorded.kind, "end_turn")
+        self.assertEqual([frame["move"] for frame in move_frames], recorded.payload["ai_moves"])
+        self.assertGreater(len(move_frames), 0)
+        done = frames[-1][1]
+        self.assertEqual(done, client.get(f"/api/state?game_id={gid}").get_json())
+        self.assertTrue(done["is_player_turn"])
+
+    def test_end_turn_stream_rejects_before_streaming(self):
+        from server import GAMES, app
+        client = app.test_client()
+        gid = self._start_match(client)
+        GAMES[gid]["is_player_turn"] = False
+        res = client.post("/api/end_turn/stream", json={"game_id": gid})
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("Not your turn", res.get_json()["error"])
+
+    def test_catalogs_answer_304_for_matching_etag(self):
+        from server import app
+        client = app.test_client()
+        for url in ("/api/cards", "/api/campaign"):
+            first = client.get(url)
+            self.assertEqual(first.status_code, 200)
+            etag = first.headers["ETag"]
+            again = client.get(url, headers={"If-None-Match": etag})
+            self.assertEqual(again.status_code, 304)
+            self.assertEqual(again.data, b"")
+            stale = client.get(url, headers={"If-None-Match": '"stale"'})
+            self.assertEqual(stale.status_code, 200)
+            self.assertEqual(stale.get_json(), first.get_json())
+
+    def test_state_etag_changes_after_action(self):
+        from server import app
+        client = app.test_client()
+        gid = self._start_match(client)
+        url = f"/api/state?game_id={gid}"
+        etag = client.get(url).headers["ETag"]
+        self.assertEqual(client.get(url, headers={"If-None-Match": etag}).status_code, 304)
+        client.post("/api/action", json={"game_id": gid, "action": "end_turn"})
+        res = client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers["ETag"], etag)
+
+    def test_starter_deck_with_seed_is_stable_and_cacheable(self):
+        from server import app
+        client = app.test_client()
+        url = "/api/starter_deck?hero_class=Mage&seed=7"
+        first = client.get(url)
+        self.assertEqual(first.get_json()["deck"], client.get(url).get_json()["deck"])
+        again = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+        self.assertEqual(again.status_code, 304)
+        unseeded = client.get("/api/starter_deck?hero_class=Mage")
+        self.assertNotIn("ETag", unseeded.headers)
+        self.assertEqual(unseeded.headers["Cache-Control"], "no-store")
+
+    def _start_match(self, client, hero_class="Mage", deck=None, **options):
         deck = deck or create_player("P", hero_class, shuffle=False)["deck"]
-        start = client.post("/api/new_game", json={"hero_class": hero_class, "deck": deck})
+        start = client.post("/api/new_game", json={"hero_class": hero_class, "deck": deck, **options})
         self.assertEqual(start.status_code, 200)
         gid = start.get_json()["game_id"]
         mull = client.post("/api/mulligan", json={"game_id": gid, "indices": []})